@@ -0,0 +1,180 @@
+"""Verde Voyage: Spatial index of airport coordinates
+
+Module Description
+==================
+This module contains the AirportIndex class, a spatial index over the coordinates of a set of airports. It answers
+"which airports are nearest to this point" and "which airports are within this many kilometres of this point"
+without computing the distance to every airport.
+
+The airports are sorted by latitude. Since no airport within d kilometres of a point can be more than d kilometres
+north or south of it, a query only computes the great-circle (haversine) distances, with NumPy, of the airports in
+the band of latitudes around the point, which is found by binary search.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from typing import Iterable, Optional
+import math
+import numpy as np
+
+AIRPORTS_FILE = 'CSV Files/airports-code@public.csv'
+
+EARTH_RADIUS_KM = 6371.0088
+
+# The initial half-height, in kilometres, of the band of latitudes searched by AirportIndex.nearest.
+NEAREST_BAND_KM = 250.0
+
+
+class AirportIndex:
+    """
+    A spatial index over the (latitude, longitude) coordinates of a set of airports.
+
+    Instance Attributes:
+        - codes: The airport codes of the indexed airports, sorted by latitude.
+        - latitudes: The latitude of every airport in codes, in radians (so sorted in increasing order).
+        - longitudes: The longitude of every airport in codes, in radians.
+
+    Private Instance Attributes:
+        - _positions: A mapping from each airport code to its position in codes.
+
+    Representation Invariants:
+        - len(self.codes) == len(self.latitudes) == len(self.longitudes)
+        - all(self.latitudes[i] <= self.latitudes[i + 1] for i in range(len(self.codes) - 1))
+    """
+    __slots__ = ('codes', 'latitudes', 'longitudes', '_positions')
+    codes: list[str]
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    _positions: dict[str, int]
+
+    def __init__(self, airport_coords: dict[str, tuple[float, float]], codes: Optional[Iterable[str]] = None) -> None:
+        """
+        Initialize an index of the airports in airport_coords, a mapping from airport codes to their (latitude,
+        longitude) coordinates in degrees, like the one returned by helper_functions.get_airport_coordinates.
+
+        If codes is given, only the airports in codes that have coordinates are indexed.
+        """
+        if codes is not None:
+            airport_coords = {code: airport_coords[code] for code in codes if code in airport_coords}
+
+        coordinates = np.radians(np.array(list(airport_coords.values()), dtype=np.float64).reshape(-1, 2))
+        order = np.argsort(coordinates[:, 0], kind='stable')
+        all_codes = list(airport_coords)
+        self.codes = [all_codes[i] for i in order.tolist()]
+        self.latitudes = np.ascontiguousarray(coordinates[order, 0])
+        self.longitudes = np.ascontiguousarray(coordinates[order, 1])
+        self._positions = {code: i for i, code in enumerate(self.codes)}
+
+    def __len__(self) -> int:
+        """Return the number of indexed airports."""
+        return len(self.codes)
+
+    def __contains__(self, airport_code: str) -> bool:
+        """Return whether the given airport is indexed."""
+        return airport_code in self._positions
+
+    def coordinates(self, airport_code: str) -> tuple[float, float]:
+        """
+        Return the (latitude, longitude) coordinates of the given airport, in degrees.
+
+        Raise a ValueError if the airport is not indexed.
+        """
+        if airport_code not in self._positions:
+            raise ValueError
+        position = self._positions[airport_code]
+        return math.degrees(self.latitudes[position]), math.degrees(self.longitudes[position])
+
+    def nearest(self, latitude: float, longitude: float, k: int = 5,
+                exclude: Iterable[str] = ()) -> list[tuple[str, float]]:
+        """
+        Return the k indexed airports nearest to the given coordinates (in degrees), ignoring the airports in
+        exclude, as (airport code, distance in km) pairs from nearest to farthest.
+
+        The band of latitudes searched starts NEAREST_BAND_KM kilometres on each side of the point, and is doubled
+        until it holds k airports within its half-height.
+        """
+        excluded = set(exclude)
+        wanted = min(k, len(self.codes) - sum(code in self._positions for code in excluded))
+        if wanted <= 0:
+            return []
+
+        band_km = NEAREST_BAND_KM
+        while True:
+            positions, distances = self._band(latitude, longitude, band_km)
+            found = [(distance, position) for distance, position in zip(distances.tolist(), positions.tolist())
+                     if distance <= band_km and self.codes[position] not in excluded]
+            if len(found) >= wanted or band_km >= math.pi * EARTH_RADIUS_KM:
+                found.sort()
+                return [(self.codes[position], distance) for distance, position in found[:wanted]]
+            band_km *= 2
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> list[tuple[str, float]]:
+        """
+        Return every indexed airport within radius_km kilometres of the given coordinates (in degrees), as
+        (airport code, distance in km) pairs from nearest to farthest.
+        """
+        positions, distances = self._band(latitude, longitude, radius_km)
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return [(self.codes[position], distance)
+                for position, distance in zip(positions[order].tolist(), distances[order].tolist())]
+
+    def distances_km(self, latitude: float, longitude: float, airport_codes: Iterable[str]) -> np.ndarray:
+        """
+        Return the great-circle distance in kilometres from the given coordinates (in degrees) to each of the given
+        airports, in order.
+
+        This is an admissible A* heuristic source: no flight between two airports is shorter than their distance.
+        Raise a ValueError if an airport is not indexed.
+        """
+        try:
+            positions = np.array([self._positions[code] for code in airport_codes], dtype=np.int64)
+        except KeyError:
+            raise ValueError from None
+        return haversine_km(math.radians(latitude), math.radians(longitude), self.latitudes[positions],
+                            self.longitudes[positions])
+
+    def _band(self, latitude: float, longitude: float, half_height_km: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the positions of the airports at most half_height_km kilometres north or south of the given
+        coordinates (in degrees), and their distance to the coordinates in kilometres.
+        """
+        latitude, longitude = math.radians(latitude), math.radians(longitude)
+        half_height = half_height_km / EARTH_RADIUS_KM
+        start = int(np.searchsorted(self.latitudes, latitude - half_height, side='left'))
+        end = int(np.searchsorted(self.latitudes, latitude + half_height, side='right'))
+        positions = np.arange(start, end)
+        return positions, haversine_km(latitude, longitude, self.latitudes[start:end], self.longitudes[start:end])
+
+
+def haversine_km(latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """
+    Return the great-circle distance in kilometres between the given point and each of the given points, all in
+    radians.
+    """
+    half_sines = np.sin((latitudes - latitude) / 2) ** 2 \
+        + math.cos(latitude) * np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(half_sines, 0.0, 1.0)))
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['typing', 'math', 'numpy'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })
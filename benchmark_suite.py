@@ -0,0 +1,258 @@
+"""Verde Voyage: Benchmark suite
+
+Module Description
+==================
+This module runs every stage of our pipeline against synthetic datasets of several sizes, and writes the wall time,
+peak memory and throughput of each stage to a JSON file, so the results of two versions of the project can be
+compared with compare_benchmarks.py.
+
+The stages are:
+    - 'ingest': converting the flight dataset zip file into the columnar cache of flight_cache.
+    - 'create_graph': building the graph of every flight with helper_functions.create_graph.
+    - 'calculate_flight_scores': scoring the flight packages of every edge of the graph.
+    - 'render': building the plotly figure of the whole graph, like visualize_new_graph does before showing it.
+    - 'insert_sequence': building the decision tree of a country trait file with Tree.insert_sequence.
+    - 'matchmaking': building a CountryMatcher from a country trait file and matching the traits of every country.
+
+The synthetic datasets are generated offline and deterministically from a seed, so every run of the suite measures
+the same data. Generated files are kept in DATA_DIR and reused by later runs.
+
+Wall time is the best of several runs of a stage (only one run for the largest datasets). Peak memory is measured
+with tracemalloc in a separate run, so tracing does not slow down the timed runs.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from typing import Any, Callable, Optional
+import argparse
+import csv
+import gc
+import io
+import json
+import os
+import platform
+import random
+import time
+import tracemalloc
+import zipfile
+import numpy as np
+import data_classes
+import flight_cache
+import flight_index
+import flight_visualization
+import helper_functions
+
+DATA_DIR = 'CSV Files/benchmark_data'
+
+# The number of rows of the synthetic flight datasets.
+FLIGHT_SIZES = (10_000, 1_000_000, 10_000_000)
+
+# The (number of countries, number of traits) of the synthetic country trait files.
+TRAIT_SIZES = ((1_000, 20), (10_000, 60))
+
+# Stages processing at least this many items are only timed once.
+SINGLE_RUN_ITEMS = 1_000_000
+
+FLIGHT_HEADER = ['from_airport_code', 'from_country', 'dest_airport_code', 'dest_country', 'aircraft_type',
+                 'airline_number', 'airline_name', 'flight_number', 'departure_time', 'arrival_time', 'duration',
+                 'stops', 'price', 'currency', 'co2_emissions', 'avg_co2_emission_for_this_route', 'co2_percentage',
+                 'scan_date']
+
+AIRLINES = ('Air Canada', 'Lufthansa', 'ANA', 'LATAM', 'Iberia', 'Delta', 'United', 'Emirates', 'Qantas', 'KLM')
+AIRCRAFT = ('Boeing 787', 'Airbus A320', 'Boeing 737', 'Airbus A350', 'Embraer 190', 'Airbus A321', 'Boeing 777')
+
+
+def generate_flight_dataset(path: str, num_rows: int, airport_coords: dict[str, tuple[float, float]],
+                            seed: int = 0) -> None:
+    """
+    Write a zip file holding a synthetic flight dataset with num_rows rows between the airports of airport_coords
+    to path. The same arguments always generate the same file contents.
+
+    About 1% of the rows are incomplete (they have no price), like in the real dataset.
+    """
+    rng = random.Random(seed)
+    codes = sorted(airport_coords)
+    countries = {code: f'Country {rng.randrange(len(codes) // 2 + 1)}' for code in codes}
+
+    member = zipfile.ZipInfo('flight_data.csv', date_time=(2024, 1, 1, 0, 0, 0))  # so the zip bytes are reproducible
+    member.compress_type = zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(path, 'w') as zip_ref, zip_ref.open(member, 'w', force_zip64=True) as raw_file, \
+            io.TextIOWrapper(raw_file, encoding='utf-8', newline='') as text_file:
+        writer = csv.writer(text_file)
+        writer.writerow(FLIGHT_HEADER)
+        for i in range(num_rows):
+            home, dest = rng.sample(codes, 2)
+            stops = rng.randint(0, 2)
+            aircraft = '|'.join(rng.choice(AIRCRAFT) for _ in range(stops + 1))
+            airline = rng.choice(AIRLINES)
+            price = '' if rng.random() < 0.01 else f'{rng.uniform(100, 3000):.1f}'
+            emissions = rng.randint(100_000, 2_000_000)
+            writer.writerow([home, countries[home], dest, countries[dest], aircraft, 'X', f'[{airline}| {airline}]',
+                             f'F{i}', '', '', '', stops, price, 'USD', emissions, '', '', ''])
+
+
+def generate_trait_file(path: str, num_rows: int, num_traits: int, seed: int = 0) -> None:
+    """
+    Write a trait file in the format of 'CSV Files/country_traits.csv', with num_rows countries and num_traits
+    random traits generated from the given seed, to path.
+    """
+    rng = random.Random(seed)
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['Country'] + [f'Trait {i}' for i in range(num_traits)])
+        for i in range(num_rows):
+            writer.writerow([f'Country {i}'] + [rng.choice(('Yes', 'No')) for _ in range(num_traits)])
+
+
+def measure(stage: Callable[[], Any], items: int, memory: bool = True) -> dict[str, float]:
+    """
+    Run the given stage, which processes the given number of items, and return its wall time in seconds, its peak
+    traced memory in bytes (if memory is True) and its throughput in items per second.
+    """
+    repeats = 1 if items >= SINGLE_RUN_ITEMS else 3
+    seconds = float('inf')
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        stage()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    result = {'seconds': seconds, 'items': items, 'throughput': items / seconds if seconds > 0 else float('inf')}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            stage()
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return result
+
+
+def flight_benchmarks(num_rows: int, data_dir: str = DATA_DIR, seed: int = 0,
+                      memory: bool = True) -> dict[str, dict[str, float]]:
+    """
+    Return the results of the flight dataset stages on a synthetic dataset with num_rows rows, generating the
+    dataset in data_dir first if it was not generated yet.
+    """
+    airport_coords = helper_functions.get_airport_coordinates()
+    zip_path = os.path.join(data_dir, f'flights_{num_rows}_{seed}.csv.zip')
+    cache_dir = os.path.join(data_dir, f'flights_{num_rows}_{seed}_cache')
+    if not os.path.exists(zip_path):
+        os.makedirs(data_dir, exist_ok=True)
+        generate_flight_dataset(zip_path + '.tmp', num_rows, airport_coords, seed)
+        os.replace(zip_path + '.tmp', zip_path)
+
+    results = {'ingest': measure(lambda: flight_cache.build_flight_cache(zip_path, cache_dir), num_rows, memory)}
+
+    columns = flight_cache.load_flight_cache(zip_path, cache_dir)
+    index = flight_index.FlightIndex.from_columns(columns)
+    results['create_graph'] = measure(lambda: helper_functions.create_graph(airport_coords, index=index),
+                                      len(columns), memory)
+
+    graph = helper_functions.create_graph(airport_coords, index=index)
+    edges = [flights for vertex in graph.all_verticies() for neighbour, flights in vertex.neighbours.items()
+             if vertex.airport_code < neighbour.airport_code]
+    results['calculate_flight_scores'] = measure(
+        lambda: [helper_functions.calculate_flight_scores(flights, (0.2, 0.2, 0.6)) for flights in edges],
+        sum(len(flights) for flights in edges), memory)
+
+    results['render'] = measure(lambda: flight_visualization.build_graph_figure(graph, airport_coords), len(edges),
+                                memory)
+    return results
+
+
+def trait_benchmarks(num_rows: int, num_traits: int, data_dir: str = DATA_DIR, seed: int = 0,
+                     memory: bool = True) -> dict[str, dict[str, float]]:
+    """
+    Return the results of the country matching stages on a synthetic trait file with num_rows countries and
+    num_traits traits, generating the file in data_dir first if it was not generated yet.
+    """
+    trait_file = os.path.join(data_dir, f'traits_{num_rows}_{num_traits}_{seed}.csv')
+    if not os.path.exists(trait_file):
+        os.makedirs(data_dir, exist_ok=True)
+        generate_trait_file(trait_file + '.tmp', num_rows, num_traits, seed)
+        os.replace(trait_file + '.tmp', trait_file)
+
+    with open(trait_file) as csv_file:
+        queries = [[value != 'No' for value in row[1:]] for row in csv.reader(csv_file)][1:]
+
+    def matchmaking() -> None:
+        """Build a matcher from the trait file and match the traits of every country."""
+        matcher = data_classes.CountryMatcher.from_file(trait_file)
+        for query in queries:
+            matcher.match(query)
+
+    return {'insert_sequence': measure(lambda: data_classes.build_decision_tree(trait_file), num_rows, memory),
+            'matchmaking': measure(matchmaking, num_rows, memory)}
+
+
+def run_suite(flight_sizes: tuple[int, ...] = FLIGHT_SIZES,
+              trait_sizes: tuple[tuple[int, int], ...] = TRAIT_SIZES, data_dir: str = DATA_DIR, seed: int = 0,
+              memory: bool = True) -> dict[str, Any]:
+    """
+    Return the results of every stage on the synthetic datasets of the given sizes, in the format written by
+    write_results.
+
+    Every result is keyed by '<stage>/<dataset>', where the dataset is 'flights_<rows>' or
+    'traits_<countries>x<traits>'.
+    """
+    results = {}
+    for num_rows in flight_sizes:
+        for stage, result in flight_benchmarks(num_rows, data_dir, seed, memory).items():
+            results[f'{stage}/flights_{num_rows}'] = result
+
+    for num_rows, num_traits in trait_sizes:
+        for stage, result in trait_benchmarks(num_rows, num_traits, data_dir, seed, memory).items():
+            results[f'{stage}/traits_{num_rows}x{num_traits}'] = result
+
+    return {'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                            'machine': platform.machine(), 'system': platform.system(), 'cpus': os.cpu_count(),
+                            'seed': seed, 'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')},
+            'results': results}
+
+
+def write_results(report: dict[str, Any], path: str) -> None:
+    """Write the given report of run_suite to path as JSON."""
+    with open(path, 'w') as json_file:
+        json.dump(report, json_file, indent=2, sort_keys=True)
+
+
+def _parse_sizes(text: str) -> tuple[int, ...]:
+    """Return the comma-separated sizes in text, which may use k and M suffixes (for example '10k,1M')."""
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    sizes = []
+    for size in text.split(','):
+        size = size.strip().lower()
+        sizes.append(int(float(size[:-1]) * multipliers[size[-1]]) if size[-1] in multipliers else int(size))
+    return tuple(sizes)
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    """Run the suite with the given command line arguments and write its results."""
+    parser = argparse.ArgumentParser(description='Run the Verde Voyage benchmark suite.')
+    parser.add_argument('--output', default='benchmark_results.json', help='the JSON file to write the results to')
+    parser.add_argument('--sizes', type=_parse_sizes, default=FLIGHT_SIZES,
+                        help='the comma-separated numbers of rows of the flight datasets, such as 10k,1M,10M')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='the directory of the generated datasets')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the generated datasets')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory measurements')
+    options = parser.parse_args(args)
+
+    report = run_suite(options.sizes, TRAIT_SIZES, options.data_dir, options.seed, not options.no_memory)
+    write_results(report, options.output)
+    for key, result in report['results'].items():
+        peak = f'{result["peak_bytes"] / 2 ** 20:9.1f} MiB' if 'peak_bytes' in result else ''
+        print(f'{key:>40}: {result["seconds"] * 1000:10.1f} ms {result["throughput"]:14.0f} items/s {peak}')
+
+
+if __name__ == '__main__':
+    main()
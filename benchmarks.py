@@ -0,0 +1,418 @@
+"""Verde Voyage: Performance benchmarks
+
+Module Description
+==================
+This module contains the benchmarks we use to measure the performance of our project. Running this module prints
+the results of every benchmark on the flight dataset in 'CSV Files'.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from typing import Callable
+import asyncio
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+import numpy as np
+import benchmark_suite
+import compact_graph
+import data_classes
+import flight_cache
+import flight_index
+import flight_reader
+import flight_visualization
+import graph_snapshot
+import helper_functions
+import parallel_loader
+import query_cache
+import voyage_service
+
+FLIGHT_ZIP_FILE = 'CSV Files/flight_data.csv.zip'
+
+
+def compare_load_times(zip_path: str = FLIGHT_ZIP_FILE) -> dict[str, float]:
+    """
+    Return the time in seconds taken by each way of loading the flight dataset in zip_path.
+
+    The returned mapping has the following keys:
+        - 'extract_and_parse': the original start-up path, which extracts the zip file, then builds the airport and
+            country sets with countries_and_airports and parses the CSV file into a FlightIndex.
+        - 'stream_and_parse': streaming the zip file without extracting it, building the airport and country sets
+            and the full graph in a single pass with load_flight_data.
+        - 'build_cache': converting the zip file into the columnar cache (done only once per version of the data).
+        - 'mmap_cache': memory-mapping an existing cache and indexing it, which is what every later run does.
+    """
+    timings = {}
+    work_dir = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            csv_file = os.path.join(work_dir, zip_ref.namelist()[0])
+            zip_ref.extractall(work_dir)
+        helper_functions.countries_and_airports(csv_file)
+        flight_index.load_flight_index(csv_file)
+        timings['extract_and_parse'] = time.perf_counter() - start
+
+        airport_coords = helper_functions.get_airport_coordinates()
+        start = time.perf_counter()
+        helper_functions.load_flight_data(airport_coords, zip_path)
+        timings['stream_and_parse'] = time.perf_counter() - start
+
+        cache_dir = os.path.join(work_dir, 'flight_cache')
+        start = time.perf_counter()
+        flight_cache.build_flight_cache(zip_path, cache_dir)
+        timings['build_cache'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        columns = flight_cache.load_flight_cache(zip_path, cache_dir)
+        flight_index.FlightIndex.from_columns(columns)
+        timings['mmap_cache'] = time.perf_counter() - start
+    finally:
+        shutil.rmtree(work_dir)
+
+    return timings
+
+
+def compare_parallel_loading(zip_path: str = FLIGHT_ZIP_FILE, worker_counts: tuple[int, ...] = (1, 2, 4),
+                             chunk_size: int = 1 << 20) -> dict[str, float]:
+    """
+    Return the time in seconds taken to parse the CSV file in zip_path into columns, serially with
+    flight_cache.build_flight_cache (key 'serial') and with parallel_loader.load_flight_columns for each number of
+    workers in worker_counts (keys 'workers_1', 'workers_2', ...).
+
+    The CSV file is extracted first, so the workers read their byte ranges of it in parallel.
+    """
+    timings = {}
+    work_dir = tempfile.mkdtemp()
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            csv_file = os.path.join(work_dir, zip_ref.namelist()[0])
+            zip_ref.extractall(work_dir)
+
+        start = time.perf_counter()
+        flight_cache.build_flight_cache(csv_file, os.path.join(work_dir, 'flight_cache'))
+        timings['serial'] = time.perf_counter() - start
+
+        for workers in worker_counts:
+            start = time.perf_counter()
+            parallel_loader.load_flight_columns(csv_file, workers, chunk_size)
+            timings[f'workers_{workers}'] = time.perf_counter() - start
+    finally:
+        shutil.rmtree(work_dir)
+
+    return timings
+
+
+def compare_graph_memory(zip_path: str = FLIGHT_ZIP_FILE) -> dict[str, int]:
+    """
+    Return the memory in bytes retained by the full flight graph in each representation, as measured by tracemalloc.
+
+    The returned mapping has the following keys:
+        - 'graph': a data_classes.Graph, built by load_flight_data. The route summary load_flight_data builds with it
+            is dropped before the memory is read, so only the graph is counted.
+        - 'compact_graph': a compact_graph.CompactGraph, built from the memory-mapped columnar cache. The
+            memory-mapped columns themselves are not counted, since they are backed by the cache file.
+    """
+    airport_coords = helper_functions.get_airport_coordinates()
+    sizes = {}
+    work_dir = tempfile.mkdtemp()
+    try:
+        columns = flight_cache.build_flight_cache(zip_path, os.path.join(work_dir, 'flight_cache'))
+        del columns
+        columns = flight_cache.load_flight_cache(zip_path, os.path.join(work_dir, 'flight_cache'))
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        graph = helper_functions.load_flight_data(airport_coords, zip_path)[1]  # the route summary is freed here
+        sizes['graph'] = tracemalloc.get_traced_memory()[0] - before
+        del graph
+
+        before = tracemalloc.get_traced_memory()[0]
+        graph = compact_graph.CompactGraph.from_columns(columns, airport_coords)
+        sizes['compact_graph'] = tracemalloc.get_traced_memory()[0] - before
+        del graph, columns
+    finally:
+        tracemalloc.stop()
+        shutil.rmtree(work_dir)
+
+    return sizes
+
+
+def compare_worker_startup(zip_path: str = FLIGHT_ZIP_FILE) -> dict[str, float]:
+    """
+    Return the time in seconds and the memory in bytes (as measured by tracemalloc) that one more worker process
+    spends to get the full flight graph, by building a compact_graph.CompactGraph from the columnar cache and by
+    attaching to a published graph_snapshot.
+
+    The returned mapping has the keys 'build_seconds', 'build_bytes', 'attach_seconds' and 'attach_bytes'.
+    """
+    airport_coords = helper_functions.get_airport_coordinates()
+    report = {}
+    work_dir = tempfile.mkdtemp()
+    try:
+        columns = flight_cache.load_flight_cache(zip_path, os.path.join(work_dir, 'flight_cache'))
+        graph_snapshot.publish_snapshot(compact_graph.CompactGraph.from_columns(columns, airport_coords),
+                                        os.path.join(work_dir, 'snapshots'))
+
+        for name, load in [('build', lambda: compact_graph.CompactGraph.from_columns(columns, airport_coords)),
+                           ('attach', lambda: graph_snapshot.attach_snapshot(os.path.join(work_dir, 'snapshots')))]:
+            tracemalloc.start()
+            start = time.perf_counter()
+            graph = load()
+            report[f'{name}_seconds'] = time.perf_counter() - start
+            report[f'{name}_bytes'] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del graph
+    finally:
+        shutil.rmtree(work_dir)
+
+    return report
+
+
+class _DictVertex:
+    """A vertex with the same attributes as data_classes._Vertex, stored in a per-instance __dict__ like before
+    _Vertex used __slots__."""
+
+    def __init__(self, airport_code: str, country_name: str, neighbours: dict, coordinates: tuple[float, float]) -> None:
+        """Initialize a vertex with the given attributes."""
+        self.airport_code = airport_code
+        self.country_name = country_name
+        self.neighbours = neighbours
+        self.coordinates = coordinates
+
+
+def record_memory_report(zip_path: str = FLIGHT_ZIP_FILE) -> dict[str, float]:
+    """
+    Return the memory in bytes used per vertex and per flight package by the previous and current graph records, as
+    measured by tracemalloc on the complete rows of the flight dataset in zip_path.
+
+    The returned mapping has the following keys:
+        - 'vertex_dict', 'vertex_slots': bytes per vertex object, with a per-instance __dict__ and with the
+            __slots__ of data_classes._Vertex.
+        - 'package_list', 'package_interned': bytes per flight package, for a fresh (airline, aircraft) key with a
+            [price, stops, emissions] list, and for an interned key with a data_classes.FlightInfo. The interned
+            packages are counted together with the intern table they are built with.
+    """
+    rows = [row for row in flight_reader.iter_flight_rows(zip_path) if flight_index.is_complete_row(row)]
+    airports = {row[0]: row[1] for row in rows}
+    airports.update({row[2]: row[3] for row in rows})
+
+    def measure(build: Callable[[], list], count: int) -> float:
+        """Return the bytes retained per item by the objects returned by build."""
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        objects = build()
+        size = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del objects
+        return size / max(count, 1)
+
+    def interned_packages() -> list:
+        """Return the interned records of every row, and the new intern table they were built with."""
+        packages = {}
+        records = [(helper_functions.intern_flight_package(row[6], row[4], packages),
+                    data_classes.FlightInfo(float(row[12]), int(row[11]), int(row[14]))) for row in rows]
+        return [records, packages]
+
+    report = {
+        'vertex_dict': measure(lambda: [_DictVertex(code, country, {}, (0.0, 0.0)) for code, country in airports.items()],
+                               len(airports)),
+        'vertex_slots': measure(lambda: [data_classes._Vertex(code, country, {}, (0.0, 0.0))
+                                         for code, country in airports.items()], len(airports)),
+        'package_list': measure(lambda: [((row[6].split('| ')[0].strip('[]'), tuple(row[4].split('|'))),
+                                          [float(row[12]), int(row[11]), int(row[14])]) for row in rows], len(rows)),
+        'package_interned': measure(interned_packages, len(rows))
+    }
+    return report
+
+
+def compare_figure_rendering(zip_path: str = FLIGHT_ZIP_FILE) -> dict[str, float]:
+    """
+    Return the time in seconds taken to build the figure of the full flight graph, and the size in bytes of its HTML
+    (without the plotly.js library), with one trace per route and with every route batched into a single trace.
+
+    The returned mapping has the keys 'per_route_build', 'per_route_html', 'batched_build' and 'batched_html'.
+    """
+    airport_coords = helper_functions.get_airport_coordinates()
+    _, graph = helper_functions.load_flight_data(airport_coords, zip_path)
+    report = {}
+    for mode, batch_threshold in [('per_route', sys.maxsize), ('batched', 0)]:
+        start = time.perf_counter()
+        figure = flight_visualization.build_graph_figure(graph, airport_coords, batch_threshold=batch_threshold)
+        report[f'{mode}_build'] = time.perf_counter() - start
+        report[f'{mode}_html'] = len(figure.to_html(include_plotlyjs=False).encode())
+
+    return report
+
+
+def compare_tree_builds(num_rows: int = 10000, num_traits: int = 50, seed: int = 0) -> dict[str, float]:
+    """
+    Return the time in seconds taken by the country matching structures on a synthetic trait file with num_rows
+    countries and num_traits random traits, generated from the given seed.
+
+    The returned mapping has the following keys:
+        - 'build_tree', 'build_matcher': building a data_classes decision Tree and a data_classes.CountryMatcher
+            from the file.
+        - 'traverse_tree', 'match_matcher': looking up the traits of every country in the tree and in the matcher.
+        - 'tree_len': counting the nodes of the tree.
+    """
+    work_dir = tempfile.mkdtemp()
+    try:
+        trait_file = os.path.join(work_dir, 'country_traits.csv')
+        benchmark_suite.generate_trait_file(trait_file, num_rows, num_traits, seed)
+        with open(trait_file) as csv_file:
+            queries = [[value != 'No' for value in row[1:]] for row in csv.reader(csv_file)][1:]
+
+        timings = {}
+        start = time.perf_counter()
+        tree = data_classes.build_decision_tree(trait_file)
+        timings['build_tree'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matcher = data_classes.CountryMatcher.from_file(trait_file)
+        timings['build_matcher'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for query in queries:
+            tree.traverse(query)
+        timings['traverse_tree'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for query in queries:
+            matcher.match(query)
+        timings['match_matcher'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        len(tree)
+        timings['tree_len'] = time.perf_counter() - start
+    finally:
+        shutil.rmtree(work_dir)
+
+    return timings
+
+
+def load_test_service(zip_path: str = FLIGHT_ZIP_FILE, concurrency_levels: tuple[int, ...] = (1, 4, 16, 64),
+                      requests_per_client: int = 25, seed: int = 0) -> dict[int, dict[str, float]]:
+    """
+    Return the latency of a voyage_service.VoyageService over the flight dataset in zip_path, under each number of
+    concurrent in-process clients in concurrency_levels.
+
+    Every client sends requests_per_client requests one after the other, each a random (but seeded) choice among
+    the endpoints of the service, for a random route. Like our traffic, which mostly goes to a few hub routes, the
+    routes are chosen with a Zipf distribution (the n-th route is chosen with a probability proportional to 1 / n).
+    Rankings are requested with random continuous weights, like a user dragging the sliders of the weights, so the
+    hit rate of the ranking cache depends on how many weights query_cache.quantize_weights snaps together, and the
+    load test measures both rankings served from the cache and rankings that have to be scored. Every concurrency
+    level starts with an empty ranking cache.
+
+    The returned mapping maps each concurrency level to its 'p50' and 'p99' latency in seconds, its 'throughput'
+    in requests per second, and the 'hit_rate' of the ranking cache.
+    """
+    work_dir = tempfile.mkdtemp()
+    service = voyage_service.VoyageService.from_cache(zip_path, os.path.join(work_dir, 'flight_cache'))
+    try:
+        routes = [(vertex.airport_code, neighbour.airport_code, neighbour.country_name)
+                  for vertex in service.graph.all_verticies() for neighbour in vertex.neighbours]
+        popularity = [1 / rank for rank in range(1, len(routes) + 1)]
+        num_questions = len(data_classes.TRAVEL_QUESTIONS)
+        report = {}
+        for concurrency in concurrency_levels:
+            rng = random.Random(seed)
+            plans = [[(rng.randrange(5), rng.choices(routes, popularity)[0],
+                       [rng.random() < 0.5 for _ in range(num_questions)],
+                       _slider_weights(rng)) for _ in range(requests_per_client)] for _ in range(concurrency)]
+            service.rankings = query_cache.QueryCache()
+            start = time.perf_counter()
+            latencies = asyncio.run(_run_clients(service, plans))
+            elapsed = time.perf_counter() - start
+            lookups = service.rankings.counters['hits'] + service.rankings.counters['misses']
+            report[concurrency] = {'p50': float(np.percentile(latencies, 50)),
+                                   'p99': float(np.percentile(latencies, 99)),
+                                   'throughput': len(latencies) / elapsed,
+                                   'hit_rate': service.rankings.counters['hits'] / lookups if lookups else 0.0}
+    finally:
+        service.close()
+        shutil.rmtree(work_dir)
+
+    return report
+
+
+async def _run_clients(service: voyage_service.VoyageService, plans: list[list[tuple]]) -> list[float]:
+    """
+    Run one concurrent client for each plan of (endpoint, route, answers, weights) requests, and return every
+    latency.
+    """
+    latencies = []
+
+    async def client(plan: list[tuple]) -> None:
+        """Send the requests of the given plan one after the other."""
+        for endpoint, (home, dest, country), answers, weights in plan:
+            start = time.perf_counter()
+            if endpoint == 0:
+                await service.connections(home)
+            elif endpoint == 1:
+                await service.match_countries(answers, nearest=True)
+            elif endpoint == 2:
+                await service.country_airports(home, country)
+            elif endpoint == 3:
+                await service.optimal_routes(home, dest, weights)
+            else:
+                await service.carbon_statistics(home, dest, 0)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client(plan) for plan in plans))
+    return latencies
+
+
+def _slider_weights(rng: random.Random) -> tuple[float, float, float]:
+    """
+    Return random (price, stops, emissions) weights that add up to 1, uniformly distributed like weights set by
+    dragging continuous sliders.
+    """
+    first, second = sorted((rng.random(), rng.random()))
+    return first, second - first, 1.0 - second
+
+
+def main() -> None:
+    """Run every benchmark on the flight dataset in 'CSV Files' and print its results."""
+    for name, seconds in compare_load_times().items():
+        print(f'{name:>20}: {seconds * 1000:10.1f} ms')
+
+    for name, seconds in compare_parallel_loading().items():
+        print(f'{name:>20}: {seconds * 1000:10.1f} ms')
+
+    for name, size in compare_graph_memory().items():
+        print(f'{name:>20}: {size / 2 ** 20:10.2f} MiB')
+
+    for name, value in compare_worker_startup().items():
+        print(f'{name:>20}: {value * 1000:10.2f} ms' if name.endswith('seconds') else f'{name:>20}: {value / 1024:10.1f} KiB')
+
+    for name, size in record_memory_report().items():
+        print(f'{name:>20}: {size:10.1f} bytes')
+
+    for name, value in compare_figure_rendering().items():
+        print(f'{name:>20}: {value * 1000:10.1f} ms' if name.endswith('build') else f'{name:>20}: {value / 1024:10.1f} KiB')
+
+    for name, seconds in compare_tree_builds().items():
+        print(f'{name:>20}: {seconds * 1000:10.1f} ms')
+
+    for concurrency, latency in load_test_service().items():
+        print(f'{concurrency:>9} clients: p50 {latency["p50"] * 1000:8.2f} ms, p99 {latency["p99"] * 1000:8.2f} ms, '
+              f'{latency["throughput"]:8.0f} requests/s, {latency["hit_rate"]:6.1%} cached rankings')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,486 @@
+"""Verde Voyage: Compact array-backed graph
+
+Module Description
+==================
+This module contains the CompactGraph class, an alternative to data_classes.Graph that stores the airport network in
+a few typed NumPy arrays instead of nested dictionaries. Vertices are identified by integers, adjacency is stored in
+compressed sparse row (CSR) form, every flight package is stored once per edge (rather than once per direction), and
+airline names and aircraft sequences are interned into integer ids.
+
+A CompactGraph answers the same queries as a Graph (get_vertex, get_max_emissions, all_verticies, all_airport_codes,
+get_edge_stats, get_flight_arrays) and has a version like a Graph, and its vertices answer max_emissions,
+get_neighbour, get_neighbors and neighbours lookups, so it can be passed to helper_functions.optimal_routes, the route
+search engines, query_cache and voyage_service unchanged. A CompactGraph is read-only.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from collections.abc import KeysView, Mapping, Set
+from typing import Any, Iterable, Iterator, Optional
+import sys
+import numpy as np
+import data_classes
+import flight_scoring
+
+
+# The names of the array attributes of a CompactGraph.
+ARRAYS = ('coordinates', 'adjacency_offsets', 'adjacency_neighbours', 'adjacency_edges', 'package_offsets', 'airlines',
+          'aircraft', 'prices', 'stops', 'emissions')
+
+
+class CompactVertex:
+    """
+    A lightweight view of one vertex of a CompactGraph.
+
+    Two views of the same vertex of the same graph are equal and have the same hash, so views can be used in sets
+    and as dictionary keys like _Vertex objects.
+
+    Instance Attributes:
+        - graph: The graph this vertex belongs to.
+        - vertex_id: The integer id of this vertex in graph.
+    """
+    __slots__ = ('graph', 'vertex_id')
+    graph: CompactGraph
+    vertex_id: int
+
+    def __init__(self, graph: CompactGraph, vertex_id: int) -> None:
+        """Initialize a view of the vertex with the given id in the given graph."""
+        self.graph = graph
+        self.vertex_id = vertex_id
+
+    def __eq__(self, other: Any) -> bool:
+        """Return whether other is a view of the same vertex of the same graph."""
+        return isinstance(other, CompactVertex) and other.graph is self.graph and other.vertex_id == self.vertex_id
+
+    def __hash__(self) -> int:
+        """Return the hash of this vertex."""
+        return hash((id(self.graph), self.vertex_id))
+
+    @property
+    def airport_code(self) -> str:
+        """The code that uniquely identifies this airport."""
+        return self.graph.codes[self.vertex_id]
+
+    @property
+    def country_name(self) -> str:
+        """The country where this airport is located."""
+        return self.graph.countries[self.vertex_id]
+
+    @property
+    def coordinates(self) -> tuple[float, float]:
+        """The real world (latitude, longitude) coordinates of the airport."""
+        latitude, longitude = self.graph.coordinates[self.vertex_id].tolist()
+        return latitude, longitude
+
+    @property
+    def neighbours(self) -> _NeighbourMap:
+        """A read-only mapping from each neighbour of this vertex to the flight packages between them."""
+        return _NeighbourMap(self.graph, self.vertex_id)
+
+    def max_emissions(self, dest_airport_code: str) -> int:
+        """
+        Return the max CO2 emissions for a flight between self and the given destination airport.
+
+        If dest_airport_code is not a neighbour of self, raise ValueError
+        """
+        edge = self.graph.edge_id(self.vertex_id, self.graph.vertex_id(dest_airport_code))
+        start, end = self.graph.package_offsets[edge], self.graph.package_offsets[edge + 1]
+        return int(self.graph.emissions[start:end].max())
+
+    def get_neighbour(self, airport_code: str) -> Optional[CompactVertex]:
+        """
+        Return the neighbour of this vertex with the given airport code, or None if there is no such neighbour.
+        """
+        neighbour = self.graph._ids.get(airport_code)
+        if neighbour is None or self.graph.find_edge(self.vertex_id, neighbour) < 0:
+            return None
+        return CompactVertex(self.graph, neighbour)
+
+    def get_neighbors(self) -> set[str]:
+        """
+        Return all the airport codes connected to this airport in a set of strings.
+        """
+        codes = self.graph.codes
+        return {codes[neighbour] for neighbour in self.graph.neighbour_ids(self.vertex_id).tolist()}
+
+
+class _NeighbourMap(Mapping):
+    """
+    A read-only mapping from the neighbours of one vertex of a CompactGraph to their flight packages, in the same
+    format as _Vertex.neighbours. Only the packages of the looked-up edge are materialized.
+
+    Instance Attributes:
+        - graph: The graph the vertex belongs to.
+        - vertex_id: The id of the vertex.
+    """
+    graph: CompactGraph
+    vertex_id: int
+
+    def __init__(self, graph: CompactGraph, vertex_id: int) -> None:
+        """Initialize the neighbour mapping of the given vertex."""
+        self.graph = graph
+        self.vertex_id = vertex_id
+
+    def __getitem__(self, neighbour: CompactVertex) -> dict[tuple[str, tuple[str, ...]], data_classes.FlightInfo]:
+        """Return the flight packages between this vertex and the given neighbour."""
+        if not isinstance(neighbour, CompactVertex) or neighbour.graph is not self.graph:
+            raise KeyError(neighbour)
+        try:
+            return self.graph.edge_packages(self.graph.edge_id(self.vertex_id, neighbour.vertex_id))
+        except ValueError:
+            raise KeyError(neighbour) from None
+
+    def __contains__(self, neighbour: Any) -> bool:
+        """Return whether the given vertex is a neighbour of this vertex."""
+        if not isinstance(neighbour, CompactVertex) or neighbour.graph is not self.graph:
+            return False
+        return self.graph.find_edge(self.vertex_id, neighbour.vertex_id) >= 0
+
+    def __iter__(self) -> Iterator[CompactVertex]:
+        """Return an iterator over the neighbours of this vertex, in increasing order of vertex id."""
+        return (CompactVertex(self.graph, neighbour) for neighbour in self.graph.neighbour_ids(self.vertex_id).tolist())
+
+    def __len__(self) -> int:
+        """Return the number of neighbours of this vertex."""
+        return len(self.graph.neighbour_ids(self.vertex_id))
+
+
+class CompactGraph:
+    """
+    A read-only airport network stored in compressed sparse row form.
+
+    Instance Attributes:
+        - version: Always 0, since the flight packages of a CompactGraph never change. Caches keyed on the version of
+            a Graph can hold the results of a CompactGraph too.
+        - codes: The airport code of every vertex, indexed by vertex id.
+        - countries: The country name of every vertex, indexed by vertex id.
+        - coordinates: A (number of vertices, 2) array of the (latitude, longitude) of every vertex.
+        - adjacency_offsets: The neighbours of vertex i are adjacency_neighbours[adjacency_offsets[i]:
+            adjacency_offsets[i + 1]], in increasing order of vertex id.
+        - adjacency_neighbours: The neighbour ids of every vertex, one after the other.
+        - adjacency_edges: The edge id of every entry of adjacency_neighbours. Each undirected edge appears twice
+            in the adjacency arrays but only once in the package arrays.
+        - package_offsets: The flight packages of edge e are the positions package_offsets[e]:package_offsets[e + 1]
+            of the package arrays below, in the order they were first added.
+        - airlines: The airline id of every flight package.
+        - aircraft: The aircraft sequence id of every flight package.
+        - prices: The price of every flight package.
+        - stops: The number of stops of every flight package.
+        - emissions: The carbon emissions (in grams) of every flight package.
+        - airline_names: The airline name of every airline id.
+        - aircraft_sequences: The tuple of aircraft of every aircraft sequence id.
+
+    Private Instance Attributes:
+        - _ids: A mapping from an airport code to its vertex id.
+        - _flight_arrays: A cache of the FlightArrays of each edge id, like Graph's cache.
+    """
+    version: int = 0
+    codes: list[str]
+    countries: list[str]
+    coordinates: np.ndarray
+    adjacency_offsets: np.ndarray
+    adjacency_neighbours: np.ndarray
+    adjacency_edges: np.ndarray
+    package_offsets: np.ndarray
+    airlines: np.ndarray
+    aircraft: np.ndarray
+    prices: np.ndarray
+    stops: np.ndarray
+    emissions: np.ndarray
+    airline_names: list[str]
+    aircraft_sequences: list[tuple[str, ...]]
+    _ids: dict[str, int]
+    _flight_arrays: dict[int, flight_scoring.FlightArrays]
+
+    def __init__(self, vertices: tuple[list[str], list[str], np.ndarray], packages: dict[str, np.ndarray],
+                 airline_names: list[str], aircraft_sequences: list[tuple[str, ...]]) -> None:
+        """
+        Initialize a compact graph.
+
+        vertices holds the codes, countries and (latitude, longitude) coordinates of the vertices. packages maps
+        'home', 'dest', 'airline', 'aircraft', 'price', 'stops' and 'emissions' to one array each, with one entry per
+        flight package: 'home' and 'dest' are vertex ids, and 'airline' and 'aircraft' are ids into airline_names and
+        aircraft_sequences. Every (edge, airline, aircraft) combination must appear only once, and packages must be
+        in the order they should be listed in.
+        """
+        self.codes, self.countries, coordinates = vertices
+        self.coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        self.airline_names = airline_names
+        self.aircraft_sequences = aircraft_sequences
+        self._ids = {code: i for i, code in enumerate(self.codes)}
+        self._flight_arrays = {}
+        num_vertices = len(self.codes)
+
+        # Give every undirected edge an id, and group the packages of each edge together, keeping their order.
+        home = np.asarray(packages['home'], dtype=np.int64)
+        dest = np.asarray(packages['dest'], dtype=np.int64)
+        low, high = np.minimum(home, dest), np.maximum(home, dest)
+        edge_keys, package_edges = np.unique(low * num_vertices + high, return_inverse=True)
+        order = np.argsort(package_edges, kind='stable')
+        self.package_offsets = np.concatenate(([0], np.cumsum(np.bincount(package_edges, minlength=len(edge_keys)))))
+        self.airlines = np.asarray(packages['airline'], dtype=np.int32)[order]
+        self.aircraft = np.asarray(packages['aircraft'], dtype=np.int32)[order]
+        self.prices = np.asarray(packages['price'], dtype=np.float64)[order]
+        self.stops = np.asarray(packages['stops'], dtype=np.int16)[order]
+        self.emissions = np.asarray(packages['emissions'], dtype=np.int64)[order]
+
+        # Store each edge in both directions, sorted by (vertex, neighbour).
+        edge_low, edge_high = edge_keys // max(num_vertices, 1), edge_keys % max(num_vertices, 1)
+        sources = np.concatenate((edge_low, edge_high))
+        targets = np.concatenate((edge_high, edge_low))
+        edges = np.concatenate((np.arange(len(edge_keys)), np.arange(len(edge_keys))))
+        order = np.lexsort((targets, sources))
+        self.adjacency_offsets = np.concatenate(([0], np.cumsum(np.bincount(sources, minlength=num_vertices))))
+        self.adjacency_neighbours = targets[order].astype(np.int32)
+        self.adjacency_edges = edges[order].astype(np.int32)
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray], codes: list[str], countries: list[str],
+                    airline_names: list[str], aircraft_sequences: list[tuple[str, ...]]) -> CompactGraph:
+        """
+        Return the graph with the given arrays (a mapping from every name in ARRAYS to the attribute of that name)
+        and string tables, using the arrays as they are, without copying them.
+
+        This is how a graph is restored from arrays saved by another graph, for example memory-mapped from a
+        graph_snapshot file.
+        """
+        graph = cls.__new__(cls)
+        graph.codes, graph.countries = codes, countries
+        graph.airline_names, graph.aircraft_sequences = airline_names, aircraft_sequences
+        for name in ARRAYS:
+            setattr(graph, name, arrays[name])
+        graph._ids = {code: i for i, code in enumerate(codes)}
+        graph._flight_arrays = {}
+        return graph
+
+    @classmethod
+    def from_graph(cls, graph: data_classes.Graph) -> CompactGraph:
+        """
+        Return a compact copy of the given graph.
+        """
+        codes = sorted(graph.all_airport_codes())
+        ids = {code: i for i, code in enumerate(codes)}
+        vertices = [graph.get_vertex(code) for code in codes]
+        airline_ids, aircraft_ids = {}, {}
+        columns = {column: [] for column in ('home', 'dest', 'airline', 'aircraft', 'price', 'stops', 'emissions')}
+
+        for i, vertex in enumerate(vertices):
+            for neighbour, flights in vertex.neighbours.items():
+                if ids[neighbour.airport_code] < i:
+                    continue  # every edge is stored in both directions; keep it once
+
+                for (airline, aircraft), flight_info in flights.items():
+                    columns['home'].append(i)
+                    columns['dest'].append(ids[neighbour.airport_code])
+                    columns['airline'].append(airline_ids.setdefault(airline, len(airline_ids)))
+                    columns['aircraft'].append(aircraft_ids.setdefault(aircraft, len(aircraft_ids)))
+                    columns['price'].append(flight_info[0])
+                    columns['stops'].append(flight_info[1])
+                    columns['emissions'].append(flight_info[2])
+
+        vertex_data = (codes, [vertex.country_name for vertex in vertices],
+                       np.array([vertex.coordinates for vertex in vertices], dtype=np.float64))
+        return cls(vertex_data, columns, list(airline_ids), list(aircraft_ids))
+
+    @classmethod
+    def from_columns(cls, columns: Any, airport_coords: dict[str, tuple[float, float]]) -> CompactGraph:
+        """
+        Return the graph that helper_functions.create_graph builds from every row of the dataset, directly from the
+        given flight_cache.FlightColumns, without building any per-row Python objects.
+
+        Like Graph.add_edge, a flight package that appears more than once on an edge keeps the position of its
+        first appearance and the values of its last appearance.
+        """
+        arrays = columns.columns
+        airports = columns.strings['airports']
+        origin = np.asarray(arrays['origin'], dtype=np.int64)
+        dest = np.asarray(arrays['dest'], dtype=np.int64)
+        num_rows = len(origin)
+
+        # The country of an airport is the one of the first row it appears in (like Graph.add_vertex).
+        appearances = np.column_stack((origin, dest)).ravel()
+        appearance_countries = np.column_stack((np.asarray(arrays['origin_country']),
+                                                np.asarray(arrays['dest_country']))).ravel()
+        used, first_appearance = np.unique(appearances, return_index=True)
+        vertex_countries = [columns.strings['countries'][country]
+                            for country in appearance_countries[first_appearance].tolist()]
+        codes = [airports[airport] for airport in used.tolist()]
+        vertex_ids = np.full(len(airports), -1, dtype=np.int64)
+        vertex_ids[used] = np.arange(len(used))
+        home_ids, dest_ids = vertex_ids[origin], vertex_ids[dest]
+
+        # Collapse repeated (edge, airline, aircraft) packages.
+        keys = np.column_stack((np.minimum(home_ids, dest_ids), np.maximum(home_ids, dest_ids),
+                                np.asarray(arrays['airline'], dtype=np.int64),
+                                np.asarray(arrays['aircraft'], dtype=np.int64)))
+        _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        last = np.zeros(len(first), dtype=np.int64)
+        np.maximum.at(last, inverse, np.arange(num_rows))
+        order = np.argsort(first, kind='stable')
+        first, last = first[order], last[order]
+
+        packages = {'home': home_ids[first], 'dest': dest_ids[first],
+                    'airline': np.asarray(arrays['airline'])[first], 'aircraft': np.asarray(arrays['aircraft'])[first],
+                    'price': np.asarray(arrays['price'])[last], 'stops': np.asarray(arrays['stops'])[last],
+                    'emissions': np.asarray(arrays['emissions'])[last]}
+        aircraft_sequences = [tuple(sys.intern(name) for name in aircraft.split('|'))
+                              for aircraft in columns.strings['aircraft']]
+        vertex_data = (codes, vertex_countries, np.array([airport_coords[code] for code in codes], dtype=np.float64))
+        return cls(vertex_data, packages, list(columns.strings['airlines']), aircraft_sequences)
+
+    def vertex_id(self, airport: str) -> int:
+        """
+        Return the vertex id of the given airport code. Raise a ValueError if it is not in this graph.
+        """
+        if airport not in self._ids:
+            raise ValueError
+        return self._ids[airport]
+
+    def neighbour_ids(self, vertex_id: int) -> np.ndarray:
+        """
+        Return the ids of the neighbours of the given vertex, in increasing order.
+        """
+        return self.adjacency_neighbours[self.adjacency_offsets[vertex_id]:self.adjacency_offsets[vertex_id + 1]]
+
+    def find_edge(self, vertex1: int, vertex2: int) -> int:
+        """
+        Return the id of the edge between the two given vertices, or -1 if they are not adjacent.
+
+        The neighbours of a vertex are sorted, so the lookup is a binary search.
+        """
+        start, end = self.adjacency_offsets[vertex1], self.adjacency_offsets[vertex1 + 1]
+        position = start + int(np.searchsorted(self.adjacency_neighbours[start:end], vertex2))
+        if position < end and self.adjacency_neighbours[position] == vertex2:
+            return int(self.adjacency_edges[position])
+        return -1
+
+    def edge_id(self, vertex1: int, vertex2: int) -> int:
+        """
+        Return the id of the edge between the two given vertices. Raise a ValueError if they are not adjacent.
+        """
+        edge = self.find_edge(vertex1, vertex2)
+        if edge < 0:
+            raise ValueError
+        return edge
+
+    def edge_packages(self, edge: int) -> dict[tuple[str, tuple[str, ...]], data_classes.FlightInfo]:
+        """
+        Return the flight packages of the given edge, in the format of the values of _Vertex.neighbours.
+        """
+        start, end = int(self.package_offsets[edge]), int(self.package_offsets[edge + 1])
+        airlines = self.airlines[start:end].tolist()
+        aircraft = self.aircraft[start:end].tolist()
+        prices = self.prices[start:end].tolist()
+        stops = self.stops[start:end].tolist()
+        emissions = self.emissions[start:end].tolist()
+        return {(self.airline_names[airlines[i]], self.aircraft_sequences[aircraft[i]]):
+                data_classes.FlightInfo(prices[i], stops[i], emissions[i]) for i in range(end - start)}
+
+    def get_max_emissions(self, home_airport_code: str, dest_airport_code: str) -> float:
+        """
+        Return the max CO2 emissions for a flight between the two given airports.
+        """
+        return self.get_vertex(home_airport_code).max_emissions(dest_airport_code)
+
+    def get_edge_stats(self, airport1: str, airport2: str) -> data_classes.EdgeStats:
+        """
+        Return the aggregates of the flight packages on the edge between the two given airports, computed from the
+        package arrays of the edge.
+
+        Raise a ValueError if the two airports are not adjacent in this graph.
+        """
+        edge = self.edge_id(self.vertex_id(airport1), self.vertex_id(airport2))
+        start, end = int(self.package_offsets[edge]), int(self.package_offsets[edge + 1])
+        prices, stops, emissions = self.prices[start:end], self.stops[start:end], self.emissions[start:end]
+        stats = data_classes.EdgeStats(data_classes.FlightInfo(float(prices.min()), int(stops.min()),
+                                                               int(emissions.min())))
+        stats.add(data_classes.FlightInfo(float(prices.max()), int(stops.max()), int(emissions.max())))
+        return stats
+
+    def get_flight_arrays(self, airport1: str, airport2: str) -> flight_scoring.FlightArrays:
+        """
+        Return the NumPy arrays of the flight packages on the edge between the two given airports.
+
+        Raise a ValueError if the two airports are not adjacent in this graph.
+        """
+        edge = self.edge_id(self.vertex_id(airport1), self.vertex_id(airport2))
+        if edge not in self._flight_arrays:
+            start, end = int(self.package_offsets[edge]), int(self.package_offsets[edge + 1])
+            values = np.column_stack((self.prices[start:end], self.stops[start:end], self.emissions[start:end]))
+            self._flight_arrays[edge] = flight_scoring.FlightArrays.from_values(self.edge_packages(edge), values)
+
+        return self._flight_arrays[edge]
+
+    def get_vertex(self, airport: str) -> CompactVertex:
+        """
+        Return the vertex object associated with the given airport code.
+        """
+        return CompactVertex(self, self.vertex_id(airport))
+
+    def all_verticies(self) -> Set[CompactVertex]:
+        """
+        Return all the vertex objects in this graph, as a read-only set-like view. Checking membership takes
+        constant time and does not create any vertex objects.
+        """
+        return _CompactVertexView(self)
+
+    def all_airport_codes(self) -> KeysView[str]:
+        """
+        Return all the airport codes in this graph, as a read-only set-like view.
+        """
+        return self._ids.keys()
+
+
+class _CompactVertexView(Set):
+    """
+    A read-only set-like view of the vertices of a CompactGraph.
+
+    Instance Attributes:
+        - graph: The graph whose vertices are viewed.
+    """
+    __slots__ = ('graph',)
+    graph: CompactGraph
+
+    def __init__(self, graph: CompactGraph) -> None:
+        """Initialize a view of the vertices of the given graph."""
+        self.graph = graph
+
+    @classmethod
+    def _from_iterable(cls, it: Iterable[CompactVertex]) -> set[CompactVertex]:
+        """Return the result of a set operation on this view (such as view - other) as a new set of vertices."""
+        return set(it)
+
+    def __contains__(self, vertex: Any) -> bool:
+        """Return whether the given vertex belongs to the graph."""
+        return isinstance(vertex, CompactVertex) and vertex.graph is self.graph and 0 <= vertex.vertex_id < len(self)
+
+    def __iter__(self) -> Iterator[CompactVertex]:
+        """Return an iterator over the vertices of the graph."""
+        return (CompactVertex(self.graph, i) for i in range(len(self)))
+
+    def __len__(self) -> int:
+        """Return the number of vertices in the graph."""
+        return len(self.graph.codes)
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['collections.abc', 'sys', 'numpy', 'data_classes', 'flight_scoring'],
+        'max-nested-blocks': 4,
+        'max-locals': 30,
+        'max-statements': 80
+    })
@@ -0,0 +1,105 @@
+"""Verde Voyage: Benchmark comparison
+
+Module Description
+==================
+This module compares the results of a run of benchmark_suite.py with a stored baseline, and flags every stage whose
+wall time or peak memory grew by more than a threshold. Running it exits with status 1 if there is a regression, so
+it can fail a CI job:
+
+    python compare_benchmarks.py baseline.json benchmark_results.json --threshold 0.1
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from typing import Any, NamedTuple, Optional
+import argparse
+import json
+import sys
+
+# The metrics compared for every stage. A higher value is worse for each of them.
+METRICS = ('seconds', 'peak_bytes')
+
+
+class Change(NamedTuple):
+    """
+    The change of one metric of one benchmark between the baseline and the current results.
+
+    Instance Attributes:
+        - benchmark: The key of the benchmark, such as 'create_graph/flights_10000'.
+        - metric: The metric, one of METRICS.
+        - baseline: The value of the metric in the baseline.
+        - current: The value of the metric in the current results.
+        - ratio: current / baseline.
+    """
+    benchmark: str
+    metric: str
+    baseline: float
+    current: float
+    ratio: float
+
+
+def load_results(path: str) -> dict[str, dict[str, float]]:
+    """Return the results of the benchmark report in the given JSON file."""
+    with open(path) as json_file:
+        return json.load(json_file)['results']
+
+
+def compare_results(baseline: dict[str, dict[str, Any]],
+                    current: dict[str, dict[str, Any]]) -> list[Change]:
+    """
+    Return the change of every metric of every benchmark in both baseline and current, sorted from the largest
+    increase to the largest decrease.
+    """
+    changes = []
+    for benchmark in sorted(baseline.keys() & current.keys()):
+        for metric in METRICS:
+            if metric in baseline[benchmark] and metric in current[benchmark]:
+                before, after = baseline[benchmark][metric], current[benchmark][metric]
+                ratio = after / before if before > 0 else (1.0 if after == before else float('inf'))
+                changes.append(Change(benchmark, metric, before, after, ratio))
+
+    changes.sort(key=lambda change: change.ratio, reverse=True)
+    return changes
+
+
+def find_regressions(changes: list[Change], threshold: float = 0.1) -> list[Change]:
+    """Return the changes that grew by more than the given fraction of their baseline."""
+    return [change for change in changes if change.ratio > 1 + threshold]
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    """
+    Compare the benchmark reports given on the command line, print every change and return the exit status: 1 if
+    there is a regression, and 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(description='Compare benchmark results with a baseline.')
+    parser.add_argument('baseline', help='the JSON report of the baseline run')
+    parser.add_argument('current', help='the JSON report of the run to check')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='the largest allowed relative increase of a metric (default: 0.1, that is 10%%)')
+    options = parser.parse_args(args)
+
+    baseline, current = load_results(options.baseline), load_results(options.current)
+    changes = compare_results(baseline, current)
+    regressions = set(find_regressions(changes, options.threshold))
+
+    for change in changes:
+        flag = 'REGRESSION' if change in regressions else ''
+        print(f'{change.benchmark:>40} {change.metric:>10}: {change.baseline:14.4g} -> {change.current:14.4g} '
+              f'({(change.ratio - 1) * 100:+7.1f}%) {flag}')
+    for benchmark in sorted(baseline.keys() - current.keys()):
+        print(f'{benchmark:>40}: missing from the current results')
+
+    print(f'{len(regressions)} regression(s) above {options.threshold:.0%}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -15,8 +15,115 @@ This file is Copyright (c) 2024 Verde Voyage
 
 """
 from __future__ import annotations
-from typing import Any, Optional
+from collections.abc import KeysView, Set
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
 import csv
+import flight_scoring
+
+
+class FlightInfo(NamedTuple):
+    """
+    The details of one flight package: its ticket price, number of stops and carbon emissions.
+
+    A FlightInfo is an immutable record without a per-instance __dict__. Like the [price, stops, emissions] lists it
+    replaces, it can still be indexed, so flight_info[0], flight_info[1] and flight_info[2] are the price, stops and
+    emissions respectively.
+
+    Instance Attributes:
+        - price: The ticket price in USD.
+        - stops: The number of stops.
+        - emissions: The carbon emissions in grams.
+    """
+    price: float
+    stops: int
+    emissions: int
+
+
+class FlightChange(NamedTuple):
+    """
+    One change to the flight packages of a Graph, as applied by Graph.apply_changes.
+
+    Instance Attributes:
+        - action: 'add' to insert or replace a flight package, 'update' to replace the details of an existing flight
+            package, or 'delete' to remove a flight package (or every flight package of the edge, if package is None).
+        - home_airport, home_country: The airport code and country of one end of the edge.
+        - dest_airport, dest_country: The airport code and country of the other end of the edge.
+        - package: The (airline, aircraft) flight package, or None to delete the whole edge.
+        - flight_info: The new details of the flight package, or None for a deletion.
+
+    Representation Invariants:
+        - self.action in CHANGE_ACTIONS
+        - self.action == 'delete' or (self.package is not None and self.flight_info is not None)
+    """
+    action: str
+    home_airport: str
+    home_country: str
+    dest_airport: str
+    dest_country: str
+    package: Optional[tuple[str, tuple[str, ...]]]
+    flight_info: Optional[FlightInfo]
+
+
+CHANGE_ACTIONS = ('add', 'update', 'delete')
+
+
+class EdgeStats:
+    """
+    The minimum and maximum price, number of stops and carbon emissions of the flight packages on one edge.
+
+    The aggregates are maintained incrementally by Graph.add_edge and recomputed for the edges changed by
+    Graph.apply_changes. One EdgeStats object is shared by both directions of an edge, and it also caches the NumPy
+    arrays of the flight packages of the edge. Graph.apply_changes gives every changed edge a new EdgeStats, so
+    arrays built from the flight packages of a replaced edge are never cached for the edge that replaced it.
+
+    Instance Attributes:
+        - min_price, max_price: The lowest and highest ticket price.
+        - min_stops, max_stops: The lowest and highest number of stops.
+        - min_emissions, max_emissions: The lowest and highest carbon emissions.
+        - arrays: The NumPy arrays of the flight packages of the edge, built the first time the edge is scored, or
+            None if they have not been built since the flight packages last changed.
+    """
+    __slots__ = ('min_price', 'max_price', 'min_stops', 'max_stops', 'min_emissions', 'max_emissions', 'arrays')
+    min_price: float
+    max_price: float
+    min_stops: int
+    max_stops: int
+    min_emissions: int
+    max_emissions: int
+    arrays: Optional[flight_scoring.FlightArrays]
+
+    def __init__(self, flight_info: FlightInfo) -> None:
+        """Initialize the aggregates of an edge with the single given flight package."""
+        self.min_price = self.max_price = flight_info[0]
+        self.min_stops = self.max_stops = flight_info[1]
+        self.min_emissions = self.max_emissions = flight_info[2]
+        self.arrays = None
+
+    def add(self, flight_info: FlightInfo) -> None:
+        """Update the aggregates with a new flight package."""
+        self.min_price, self.max_price = min(self.min_price, flight_info[0]), max(self.max_price, flight_info[0])
+        self.min_stops, self.max_stops = min(self.min_stops, flight_info[1]), max(self.max_stops, flight_info[1])
+        self.min_emissions = min(self.min_emissions, flight_info[2])
+        self.max_emissions = max(self.max_emissions, flight_info[2])
+
+    def is_extreme(self, flight_info: FlightInfo) -> bool:
+        """Return whether any value of the given flight package is one of the aggregates."""
+        return flight_info[0] in (self.min_price, self.max_price) or flight_info[1] in (self.min_stops, self.max_stops) \
+            or flight_info[2] in (self.min_emissions, self.max_emissions)
+
+    def recompute(self, flights: dict[tuple[str, tuple[str, ...]], FlightInfo]) -> None:
+        """Recompute the aggregates from all the given (non-empty) flight packages of the edge."""
+        infos = iter(flights.values())
+        self.__init__(next(infos))
+        for flight_info in infos:
+            self.add(flight_info)
+
+    @classmethod
+    def from_flights(cls, flights: dict[tuple[str, tuple[str, ...]], FlightInfo]) -> EdgeStats:
+        """Return the aggregates of all the given (non-empty) flight packages of an edge."""
+        stats = cls(next(iter(flights.values())))
+        stats.recompute(flights)
+        return stats
 
 
 class _Vertex:
@@ -32,16 +139,24 @@ class _Vertex:
             The intended purpose of this dictionary is to map different flight packages to the same neighbor.
             Therefore, in this dictionary, we store the key as the airline that offers the flight package (str),
             and the sequence of aircraft taken to reach that airport (tuple[str,...]). Once we access the right
-            flight package, we map it to the corresponding list of [price, number of stops, carbon emission_g].
+            flight package, we map it to the corresponding FlightInfo of (price, number of stops, carbon emission_g).
+            Both directions of an edge share the same inner dictionary.
         - coordinates: The real world (latitude, longitude) coordinates of the airport.
+        - edge_stats: A mapping from the airport code of each neighbour to the EdgeStats of the edge between them.
+
+    Private Instance Attributes:
+        - _neighbours_by_code: A mapping from the airport code of each neighbour to its _Vertex object.
     """
+    __slots__ = ('airport_code', 'country_name', 'neighbours', 'coordinates', 'edge_stats', '_neighbours_by_code')
     airport_code: str
     country_name: str
-    neighbours: dict[_Vertex, dict[tuple[str, tuple[str, ...]], list[float | int]]]
+    neighbours: dict[_Vertex, dict[tuple[str, tuple[str, ...]], FlightInfo]]
     coordinates: tuple[float, float]            # latitude and longitude respectively
+    edge_stats: dict[str, EdgeStats]
+    _neighbours_by_code: dict[str, _Vertex]
 
     def __init__(self, airport_code: str, country_name: str,
-                 neighbours: dict[_Vertex, dict[tuple[str, tuple[str, ...]], list[float | int]]],
+                 neighbours: dict[_Vertex, dict[tuple[str, tuple[str, ...]], FlightInfo]],
                  coordinates: tuple[float, float]) -> None:
         """
         Initialize a vertex with the given airport_code and country_name.
@@ -50,6 +165,8 @@ class _Vertex:
         self.country_name = country_name
         self.neighbours = neighbours
         self.coordinates = coordinates
+        self.edge_stats = {}
+        self._neighbours_by_code = {neighbour.airport_code: neighbour for neighbour in neighbours}
 
     def max_emissions(self, dest_airport_code: str) -> int:
         """
@@ -57,26 +174,21 @@ class _Vertex:
 
         If dest_airport_code is not a neighbour of self, raise ValueError
         """
-        for neighbour in self.neighbours:
-            if neighbour.airport_code == dest_airport_code:
-                flight_packages = self.neighbours[neighbour]
-                max_emissions = 0
-                for flight_info in flight_packages.values():
-                    if flight_info[2] > max_emissions:
-                        max_emissions = flight_info[2]
-
-                return max_emissions
-        raise ValueError
+        if dest_airport_code not in self.edge_stats:
+            raise ValueError
+        return self.edge_stats[dest_airport_code].max_emissions
 
-    def get_neighbors(self) -> set[str]:
+    def get_neighbour(self, airport_code: str) -> Optional[_Vertex]:
         """
-        Return all the airport codes connected to this airport in a set of strings.
+        Return the neighbour of this vertex with the given airport code, or None if there is no such neighbour.
         """
-        all_neighbors = set()
-        for airport in self.neighbours:
-            all_neighbors.add(airport.airport_code)
+        return self._neighbours_by_code.get(airport_code)
 
-        return all_neighbors
+    def get_neighbors(self) -> KeysView[str]:
+        """
+        Return all the airport codes connected to this airport, as a read-only set-like view.
+        """
+        return self._neighbours_by_code.keys()
 
 
 class Graph:
@@ -85,13 +197,25 @@ class Graph:
     Airports are vertices with attributes code and country, and edges represent flights which include
     details such as ticket prices, number of stops, and CO2 emissions.
 
+    Changes applied with apply_changes are copy-on-write: the new vertices are built in full next to the old ones and
+    then published with a single assignment, and the version is incremented only after that. The vertices, flight
+    package dictionaries, neighbour mappings and aggregates that readers already hold are never modified, so a
+    reader holding a vertex keeps seeing the graph exactly as it was before the change, and a reader that sees the
+    new version also sees the new vertices.
+
+    Instance Attributes:
+        - version: A counter incremented every time the flight packages of this graph change.
+
     Private Instance Attributes:
         - _vertices: A collection of the vertices contained in this graph. It maps airport_code to its _Vertex object.
     """
+    __slots__ = ('version', '_vertices', '__weakref__')
+    version: int
     _vertices: dict[str, _Vertex]
 
     def __init__(self) -> None:
         """Initialize an empty graph (no vertices or edges)."""
+        self.version = 0
         self._vertices = {}
 
     def add_vertex(self, airport_code: str, country_name: str, coords: tuple[float, float]) -> None:
@@ -103,7 +227,7 @@ class Graph:
             self._vertices[airport_code] = _Vertex(airport_code, country_name, {}, coords)
 
     def add_edge(self, airport1: str, airport2: str,
-                 conn_flight: tuple[tuple[str, tuple[str, ...]], list[float | int]]) -> None:
+                 conn_flight: tuple[tuple[str, tuple[str, ...]], FlightInfo]) -> None:
         """
         Add an edge between the two vertices with the given ariport codes in this graph.
 
@@ -119,11 +243,132 @@ class Graph:
             flight_package, flight_info = conn_flight[0], conn_flight[1]
 
             if v2 not in v1.neighbours:
-                v1.neighbours[v2] = {}
-                v2.neighbours[v1] = {}
+                flights = {flight_package: flight_info}
+                stats = EdgeStats(flight_info)
+                v1.neighbours[v2] = v2.neighbours[v1] = flights
+                v1.edge_stats[airport2] = v2.edge_stats[airport1] = stats
+                v1._neighbours_by_code[airport2] = v2
+                v2._neighbours_by_code[airport1] = v1
+            else:
+                flights = v1.neighbours[v2]
+                stats = v1.edge_stats[airport2]
+                previous = flights.get(flight_package)
+                flights[flight_package] = flight_info
+                if previous is not None and stats.is_extreme(previous):
+                    stats.recompute(flights)  # the replaced package may have been the only one at an extreme
+                else:
+                    stats.add(flight_info)
+                stats.arrays = None
+
+            self.version += 1
+
+    def remove_edge(self, airport1: str, airport2: str,
+                    flight_package: Optional[tuple[str, tuple[str, ...]]] = None) -> bool:
+        """
+        Remove the given flight package from the edge between the two given airports, or the whole edge if no flight
+        package is given. Return whether anything was removed.
+
+        The edge is removed once its last flight package is removed, and so is any airport left without an edge.
+
+        Raise a ValueError if airport1 or airport2 do not appear as vertices in this graph.
+        """
+        v1, v2 = self.get_vertex(airport1), self.get_vertex(airport2)
+        change = FlightChange('delete', airport1, v1.country_name, airport2, v2.country_name, flight_package, None)
+        return self.apply_changes([change], {})['deleted'] > 0
 
-            v1.neighbours[v2].update({flight_package: flight_info})
-            v2.neighbours[v1].update({flight_package: flight_info})
+    def apply_changes(self, changes: list[FlightChange],
+                      airport_coords: dict[str, tuple[float, float]]) -> dict[str, int]:
+        """
+        Apply the given changes to the flight packages of this graph, in order, and return the number of packages
+        'added', 'updated' and 'deleted', the number of changes that were 'skipped' (an update or deletion of a
+        package that does not exist) and the number of 'edges' that changed.
+
+        The changed edges get new flight package dictionaries and aggregates, and the graph is published as a new
+        set of vertices that shares the flight packages, aggregates and cached arrays of every unchanged edge. New
+        airports are added with their coordinates in airport_coords, and airports left without an edge are removed.
+        The version of this graph is incremented once if anything changed, after the new vertices are published.
+        """
+        counts = dict.fromkeys(('added', 'updated', 'deleted', 'skipped', 'edges'), 0)
+        edges = {}      # the sorted pair of airport codes of each changed edge to its new flight packages
+        countries = {}  # the country of every airport of a changed edge
+
+        for change in changes:
+            key = _edge_key(change.home_airport, change.dest_airport)
+            if key not in edges:
+                edges[key] = self._edge_flights(*key)
+            flights = edges[key]
+            countries.setdefault(change.home_airport, change.home_country)
+            countries.setdefault(change.dest_airport, change.dest_country)
+
+            if change.action == 'delete' and change.package is None:
+                counts['deleted'] += len(flights)
+                counts['skipped'] += not flights
+                flights.clear()
+            elif change.action == 'delete':
+                found = flights.pop(change.package, None) is not None
+                counts['deleted' if found else 'skipped'] += 1
+            elif change.action == 'update' and change.package not in flights:
+                counts['skipped'] += 1
+            else:
+                counts['updated' if change.package in flights else 'added'] += 1
+                flights[change.package] = FlightInfo(*change.flight_info)
+
+        changed = {key: flights for key, flights in edges.items() if flights != self._edge_flights(*key)}
+        if changed:
+            self._replace_edges(changed, countries, airport_coords)
+            counts['edges'] = len(changed)
+            self.version += 1
+        return counts
+
+    def _edge_flights(self, airport1: str, airport2: str) -> dict[tuple[str, tuple[str, ...]], FlightInfo]:
+        """
+        Return a copy of the flight packages on the edge between the two given airports (empty if there is no edge).
+        """
+        v1, v2 = self._vertices.get(airport1), self._vertices.get(airport2)
+        if v1 is None or v2 is None or v2 not in v1.neighbours:
+            return {}
+        return dict(v1.neighbours[v2])
+
+    def _replace_edges(self, edges: dict[tuple[str, str], dict[tuple[str, tuple[str, ...]], FlightInfo]],
+                       countries: dict[str, str], airport_coords: dict[str, tuple[float, float]]) -> None:
+        """
+        Replace the flight packages of the given edges (removing the edges that have none left).
+
+        Every vertex is copied, since the neighbour mappings of a vertex refer to the other vertices, and the copies
+        replace the vertices of this graph with a single assignment once they are complete. Every edge keeps its
+        position in the neighbour mappings, and the new edges are added at the end.
+        """
+        vertices = {airport_code: _Vertex(airport_code, vertex.country_name, {}, vertex.coordinates)
+                    for airport_code, vertex in self._vertices.items()}
+        for airport_code in countries:
+            if airport_code not in vertices and any(flights and airport_code in key for key, flights in edges.items()):
+                vertices[airport_code] = _Vertex(airport_code, countries[airport_code], {},
+                                                 airport_coords[airport_code])
+
+        # The flight packages and the aggregates of every changed edge that is left
+        changed = {key: (flights, EdgeStats.from_flights(flights)) for key, flights in edges.items()
+                   if flights and key[0] in vertices and key[1] in vertices}
+        for airport_code, vertex in self._vertices.items():
+            for neighbour, flights in vertex.neighbours.items():
+                key = _edge_key(airport_code, neighbour.airport_code)
+                if key in edges:
+                    if key not in changed:
+                        continue  # the edge was removed
+                    flights, stats = changed[key]
+                else:
+                    stats = vertex.edge_stats[neighbour.airport_code]
+                _link(vertices[airport_code], vertices[neighbour.airport_code], flights, stats)
+
+        for (airport1, airport2), (flights, stats) in changed.items():
+            if vertices[airport2] not in vertices[airport1].neighbours:
+                _link(vertices[airport1], vertices[airport2], flights, stats)
+                _link(vertices[airport2], vertices[airport1], flights, stats)
+
+        for airport_code in {airport_code for key in edges for airport_code in key}:
+            if airport_code in vertices and not vertices[airport_code].neighbours:
+                del vertices[airport_code]
+
+        self._vertices = vertices
 
     def get_max_emissions(self, home_airport_code: str, dest_airport_code: str) -> float:
         """
@@ -132,6 +377,39 @@ class Graph:
         v1 = self._vertices[home_airport_code]
         return v1.max_emissions(dest_airport_code)
 
+    def get_edge_stats(self, airport1: str, airport2: str) -> EdgeStats:
+        """
+        Return the aggregates of the flight packages on the edge between the two given airports.
+
+        Raise a ValueError if the two airports are not adjacent in this graph.
+        """
+        stats = self.get_vertex(airport1).edge_stats.get(airport2)
+        if stats is None:
+            raise ValueError
+        return stats
+
+    def get_flight_arrays(self, airport1: str, airport2: str) -> flight_scoring.FlightArrays:
+        """
+        Return the NumPy arrays of the flight packages on the edge between the two given airports.
+
+        The arrays are cached in the EdgeStats of the edge until its flight packages change. The flights attribute of
+        the returned arrays is the flight package dictionary they were built from, so readers can look up the details
+        of the scored packages even if the edge is changed meanwhile.
+
+        Raise a ValueError if the two airports are not adjacent in this graph.
+        """
+        v1 = self.get_vertex(airport1)
+        flights = v1.neighbours.get(v1.get_neighbour(airport2))
+        if flights is None:
+            raise ValueError
+
+        # The flights and the aggregates are read from the same vertex, which apply_changes never modifies
+        stats = v1.edge_stats[airport2]
+        arrays = stats.arrays
+        if arrays is None or arrays.flights is not flights:
+            arrays = stats.arrays = flight_scoring.FlightArrays(flights)
+        return arrays
+
     def get_vertex(self, airport: str) -> _Vertex:
         """
         Return the vertex object associated with the given airport code.
@@ -141,24 +419,69 @@ class Graph:
         else:
             return self._vertices[airport]
 
-    def all_verticies(self) -> set[_Vertex]:
-        """
-        Return a set of all the vertex objects in this graph.
+    def all_verticies(self) -> Set[_Vertex]:
         """
-        all_vert = set()
-        for vertex in self._vertices.values():
-            all_vert.add(vertex)
-        return all_vert
+        Return all the vertex objects in this graph, as a read-only set-like view.
 
-    def all_airport_codes(self) -> set[str]:
+        The view is not a copy: it reflects later changes to the graph, and checking membership takes constant time.
+        After apply_changes, the view holds the new vertices, which replace the old ones.
         """
-        Return a set of all the airport codes in this graph.
+        return _VertexView(self)
 
+    def all_airport_codes(self) -> KeysView[str]:
         """
-        airport_codes = set()
-        for vertex in self._vertices.values():
-            airport_codes.add(vertex.airport_code)
-        return airport_codes
+        Return all the airport codes in this graph, as a read-only set-like view.
+        """
+        return self._vertices.keys()
+
+
+class _VertexView(Set):
+    """
+    A read-only set-like view of the vertices of a Graph.
+
+    Instance Attributes:
+        - graph: The graph whose vertices are viewed.
+    """
+    __slots__ = ('graph',)
+    graph: Graph
+
+    def __init__(self, graph: Graph) -> None:
+        """Initialize a view of the vertices of the given graph."""
+        self.graph = graph
+
+    @classmethod
+    def _from_iterable(cls, it: Iterable[_Vertex]) -> set[_Vertex]:
+        """Return the result of a set operation on this view (such as view - other) as a new set of vertices."""
+        return set(it)
+
+    def __contains__(self, vertex: Any) -> bool:
+        """Return whether the given vertex belongs to the graph."""
+        return isinstance(vertex, _Vertex) and self.graph._vertices.get(vertex.airport_code) is vertex
+
+    def __iter__(self) -> Iterator[_Vertex]:
+        """Return an iterator over the vertices of the graph."""
+        return iter(self.graph._vertices.values())
+
+    def __len__(self) -> int:
+        """Return the number of vertices in the graph."""
+        return len(self.graph._vertices)
+
+
+def _edge_key(airport1: str, airport2: str) -> tuple[str, str]:
+    """
+    Return the key identifying the (undirected) edge between the two given airports.
+    """
+    return (airport1, airport2) if airport1 <= airport2 else (airport2, airport1)
+
+
+def _link(vertex: _Vertex, neighbour: _Vertex, flights: dict[tuple[str, tuple[str, ...]], FlightInfo],
+          stats: EdgeStats) -> None:
+    """
+    Add neighbour to the neighbours of vertex, with the given flight packages and aggregates of the edge between them.
+    """
+    vertex.neighbours[neighbour] = flights
+    vertex.edge_stats[neighbour.airport_code] = stats
+    vertex._neighbours_by_code[neighbour.airport_code] = neighbour
 
 
 class Tree:
@@ -166,13 +489,20 @@ class Tree:
     Represents a recursive tree data structure.
     Each tree node can contain any type of data and have multiple subtrees, allowing for a recursive structure.
 
+    Every operation walks the tree with an explicit stack or cursor instead of recursing, so deep trees do not hit
+    the recursion limit.
+
     Instance Attributes:
         - _root: The data stored in the root node of the tree. If the tree is empty, _root is None.
         - _subtrees: A list of Tree instances that are the subtrees of the current tree node.
+        - _children: A mapping from the root of each subtree to the first subtree in _subtrees with that root, so a
+            child is found without scanning _subtrees. Subtrees with an unhashable root are not in this mapping, and
+            are found by scanning _subtrees instead.
     """
-
+    __slots__ = ('_root', '_subtrees', '_children')
     _root: Optional[Any]
     _subtrees: list[Tree]
+    _children: dict[Any, Tree]
 
     def __init__(self, root: Optional[Any], subtrees: list[Tree]) -> None:
         """Initialize a new Tree with the given root value and subtrees.
@@ -181,6 +511,9 @@ class Tree:
         """
         self._root = root
         self._subtrees = subtrees
+        self._children = {}
+        for subtree in subtrees:
+            self._index_child(subtree)
 
     def is_empty(self) -> bool:
         """Return whether this tree is empty.
@@ -190,85 +523,92 @@ class Tree:
     def __len__(self) -> int:
         """Return the number of items contained in this tree.
         """
-        if self.is_empty():
-            return 0
-        else:
-            size = 1
-            for subtree in self._subtrees:
-                size += subtree.__len__()
-            return size
+        size = 0
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if not tree.is_empty():
+                size += 1
+                stack.extend(tree._subtrees)
+        return size
 
     def __contains__(self, item: Any) -> bool:
         """Return whether the given is in this tree.
         """
-        if self.is_empty():
-            return False
-        elif self._root == item:
-            return True
-        else:
-            for subtree in self._subtrees:
-                if subtree.__contains__(item):
-                    return True
-            return False
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if tree.is_empty():
+                continue
+            elif tree._root == item:
+                return True
+            stack.extend(tree._subtrees)
+        return False
 
     def traverse(self, path: list[bool]) -> list[Any]:
         """
         This function traverses a decision tree and returna all the leafs at the end of a given path.
         """
-        if self.is_empty():
-            return []
-
-        if not path:
-            leaves = []
-            for subtree in self._subtrees:
-                leaves.extend([subtree._root])
-            return leaves
-
-        direction = path[0]
-        next_path = path[1:]
+        tree = self
+        for direction in path:
+            tree = None if tree.is_empty() else tree._child(direction)
+            if tree is None:
+                return []
 
-        for subtree in self._subtrees:
-            if subtree._root == direction:
-                return subtree.traverse(next_path)
-
-        return []
+        if tree.is_empty():
+            return []
+        return [subtree._root for subtree in tree._subtrees]
 
-    def create_tree(self, items: list) -> Tree:
+    def create_tree(self, items: list, start: int = 0) -> Tree:
         """
-        Create a tree from the provided list, ensuring that each subsequent item is a child of the previous.
+        Create a tree from items[start:], ensuring that each subsequent item is a child of the previous.
 
         Preconditions:
             - self.is_empty()
+            - 0 <= start < len(items)
         """
-        root = items[0]
-        subtrees = []
-        if len(items) > 1:
-            subtree = self.create_tree(items[1:])
-            subtrees.append(subtree)
+        tree = Tree(items[-1], [])
+        for i in range(len(items) - 2, start - 1, -1):
+            tree = Tree(items[i], [tree])
 
-        return Tree(root, subtrees)
+        return tree
 
     def insert_sequence(self, items: list) -> None:
         """
         Insert the given items into this tree.
         """
-        if not items:
-            return
-        elif not self._subtrees:
-            empty_tree = Tree(None, [])
-            self._subtrees.append(empty_tree.create_tree(items))
-            return
-        else:
-            root = items[0]
-            rest_items = items[1:]
-            for subtree in self._subtrees:
-                if subtree._root == root:
-                    subtree.insert_sequence(rest_items)
-                    return
+        tree = self
+        for i, item in enumerate(items):
+            child = tree._child(item)
+            if child is None:
+                tree.add_subtree(Tree(None, []).create_tree(items, i))
+                return
+            tree = child
+
+    def add_subtree(self, subtree: Tree) -> None:
+        """
+        Add the given subtree as the last subtree of this tree.
+        """
+        self._subtrees.append(subtree)
+        self._index_child(subtree)
 
-            empty_tree = Tree(None, [])
-            self._subtrees.append(empty_tree.create_tree(items))
-            return
+    def _index_child(self, subtree: Tree) -> None:
+        """
+        Add the given subtree of this tree to _children, unless a subtree with the same root is already there.
+        """
+        try:
+            self._children.setdefault(subtree._root, subtree)
+        except TypeError:
+            pass  # an unhashable root is found by _child scanning _subtrees
+
+    def _child(self, root: Any) -> Optional[Tree]:
+        """
+        Return the first subtree of this tree with the given root, or None if there is none.
+        """
+        try:
+            return self._children.get(root)
+        except TypeError:
+            return next((subtree for subtree in self._subtrees if subtree._root == root), None)
 
 
 def build_decision_tree(file: str) -> Tree:
@@ -287,6 +627,126 @@ def build_decision_tree(file: str) -> Tree:
     return tree
 
 
+class CountryMatcher:
+    """
+    An index from combinations of travel traits to the countries that have exactly those traits.
+
+    Each combination of traits is stored as a bitmask, where bit i is set if the country has trait i, so finding the
+    countries that match a list of answers is a single dictionary lookup. Countries that match the answers
+    approximately are ranked by the Hamming distance between their bitmask and the bitmask of the answers, that is,
+    by the number of answers they do not match.
+
+    Instance Attributes:
+        - traits: The names of the traits, in the order of the questions.
+
+    Private Instance Attributes:
+        - _by_mask: A mapping from each bitmask to the countries with that bitmask, in the order they were added.
+        - _countries: Every (country, bitmask) pair, in the order they were added.
+
+    Representation Invariants:
+        - all(0 <= mask < 2 ** len(self.traits) for mask in self._by_mask)
+        - len(self._countries) == sum(len(countries) for countries in self._by_mask.values())
+    """
+    __slots__ = ('traits', '_by_mask', '_countries')
+    traits: list[str]
+    _by_mask: dict[int, list[str]]
+    _countries: list[tuple[str, int]]
+
+    def __init__(self, traits: list[str]) -> None:
+        """Initialize a matcher for the given traits, with no countries."""
+        self.traits = traits
+        self._by_mask = {}
+        self._countries = []
+
+    @classmethod
+    def from_file(cls, file: str) -> CountryMatcher:
+        """
+        Return a matcher of the countries in the given file, which has a header row with the trait names, followed
+        by one row per country with its name and a 'Yes' or 'No' for each trait.
+        """
+        with open(file) as csv_file:
+            reader = csv.reader(csv_file)
+            matcher = cls(next(reader)[1:])
+            for row in reader:
+                matcher.add_country(row[0], [x != 'No' for x in row[1:]])
+
+        return matcher
+
+    def add_country(self, country: str, traits: list[bool]) -> None:
+        """
+        Add a country that has every trait i where traits[i] is True.
+
+        Preconditions:
+            - len(traits) == len(self.traits)
+        """
+        mask = answers_to_mask(traits)
+        self._by_mask.setdefault(mask, []).append(country)
+        self._countries.append((country, mask))
+
+    def match(self, answers: list[bool]) -> list[str]:
+        """
+        Return the countries whose traits are exactly the given answers, in the order they were added.
+
+        Preconditions:
+            - len(answers) == len(self.traits)
+        """
+        return list(self._by_mask.get(answers_to_mask(answers), []))
+
+    def nearest(self, answers: list[bool], k: Optional[int] = None) -> list[tuple[str, int]]:
+        """
+        Return the countries ranked by the number of the given answers their traits do not match, as
+        (country, number of mismatches) tuples, from the closest to the furthest match.
+
+        Countries with the same number of mismatches are in the order they were added. If k is given, return only
+        the k closest countries.
+
+        Preconditions:
+            - len(answers) == len(self.traits)
+            - k is None or k >= 0
+        """
+        query = answers_to_mask(answers)
+        distances = {mask: (mask ^ query).bit_count() for mask in self._by_mask}
+        ranked = sorted(self._countries, key=lambda country_mask: distances[country_mask[1]])  # stable
+        return [(country, distances[mask]) for country, mask in ranked[:k]]
+
+    def closest(self, answers: list[bool]) -> list[str]:
+        """
+        Return the countries whose traits match the most of the given answers, in the order they were added. These
+        are the exact matches if there are any.
+
+        Preconditions:
+            - len(answers) == len(self.traits)
+        """
+        ranked = self.nearest(answers)
+        return [country for country, mismatches in ranked if mismatches == ranked[0][1]]
+
+    def __len__(self) -> int:
+        """Return the number of countries in this matcher."""
+        return len(self._countries)
+
+
+def answers_to_mask(answers: list[bool]) -> int:
+    """Return the bitmask of the given answers, where bit i is set if answers[i] is True."""
+    mask = 0
+    for i, answer in enumerate(answers):
+        if answer:
+            mask |= 1 << i
+    return mask
+
+
+_COUNTRY_MATCHERS: dict[str, CountryMatcher] = {}
+
+
+def get_country_matcher(file: str) -> CountryMatcher:
+    """
+    Return the CountryMatcher of the given file, building it the first time it is requested.
+    """
+    if file not in _COUNTRY_MATCHERS:
+        _COUNTRY_MATCHERS[file] = CountryMatcher.from_file(file)
+
+    return _COUNTRY_MATCHERS[file]
+
+
 def get_user_input(questions: list[str]) -> list[bool]:
     """Return the user's answers to a list of Yes/No questions."""
     answers_so_far = []
@@ -308,12 +768,19 @@ TRAVEL_QUESTIONS = [
 ]
 
 
-def run_country_matchmaker(file: str) -> Optional[list[str]]:
+def run_country_matchmaker(file: str, nearest: bool = False) -> Optional[list[str]]:
     """Run a country matching program based on the given file.
+
+    Return the countries that match every answer, or None if there are none. If nearest is True and no country
+    matches every answer, tell the user and return the countries that match the most answers instead.
     """
-    decision_tree = build_decision_tree(file)
+    matcher = get_country_matcher(file)
     char = get_user_input(TRAVEL_QUESTIONS)
-    matches = decision_tree.traverse(char)
+    matches = matcher.match(char)
+    if not matches and nearest:
+        matches = matcher.closest(char)
+        if matches:
+            print('No country matches every answer, so here are the countries that match the most of them.')
     if not matches:
         return None
     else:
@@ -328,8 +795,8 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-line-length': 170,
         'disable': ['E1136', 'W0221'],
-        'extra-imports': ['csv', 'networkx'],
-        'allowed-io': ['get_user_input', 'build_decision_tree', 'run_country_matchmaker'],
+        'extra-imports': ['csv', 'networkx', 'flight_scoring'],
+        'allowed-io': ['get_user_input', 'build_decision_tree', 'run_country_matchmaker', 'CountryMatcher.from_file'],
         'max-nested-blocks': 4,
         'max-locals': 25,
         'max-statements': 80
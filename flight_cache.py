@@ -0,0 +1,294 @@
+"""Verde Voyage: Columnar binary cache of the flight dataset
+
+Module Description
+==================
+This module converts the zipped flight dataset into a compact columnar binary cache, and loads that cache back by
+memory-mapping it. Airport, country, airline and aircraft strings are dictionary-encoded into integer ids, and the
+price, stops and emissions of every flight are stored in NumPy arrays, with one .npy file per column.
+
+The cache is only built once. Every later run memory-maps the columns instead of extracting the zip file and parsing
+its CSV text. The cache is rebuilt automatically whenever the zip file changes.
+
+Each build of the cache is a directory of cache_dir holding the .npy files and a meta.json file, and the CURRENT file
+of cache_dir names the current build. A build is written to a temporary directory, renamed into place, and only
+then published by replacing CURRENT with os.replace (like graph_snapshot.publish_snapshot), so a rebuild never
+changes the files of a build that other processes may have memory-mapped. The build that was current before a
+rebuild is kept for the readers still opening it, and older builds are removed.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from typing import Iterator, Optional
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import flight_index
+import flight_reader
+import instrumentation
+
+FLIGHT_ZIP_FILE = 'CSV Files/flight_data.csv.zip'
+CACHE_DIR = 'CSV Files/flight_cache'
+CACHE_FORMAT_VERSION = 1
+
+# The file naming the current build of a cache directory, and the prefix of the names of build directories.
+CURRENT_FILE = 'CURRENT'
+BUILD_PREFIX = 'build-'
+
+# The string tables of the cache, and the columns that hold ids into each of them.
+STRING_TABLES = ('airports', 'countries', 'airlines', 'aircraft')
+ID_COLUMNS = {'origin': 'airports', 'origin_country': 'countries', 'dest': 'airports', 'dest_country': 'countries',
+              'airline': 'airlines', 'aircraft': 'aircraft'}
+VALUE_COLUMNS = {'stops': np.int16, 'price': np.float64, 'emissions': np.int64}
+
+
+class FlightColumns:
+    """
+    The complete flights of the dataset, stored column by column.
+
+    A FlightColumns object behaves like a read-only sequence of dataset rows: indexing it returns a row in the same
+    layout as the CSV file, so it can be used wherever a list of rows is expected (for example, by
+    flight_index.FlightIndex and helper_functions.create_graph_helper). Only the columns used by this project are
+    filled in; every other column of the returned row is an empty string.
+
+    Instance Attributes:
+        - columns: A mapping from a column name to its NumPy array. The arrays are memory-mapped when the
+            columns are loaded from a cache file.
+        - strings: A mapping from the name of a string table to the strings it contains, in id order.
+        - summary: The home airports, home countries, destination airports and destination countries of every row
+            of the dataset (including incomplete rows), in the format returned by
+            helper_functions.countries_and_airports.
+    """
+    columns: dict[str, np.ndarray]
+    strings: dict[str, list[str]]
+    summary: tuple[set[str], set[str], set[str], set[str]]
+
+    def __init__(self, columns: dict[str, np.ndarray], strings: dict[str, list[str]],
+                 summary: tuple[set[str], set[str], set[str], set[str]]) -> None:
+        """Initialize the columns of the flight dataset with the given arrays, string tables and summary."""
+        self.columns = columns
+        self.strings = strings
+        self.summary = summary
+
+    def __len__(self) -> int:
+        """Return the number of flights stored in these columns."""
+        return len(self.columns['price'])
+
+    def __getitem__(self, position: int) -> list[str]:
+        """
+        Return the flight at the given position as a row in the layout of the flight dataset CSV file.
+        """
+        columns, strings = self.columns, self.strings
+        airports, countries = strings['airports'], strings['countries']
+
+        row = [''] * 15
+        row[0] = airports[columns['origin'][position]]
+        row[1] = countries[columns['origin_country'][position]]
+        row[2] = airports[columns['dest'][position]]
+        row[3] = countries[columns['dest_country'][position]]
+        row[4] = strings['aircraft'][columns['aircraft'][position]]
+        row[6] = strings['airlines'][columns['airline'][position]]
+        row[11] = str(columns['stops'][position])
+        row[12] = repr(float(columns['price'][position]))
+        row[14] = str(columns['emissions'][position])
+        return row
+
+    def __iter__(self) -> Iterator[list[str]]:
+        """Return an iterator over the rows of these columns."""
+        for position in range(len(self)):
+            yield self[position]
+
+
+def file_fingerprint(file: str) -> dict[str, int | str]:
+    """
+    Return the modification time, size and SHA-256 hash of the given file.
+    """
+    sha = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+
+    stat = os.stat(file)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': sha.hexdigest()}
+
+
+def build_flight_cache(zip_path: str = FLIGHT_ZIP_FILE, cache_dir: str = CACHE_DIR) -> FlightColumns:
+    """
+    Convert the flight dataset in the given zip file into a columnar cache in cache_dir, and return its columns.
+
+    The CSV file is streamed straight out of the zip file; nothing is extracted to disk. The new build is only
+    published once all of its files are written, so an interrupted conversion never leaves a cache that looks valid,
+    and readers of the previous build are never affected.
+    """
+    ids = {table: {} for table in STRING_TABLES}
+    id_values = {column: [] for column in ID_COLUMNS}
+    values = {column: [] for column in VALUE_COLUMNS}
+    summary = (set(), set(), set(), set())
+
+    for row in flight_reader.iter_flight_rows(zip_path):
+        summary[0].add(row[0])
+        summary[1].add(row[1].lower())
+        summary[2].add(row[2])
+        summary[3].add(row[3].lower())
+        if not flight_index.is_complete_row(row):
+            continue
+
+        fields = {'origin': row[0], 'origin_country': row[1], 'dest': row[2], 'dest_country': row[3],
+                  'aircraft': row[4], 'airline': row[6].split('| ')[0].strip('[]')}
+        for column, value in fields.items():
+            table = ids[ID_COLUMNS[column]]
+            id_values[column].append(table.setdefault(value, len(table)))
+
+        values['stops'].append(int(row[11]))
+        values['price'].append(float(row[12]))
+        values['emissions'].append(int(row[14]))
+
+    columns = {column: np.array(id_values[column], dtype=np.int32) for column in ID_COLUMNS}
+    columns.update({column: np.array(values[column], dtype=dtype) for column, dtype in VALUE_COLUMNS.items()})
+    strings = {table: list(ids[table]) for table in STRING_TABLES}
+
+    os.makedirs(cache_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='.' + BUILD_PREFIX, dir=cache_dir)
+    build = os.path.basename(work_dir)[1:]
+    for column, array in columns.items():
+        np.save(os.path.join(work_dir, column + '.npy'), array)
+
+    meta = {'format_version': CACHE_FORMAT_VERSION,
+            'build': build,
+            'source': file_fingerprint(zip_path),
+            'rows': len(columns['price']),
+            'strings': strings,
+            'summary': [sorted(names) for names in summary]}
+    with open(os.path.join(work_dir, 'meta.json'), 'w') as meta_file:
+        json.dump(meta, meta_file)
+
+    os.rename(work_dir, os.path.join(cache_dir, build))
+    previous = current_build(cache_dir)
+    _write_atomically(os.path.join(cache_dir, CURRENT_FILE), build)
+    _remove_old_builds(cache_dir, (build, previous))
+    return FlightColumns(columns, strings, summary)
+
+
+def read_flight_cache(cache_dir: str = CACHE_DIR) -> tuple[dict, FlightColumns]:
+    """
+    Return the metadata and the memory-mapped columns of the cache in cache_dir.
+
+    Raise FileNotFoundError if there is no complete cache in cache_dir.
+    """
+    build = current_build(cache_dir)
+    if build is None:
+        raise FileNotFoundError
+    build_dir = os.path.join(cache_dir, build)
+    with open(os.path.join(build_dir, 'meta.json')) as meta_file:
+        meta = json.load(meta_file)
+
+    columns = {column: np.load(os.path.join(build_dir, column + '.npy'), mmap_mode='r')
+               for column in list(ID_COLUMNS) + list(VALUE_COLUMNS)}
+    summary = tuple(set(names) for names in meta['summary'])
+    return meta, FlightColumns(columns, meta['strings'], summary)
+
+
+def is_cache_current(meta: dict, zip_path: str, cache_dir: str) -> bool:
+    """
+    Return whether the cache with the given metadata was built from the current contents of zip_path.
+
+    The modification time and size of the zip file are checked first. Only if they changed is the zip file hashed;
+    if its contents are in fact unchanged, the stored modification time is refreshed instead of rebuilding the cache.
+    """
+    if meta.get('format_version') != CACHE_FORMAT_VERSION:
+        return False
+
+    stat = os.stat(zip_path)
+    source = meta['source']
+    if stat.st_mtime_ns == source['mtime_ns'] and stat.st_size == source['size']:
+        return True
+
+    fingerprint = file_fingerprint(zip_path)
+    if fingerprint['sha256'] != source['sha256']:
+        return False
+
+    meta['source'] = fingerprint
+    _write_atomically(os.path.join(cache_dir, meta['build'], 'meta.json'), json.dumps(meta))
+    return True
+
+
+def current_build(cache_dir: str = CACHE_DIR) -> Optional[str]:
+    """
+    Return the name of the current build of the cache in cache_dir, or None if no build has been published.
+    """
+    try:
+        with open(os.path.join(cache_dir, CURRENT_FILE)) as current_file:
+            return current_file.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _remove_old_builds(cache_dir: str, keep: tuple[Optional[str], ...]) -> None:
+    """
+    Remove every build of cache_dir not named in keep, and the files of caches written before builds had their own
+    directories. Builds still being written (whose names start with a dot) are left alone.
+
+    Processes that memory-mapped the columns of a removed build keep reading them, since removing a file does not
+    affect the mappings of it that are already open.
+    """
+    legacy = {'meta.json'} | {column + '.npy' for column in list(ID_COLUMNS) + list(VALUE_COLUMNS)}
+    for name in os.listdir(cache_dir):
+        if name.startswith(BUILD_PREFIX) and name not in keep:
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+        elif name in legacy:
+            os.remove(os.path.join(cache_dir, name))
+
+
+def _write_atomically(path: str, text: str) -> None:
+    """Replace the contents of the file at path with text, so readers see either the old or the new contents."""
+    file_descriptor, temporary_path = tempfile.mkstemp(prefix='.', dir=os.path.dirname(path) or '.')
+    with os.fdopen(file_descriptor, 'w') as temporary_file:
+        temporary_file.write(text)
+        temporary_file.flush()
+        os.fsync(temporary_file.fileno())
+    os.replace(temporary_path, path)
+
+
+@instrumentation.instrumented('load_flight_cache')
+def load_flight_cache(zip_path: str = FLIGHT_ZIP_FILE, cache_dir: str = CACHE_DIR) -> FlightColumns:
+    """
+    Return the columns of the flight dataset in the given zip file, using the cache in cache_dir.
+
+    If there is no cache yet, or the zip file has changed since the cache was built, the cache is (re)built first.
+    """
+    try:
+        meta, columns = read_flight_cache(cache_dir)
+    except (FileNotFoundError, ValueError, KeyError):
+        return build_flight_cache(zip_path, cache_dir)
+
+    if not is_cache_current(meta, zip_path, cache_dir):
+        return build_flight_cache(zip_path, cache_dir)
+
+    return columns
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['hashlib', 'json', 'os', 'shutil', 'tempfile', 'numpy', 'flight_index', 'flight_reader',
+                          'instrumentation'],
+        'allowed-io': ['file_fingerprint', 'build_flight_cache', 'read_flight_cache', 'current_build',
+                       '_write_atomically'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })
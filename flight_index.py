@@ -0,0 +1,198 @@
+"""Verde Voyage: In-memory index over the flight dataset
+
+Module Description
+==================
+This module contains the FlightIndex class, which parses the flight dataset once and keeps its rows indexed by
+origin airport, by (origin, destination) airport pair and by (origin, destination country) pair. Every graph view
+built by helper_functions.create_graph is answered from this index, so the cost of a view is proportional to the
+number of rows it returns instead of the size of the whole dataset.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from typing import Any, Iterable, Sequence
+import numpy as np
+import flight_reader
+
+FLIGHT_DATA_FILE = 'CSV Files/flight_data.csv.zip'
+
+
+class FlightIndex:
+    """
+    An in-memory index over the rows of the flight dataset.
+
+    Only complete rows (rows with an aircraft, a price and an emissions value) are stored, since those are the
+    only rows that can be turned into an edge of a Graph. Within each index, rows are kept in the order they appear
+    in the dataset, so a graph built from the index is identical to one built by scanning the file.
+
+    Instance Attributes:
+        - rows: Every complete row of the dataset, in file order. This is either a list of rows, or a
+            flight_cache.FlightColumns object when the index was built from the columnar cache.
+
+    Private Instance Attributes:
+        - _by_origin: A mapping from an origin airport code to the positions in rows of the flights departing from it.
+        - _by_route: A mapping from an (origin airport code, destination airport code) pair to the positions in rows
+            of the flights of that route.
+        - _by_country: A mapping from an (origin airport code, lowercase destination country) pair to the positions
+            in rows of the flights departing from the origin airport and arriving in that country.
+    """
+    rows: Sequence[list[str]]
+    _by_origin: dict[str, list[int]]
+    _by_route: dict[tuple[str, str], list[int]]
+    _by_country: dict[tuple[str, str], list[int]]
+
+    def __init__(self, rows: Iterable[list[str]] = ()) -> None:
+        """Initialize an index containing the complete rows among the given rows."""
+        self.rows = []
+        self._by_origin = {}
+        self._by_route = {}
+        self._by_country = {}
+
+        for row in rows:
+            self.add_row(row)
+
+    @classmethod
+    def from_columns(cls, columns: Any) -> FlightIndex:
+        """
+        Return an index over the given flight_cache.FlightColumns, without turning its flights into rows.
+
+        The positions of each origin, route and destination country are grouped with NumPy directly on the
+        dictionary-encoded id columns. Rows are only materialized when they are looked up. The returned index is
+        read-only: add_row must not be called on it.
+        """
+        index = cls()
+        index.rows = columns
+        airports = columns.strings['airports']
+        countries = columns.strings['countries']
+        origin = np.asarray(columns.columns['origin'], dtype=np.int64)
+        dest = np.asarray(columns.columns['dest'], dtype=np.int64)
+
+        # Countries that only differ in case share a key, just like in add_row.
+        lower_names = sorted({country.lower() for country in countries})
+        lower_id = {name: i for i, name in enumerate(lower_names)}
+        lower_ids = np.array([lower_id[country.lower()] for country in countries], dtype=np.int64)
+        dest_country = lower_ids[np.asarray(columns.columns['dest_country'], dtype=np.int64)]
+
+        for key, positions in _group_positions(origin):
+            index._by_origin[airports[key]] = positions
+
+        for key, positions in _group_positions(origin * len(airports) + dest):
+            index._by_route[(airports[key // len(airports)], airports[key % len(airports)])] = positions
+
+        for key, positions in _group_positions(origin * len(lower_names) + dest_country):
+            index._by_country[(airports[key // len(lower_names)], lower_names[key % len(lower_names)])] = positions
+
+        return index
+
+    def add_row(self, row: list[str]) -> None:
+        """
+        Add the given row of the flight dataset to this index.
+
+        If any of the values needed to build an edge are missing, the row is ignored.
+        """
+        if not is_complete_row(row):
+            return
+
+        position = len(self.rows)
+        self.rows.append(row)
+        self._by_origin.setdefault(row[0], []).append(position)
+        self._by_route.setdefault((row[0], row[2]), []).append(position)
+        self._by_country.setdefault((row[0], row[3].lower()), []).append(position)
+
+    def rows_from(self, home_airport: str) -> list[list[str]]:
+        """
+        Return the rows of all the flights departing from home_airport.
+        """
+        return self._lookup(self._by_origin.get(home_airport, []))
+
+    def rows_between(self, home_airport: str, dest_airport: str) -> list[list[str]]:
+        """
+        Return the rows of all the flights from home_airport to dest_airport.
+        """
+        return self._lookup(self._by_route.get((home_airport, dest_airport), []))
+
+    def rows_to_countries(self, home_airport: str, dest_countries: Iterable[str]) -> list[list[str]]:
+        """
+        Return the rows of all the flights from home_airport to an airport in one of dest_countries.
+
+        Country names are compared case-insensitively. The rows are returned in the order they appear in the dataset.
+        """
+        lower_set = {country.lower() for country in dest_countries}
+        positions = []
+        for country in lower_set:
+            positions.extend(self._by_country.get((home_airport, country), []))
+
+        if len(lower_set) > 1:
+            positions.sort()  # restore the dataset order across countries
+
+        return self._lookup(positions)
+
+    def _lookup(self, positions: list[int]) -> list[list[str]]:
+        """
+        Return the rows at the given positions.
+        """
+        rows = self.rows
+        return [rows[position] for position in positions]
+
+
+def _group_positions(keys: np.ndarray) -> list[tuple[int, list[int]]]:
+    """
+    Return each distinct value in keys together with the positions where it occurs, in increasing order.
+    """
+    order = np.argsort(keys, kind='stable')  # a stable sort keeps the positions of each key in file order
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.diff(sorted_keys)) + 1
+    groups = np.split(order, starts)
+    return [(int(sorted_keys[group_start]), group.tolist())
+            for group_start, group in zip(np.concatenate(([0], starts)), groups) if len(group) > 0]
+
+
+def is_complete_row(row: list[str]) -> bool:
+    """
+    Return whether the given row of the flight dataset has an aircraft, a price and an emissions value.
+    """
+    return not (row[4] == '' or row[12] == '' or row[14] == '')
+
+
+def load_flight_index(flight_path_file: str) -> FlightIndex:
+    """
+    Return a FlightIndex over the rows of the given flight dataset file (a zip file or a CSV file).
+    """
+    return FlightIndex(flight_reader.iter_flight_rows(flight_path_file))
+
+
+_LOADED_INDEXES: dict[str, FlightIndex] = {}
+
+
+def get_flight_index(flight_path_file: str = FLIGHT_DATA_FILE) -> FlightIndex:
+    """
+    Return the FlightIndex for the given flight dataset file, parsing the file only the first time it is requested.
+
+    The index is shared by every session served by this process.
+    """
+    if flight_path_file not in _LOADED_INDEXES:
+        _LOADED_INDEXES[flight_path_file] = load_flight_index(flight_path_file)
+
+    return _LOADED_INDEXES[flight_path_file]
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['numpy', 'flight_reader'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })
@@ -0,0 +1,75 @@
+"""Verde Voyage: Streaming reader for the flight dataset
+
+Module Description
+==================
+This module contains the row iterator that every part of our project uses to read the flight dataset. The dataset
+is read straight out of 'CSV Files/flight_data.csv.zip' and decompressed on the fly, so nothing is ever extracted to
+disk and only a small buffer of the file is held in memory at any time.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from typing import Iterator, Optional
+import csv
+import io
+import locale
+import zipfile
+
+FLIGHT_ZIP_FILE = 'CSV Files/flight_data.csv.zip'
+
+# The text encoding of the flight dataset. Like the original loader, which opened the extracted CSV file with open's
+# default encoding, the dataset is decoded with the preferred encoding of the locale. Every reader of the dataset,
+# including the workers of parallel_loader, decodes it with this encoding.
+ENCODING = locale.getpreferredencoding(False)
+
+# The size in bytes of the decompressed text buffer. This bounds the memory used while streaming the dataset.
+BUFFER_SIZE = 1 << 16
+
+
+def iter_flight_rows(flight_path_file: str = FLIGHT_ZIP_FILE, member: Optional[str] = None) -> Iterator[list[str]]:
+    """
+    Return an iterator over the rows of the flight dataset in the given file, without its header.
+
+    If flight_path_file is a zip file, the CSV file inside it is decompressed while it is read. The member argument
+    selects which file of the archive to read; by default, the first one is read. Otherwise, flight_path_file is read
+    as a plain CSV file. Either way, the text is decoded with ENCODING.
+    """
+    if not zipfile.is_zipfile(flight_path_file):
+        with open(flight_path_file, newline='', buffering=BUFFER_SIZE, encoding=ENCODING) as file:
+            reader = csv.reader(file)
+            next(reader, None)  # skip the header
+            yield from reader
+        return
+
+    with zipfile.ZipFile(flight_path_file) as zip_ref:
+        if member is None:
+            member = zip_ref.namelist()[0]
+
+        with zip_ref.open(member) as raw_file:
+            text_file = io.TextIOWrapper(io.BufferedReader(raw_file, BUFFER_SIZE), encoding=ENCODING, newline='')
+            reader = csv.reader(text_file)
+            next(reader, None)  # skip the header
+            yield from reader
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['csv', 'io', 'locale', 'zipfile'],
+        'allowed-io': ['iter_flight_rows'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })
@@ -0,0 +1,220 @@
+"""Verde Voyage: Vectorized flight package scoring
+
+Module Description
+==================
+This module contains the scoring engine behind helper_functions.calculate_flight_scores and
+helper_functions.optimal_routes. The price, number of stops and carbon emissions of every flight package on an edge
+are stored in NumPy arrays, so normalizing them and taking the weighted sum are array operations, and the best
+packages are found with a partial sort instead of sorting every package.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from typing import Optional, Sequence
+import numpy as np
+
+
+class FlightArrays:
+    """
+    The flight packages of one edge of a Graph, stored as NumPy arrays.
+
+    Instance Attributes:
+        - flights: The mapping from flight packages to [price, stops, emissions] the arrays were built from.
+        - packages: The (airline, aircraft) flight packages of the edge, in the order they were added to the graph.
+        - values: An array with one row per package in packages, holding its [price, number of stops, carbon
+            emission_g].
+        - normalized: values divided column by column by the maximum of that column, so every value is between 0
+            and 1. A column whose maximum is 0 (for example, an edge where every package is a direct flight) is
+            normalized to 0 instead of dividing by zero.
+
+    Private Instance Attributes:
+        - _front: The positions of the Pareto-optimal packages, or None if they have not been computed yet.
+
+    Representation Invariants:
+        - len(self.packages) == self.values.shape[0] == self.normalized.shape[0]
+    """
+    flights: dict[tuple[str, tuple[str, ...]], Sequence[float | int]]
+    packages: list[tuple[str, tuple[str, ...]]]
+    values: np.ndarray
+    normalized: np.ndarray
+    _front: Optional[np.ndarray]
+
+    def __init__(self, flights: dict[tuple[str, tuple[str, ...]], Sequence[float | int]]) -> None:
+        """Initialize the arrays of the given mapping from flight packages to [price, stops, emissions]."""
+        self.flights = flights
+        self.packages = list(flights)
+        self.values = np.array([flights[package][:3] for package in self.packages], dtype=np.float64).reshape(-1, 3)
+        self.normalized = normalize(self.values)
+        self._front = None
+
+    @classmethod
+    def from_values(cls, flights: dict[tuple[str, tuple[str, ...]], Sequence[float | int]],
+                    values: np.ndarray) -> FlightArrays:
+        """
+        Return the arrays of the given mapping from flight packages to [price, stops, emissions], whose values (in
+        the same order) are already the rows of values.
+        """
+        arrays = cls({})
+        arrays.flights = flights
+        arrays.packages = list(flights)
+        arrays.values = np.asarray(values, dtype=np.float64).reshape(-1, 3)
+        arrays.normalized = normalize(arrays.values)
+        return arrays
+
+    def pareto_front(self) -> np.ndarray:
+        """
+        Return the positions of the flight packages that are not dominated by any other package of this edge, in
+        increasing order.
+
+        The front is computed the first time it is requested and then reused. For any non-negative weights, the
+        best-scoring package of the edge is on the front (or tied with a package on the front).
+        """
+        if self._front is None:
+            self._front = pareto_front(self.values)
+        return self._front
+
+    def __len__(self) -> int:
+        """Return the number of flight packages on this edge."""
+        return len(self.packages)
+
+
+def normalize(values: np.ndarray) -> np.ndarray:
+    """
+    Return the given [price, stops, emissions] rows divided by the maximum of each column.
+
+    Columns whose maximum is 0 are left at 0.
+    """
+    if len(values) == 0:
+        return values.copy()
+
+    maxima = values.max(axis=0)
+    return np.divide(values, maxima, out=np.zeros_like(values), where=maxima != 0)
+
+
+def pareto_front(values: np.ndarray) -> np.ndarray:
+    """
+    Return the positions of the rows of values that are not dominated by any other row, in increasing order.
+
+    A row dominates another row if it is no greater in every column and smaller in at least one column, so all
+    the columns are minimized. Rows with identical values do not dominate each other.
+
+    The rows are visited in lexicographic order, so a row can only be dominated by a row visited before it, and
+    each row is compared against the current front in a single array operation.
+    """
+    order = np.lexsort(values.T[::-1])
+    front = []
+    front_values = np.empty_like(values)
+    for position in order.tolist():
+        row = values[position]
+        found = front_values[:len(front)]
+        if not np.any(np.all(found <= row, axis=1) & np.any(found < row, axis=1)):
+            front_values[len(front)] = row
+            front.append(position)
+
+    return np.array(sorted(front), dtype=np.intp)
+
+
+def score_flights(arrays: FlightArrays, weights: tuple[float, float, float] = (0.1, 0.1, 0.8)) -> np.ndarray:
+    """
+    Return the score of every flight package in arrays, based on the given weights for price, stops, and carbon
+    emissions. A lower score is better.
+
+    The terms are added in the same order as calculate_flight_scores used to add them, so the scores are identical
+    to the ones computed one package at a time.
+    """
+    return weighted_sum(arrays.normalized, weights)
+
+
+def weighted_sum(normalized: np.ndarray, weights: tuple[float, float, float]) -> np.ndarray:
+    """
+    Return the weighted sum of every normalized [price, stops, emissions] row, adding the terms from left to right.
+    """
+    weight_price, weight_stops, weight_emissions = weights
+    return normalized[:, 0] * weight_price + normalized[:, 1] * weight_stops + normalized[:, 2] * weight_emissions
+
+
+def score_flights_batch(arrays: FlightArrays, weight_matrix: np.ndarray) -> np.ndarray:
+    """
+    Return the scores of every flight package in arrays for many weights at once.
+
+    weight_matrix has one (price, stops, emissions) row per set of weights. The returned array has one row per flight
+    package and one column per row of weight_matrix, so column j holds score_flights(arrays, weight_matrix[j]).
+
+    The product of the normalized values and the weight matrix is expanded over the three criteria instead of being
+    handed to a BLAS matrix multiply, which may add the terms in a different order. This keeps every score
+    bit-identical to score_flights, so a batch ranks packages exactly like optimal_routes does.
+    """
+    normalized = arrays.normalized
+    weight_matrix = np.asarray(weight_matrix, dtype=np.float64).reshape(-1, 3)
+    return (normalized[:, 0:1] * weight_matrix[:, 0] + normalized[:, 1:2] * weight_matrix[:, 1]
+            + normalized[:, 2:3] * weight_matrix[:, 2])
+
+
+def top_k(scores: np.ndarray, k: int = 5) -> np.ndarray:
+    """
+    Return the positions of the k lowest scores, from lowest to highest.
+
+    Ties are broken by position, so the result is the same as the first k items of a stable sort of scores. Only
+    the k best scores (and any scores tied with the k-th best) are sorted. If k is not positive, no positions are
+    returned.
+    """
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if len(scores) <= k:
+        return np.argsort(scores, kind='stable')
+
+    kth_score = scores[np.argpartition(scores, k - 1)[:k]].max()
+    candidates = np.flatnonzero(scores <= kth_score)  # in position order, so a stable sort breaks ties by position
+    return candidates[np.argsort(scores[candidates], kind='stable')][:k]
+
+
+def top_k_columns(scores: np.ndarray, k: int = 5) -> np.ndarray:
+    """
+    Return the positions of the k lowest scores of every column of scores, from lowest to highest.
+
+    Column j of the returned array holds top_k(scores[:, j], k). All the columns are partitioned at once; only the
+    columns where other scores are tied with the k-th best score are ranked one column at a time. If k is not positive,
+    the returned array has no rows.
+    """
+    if k <= 0:
+        return np.empty((0, scores.shape[1]), dtype=np.intp)
+    if scores.shape[0] <= k:
+        return np.argsort(scores, axis=0, kind='stable')
+
+    kth_scores = np.partition(scores, k - 1, axis=0)[k - 1]
+    candidates = scores <= kth_scores
+    tied_columns = np.flatnonzero(candidates.sum(axis=0) > k)
+    candidates[:, tied_columns] = False
+    candidates[:k, tied_columns] = True  # placeholders, replaced below
+
+    # Without ties, each column has exactly k candidates; nonzero lists them column by column, in position order.
+    positions = np.nonzero(candidates.T)[1].reshape(-1, k)
+    order = np.argsort(np.take_along_axis(scores.T, positions, axis=1), axis=1, kind='stable')
+    best = np.take_along_axis(positions, order, axis=1).T
+
+    for column in tied_columns:
+        best[:, column] = top_k(scores[:, column], k)
+
+    return best
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['numpy'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })
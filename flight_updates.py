@@ -0,0 +1,108 @@
+"""Verde Voyage: Incremental updates of the flight graph
+
+Module Description
+==================
+This module applies delta files to a loaded data_classes.Graph, so a change of fares does not require rebuilding
+the graph from the whole flight dataset.
+
+A delta file is a CSV file (or a zip file holding one) with a header row. The first column of every row is the
+action, 'add', 'update' or 'delete', and the remaining columns are a row in the format of the flight dataset:
+
+    - 'add' inserts the flight package of the row, or replaces its price, stops and emissions if it already exists.
+    - 'update' replaces the price, stops and emissions of the flight package of the row, and is skipped if the flight
+      package does not exist.
+    - 'delete' removes the flight package of the row. If the airline and aircraft columns are empty, every flight
+      package between the two airports is removed.
+
+Like rows of the flight dataset, 'add' and 'update' rows without an aircraft, price or emissions are skipped.
+
+Every delta file is applied as a single batch with Graph.apply_changes, so a reader of the graph sees it either
+entirely before or entirely after the file was applied, and the version of the graph is incremented once per file.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from typing import Optional
+import sys
+import data_classes
+import flight_index
+import flight_reader
+import helper_functions
+
+
+def read_delta_file(delta_file: str) -> list[data_classes.FlightChange]:
+    """
+    Return the changes in the given delta file, in order.
+
+    Raise a ValueError if a row has an action other than 'add', 'update' or 'delete'.
+    """
+    changes = []
+    packages = {}
+    for delta_row in flight_reader.iter_flight_rows(delta_file):
+        change = parse_delta_row(delta_row, packages)
+        if change is not None:
+            changes.append(change)
+
+    return changes
+
+
+def parse_delta_row(delta_row: list[str],
+                    packages: Optional[dict[tuple[str, str], tuple[str, tuple[str, ...]]]] = None) \
+        -> Optional[data_classes.FlightChange]:
+    """
+    Return the change described by the given row of a delta file, or None if it is an 'add' or 'update' row of an
+    incomplete flight.
+
+    The flight package of the row is interned in packages, as by helper_functions.intern_flight_package.
+
+    Raise a ValueError if the row has an action other than 'add', 'update' or 'delete'.
+    """
+    action, row = delta_row[0].strip().lower(), delta_row[1:]
+    if action not in data_classes.CHANGE_ACTIONS:
+        raise ValueError
+
+    home_airport, dest_airport = sys.intern(row[0]), sys.intern(row[2])
+    home_country, dest_country = sys.intern(row[1]), sys.intern(row[3])
+
+    if action == 'delete':
+        package = helper_functions.intern_flight_package(row[6], row[4], packages) if row[4] or row[6] else None
+        return data_classes.FlightChange(action, home_airport, home_country, dest_airport, dest_country, package, None)
+
+    if not flight_index.is_complete_row(row):
+        return None
+
+    flight_info = data_classes.FlightInfo(float(row[12]), int(row[11]), int(row[14]))
+    return data_classes.FlightChange(action, home_airport, home_country, dest_airport, dest_country,
+                                     helper_functions.intern_flight_package(row[6], row[4], packages), flight_info)
+
+
+def apply_delta_file(graph: data_classes.Graph, delta_file: str,
+                     airport_coords: dict[str, tuple[float, float]]) -> dict[str, int]:
+    """
+    Apply the changes in the given delta file to graph, and return the counts returned by Graph.apply_changes.
+
+    The route summary of the dataset is not updated: it keeps describing the full dataset the graph was loaded from.
+    """
+    return graph.apply_changes(read_delta_file(delta_file), airport_coords)
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['typing', 'sys', 'data_classes', 'flight_index', 'flight_reader', 'helper_functions'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })
@@ -12,13 +12,57 @@ platform is strictly prohibited. All rights reserved.
 This file is Copyright (c) 2024 VerdeVoyage
 """
 
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Sequence, TextIO
+import threading
+import weakref
 import plotly.graph_objects as go
 import numpy as np
 import data_classes
+import instrumentation
+
+
+# The largest number of routes drawn with one trace (and one legend entry) per route. Larger graphs are drawn with a
+# single trace for all the routes and a single trace for all the airports, since plotly slows down with every trace.
+BATCH_THRESHOLD = 200
+
+# The angle in degrees between consecutive points of a generated arc, for individually drawn and batched routes.
+DEGREES_PER_POINT = 2.0
+BATCH_DEGREES_PER_POINT = 30.0
+
+# The number of decimals kept in the coordinates of batched routes (0.001 degrees is about 100 m), which keeps the
+# figure payload small.
+COORDINATE_DECIMALS = 3
+
+OCEAN_COLOR = "rgb(33, 158, 188)"  # blue for ocean
+LAND_COLOR = "rgb(128, 237, 153)"  # green for land
+PATH_COLOR = "rgb(242, 188, 49)"  # Gold for flight paths
+MARKER_COLOR = "rgb(229, 56, 59)"  # Red for markers
+TEXT_COLOR = "rgb(85, 166, 48)"  # Green for Text
+
+# The layout of every figure.
+BASE_LAYOUT = go.Layout(
+    title_text='<b>VerdeVoyage: Fly the Dream, Keep it Green </b>',
+    title_font={"size": 24, "color": TEXT_COLOR},
+    showlegend=True,
+    legend_title_text='Flight Paths',
+    legend_title_font={"color": TEXT_COLOR},
+    legend_font={"color": TEXT_COLOR},
+    geo={"projection_type": 'orthographic',
+         "showland": True,
+         "landcolor": LAND_COLOR,
+         "countrycolor": TEXT_COLOR,
+         "oceancolor": OCEAN_COLOR,
+         "lakecolor": OCEAN_COLOR,
+         "showocean": True
+         }
+)
 
 
 def visualize_new_graph(graph: data_classes.Graph, airport_coords: dict[str, tuple[float, float]],
-                        home_airport: str = None, dest_airport: str = None) -> None:
+                        home_airport: str = None, dest_airport: str = None,
+                        batch_threshold: int = BATCH_THRESHOLD) -> None:
     """
     Visualize the given graph using plotly.
 
@@ -27,13 +71,159 @@ def visualize_new_graph(graph: data_classes.Graph, airport_coords: dict[str, tup
         - dest_airport is None or home_airport is not None
         - The given graph is created based on the given specifications for home_airport and dest_airport.
     """
-    graph_figure = go.Figure()
+    build_graph_figure(graph, airport_coords, home_airport, dest_airport, batch_threshold).show()
 
-    ocean_color = "rgb(33, 158, 188)"  # blue for ocean
-    land_color = "rgb(128, 237, 153)"  # green for land
-    path_color = "rgb(242, 188, 49)"  # Gold for flight paths
-    marker_color = "rgb(229, 56, 59)"  # Red for markers
-    text_color = "rgb(85, 166, 48)"  # Green for Text
+
+class FigureCache:
+    """
+    A thread-safe least-recently-used cache of built figures and their exported JSON and HTML.
+
+    Keys have the format returned by figure_key. When the cache holds max_size figures, adding another figure
+    evicts the one that was used least recently.
+
+    Instance Attributes:
+        - max_size: The maximum number of figures kept in the cache.
+
+    Private Instance Attributes:
+        - _entries: A mapping from each key to its figure and a mapping from output formats to exported figures, from
+            least to most recently used.
+        - _lock: The lock held while the entries are read or changed.
+
+    Representation Invariants:
+        - self.max_size >= 0
+        - len(self._entries) <= self.max_size
+    """
+    max_size: int
+    _entries: OrderedDict[tuple, tuple[go.Figure, dict[str, str]]]
+    _lock: threading.Lock
+
+    def __init__(self, max_size: int = 32) -> None:
+        """Initialize an empty cache holding at most max_size figures."""
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[tuple[go.Figure, dict[str, str]]]:
+        """Return the figure and exports cached under key, or None if there are none, marking them as recently used."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: tuple, figure: go.Figure) -> tuple[go.Figure, dict[str, str]]:
+        """
+        Cache the given figure under key, evicting the least recently used figures if needed, and return its entry.
+
+        If another thread cached a figure under key meanwhile, that entry is kept and returned instead.
+        """
+        entry = (figure, {})
+        if self.max_size <= 0:
+            return entry
+        with self._lock:
+            entry = self._entries.setdefault(key, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        """Remove every figure from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        """Return the number of figures in the cache."""
+        return len(self._entries)
+
+
+FIGURE_CACHE = FigureCache()
+
+
+def figure_key(graph: data_classes.Graph, home_airport: str = None, dest_airport: str = None,
+               countries: Optional[Iterable[str]] = None) -> tuple:
+    """
+    Return the cache key of the figure of the given graph, created for the given home_airport, dest_airport and
+    destination countries: (weak reference to graph, view kind, home_airport, dest_airport, sorted lowercase
+    countries, version of graph).
+
+    The view kind is 'route' if dest_airport is given, 'hub' if only home_airport is given, and 'network' otherwise.
+    Like query_cache.data_key, the graph is held by a weak reference, so two different graphs never share a key,
+    even if they have the same version, and cached figures do not keep their graph alive.
+    """
+    if dest_airport is not None:
+        kind = 'route'
+    elif home_airport is not None:
+        kind = 'hub'
+    else:
+        kind = 'network'
+    return (weakref.ref(graph), kind, home_airport, dest_airport,
+            tuple(sorted({country.lower() for country in countries or ()})), graph.version)
+
+
+def export_graph_figure(graph: data_classes.Graph, airport_coords: dict[str, tuple[float, float]],
+                        home_airport: str = None, dest_airport: str = None, countries: Optional[Iterable[str]] = None,
+                        output_format: str = 'json', file: Optional[str | TextIO] = None,
+                        cache: Optional[FigureCache] = FIGURE_CACHE) -> Optional[str]:
+    """
+    Export the figure of the given graph without showing it, for example to serve it to a browser.
+
+    If output_format is 'json', return the figure as plotly JSON. If it is 'html', return a standalone HTML page
+    (which loads plotly.js from its CDN), or write it to file and return None if file, a path or a text buffer, is
+    given.
+
+    Figures and their exports are cached in cache under figure_key(graph, home_airport, dest_airport, countries), so
+    a view of a graph that was already exported is served without building the figure again, until the flight
+    packages of the graph change. The graph is assumed to be the one create_graph returns for home_airport,
+    dest_airport and countries. Pass cache=None to always build the figure.
+
+    Preconditions:
+        - output_format in {'json', 'html'}
+        - file is None or output_format == 'html'
+        - home_airport in airport_coords and dest_airport in airport_coords
+        - dest_airport is None or home_airport is not None
+    """
+    key = figure_key(graph, home_airport, dest_airport, countries)
+    entry = cache.get(key) if cache is not None else None
+    if entry is None:
+        figure = build_graph_figure(graph, airport_coords, home_airport, dest_airport)
+        entry = cache.put(key, figure) if cache is not None else (figure, {})
+
+    figure, exports = entry
+    if output_format not in exports:
+        # setdefault keeps the export of the first thread to finish, so every caller gets the same string
+        if output_format == 'json':
+            exports.setdefault(output_format, figure.to_json())
+        else:
+            exports.setdefault(output_format, figure.to_html(include_plotlyjs='cdn'))
+
+    if file is None:
+        return exports[output_format]
+    elif isinstance(file, str):
+        with open(file, 'w', encoding='utf-8') as html_file:
+            html_file.write(exports[output_format])
+    else:
+        file.write(exports[output_format])
+    return None
+
+
+@instrumentation.instrumented('build_graph_figure')
+def build_graph_figure(graph: data_classes.Graph, airport_coords: dict[str, tuple[float, float]],
+                       home_airport: str = None, dest_airport: str = None,
+                       batch_threshold: int = BATCH_THRESHOLD) -> go.Figure:
+    """
+    Return the plotly figure that visualize_new_graph shows for the given graph.
+
+    If more than batch_threshold routes are drawn, all the routes are drawn as a single trace and all the airports
+    as another, instead of one trace per route and per airport. Hovering over a route still shows its name.
+
+    Preconditions:
+        - home_airport in airport_coords and dest_airport in airport_coords
+        - dest_airport is None or home_airport is not None
+        - The given graph is created based on the given specifications for home_airport and dest_airport.
+        - batch_threshold >= 0
+    """
+    traces = []
 
     # If dest_airport is given, by the preconditions, home_airport must also be given.
     # If this is the case, then visualize at most 5 edges between home_airport and dest_airport.
@@ -44,149 +234,220 @@ def visualize_new_graph(graph: data_classes.Graph, airport_coords: dict[str, tup
         v2 = graph.get_vertex(dest_airport)
         flights = list(v1.neighbours[v2].keys())
 
-        # Visualize at most 5 paths between home_airport and dest_airport
-        for i in range(min(5, len(flights))):
-            lon_array, lat_array = create_curve_path(lon1, lat1, lon2, lat2, curve_height=((-1) ** i) * (0.05 * i))
-            flight = flights[i]
+        # Visualize at most 5 paths between home_airport and dest_airport, generating all the curves at once
+        num_paths = min(5, len(flights))
+        lon_arrays, lat_arrays, counts = _great_circle_arcs(
+            [(lat1, lon1)] * num_paths, [(lat2, lon2)] * num_paths,
+            curve_heights=[((-1) ** i) * (0.05 * i) for i in range(num_paths)])
+        splits = np.cumsum(counts)[:-1]
+        for flight, lon_array, lat_array in zip(flights, np.split(lon_arrays, splits), np.split(lat_arrays, splits)):
             flight_name = f"{flight[0]}: {flight[1]}"
 
             # Add a line between home airport and dest_airport
-            graph_figure.add_trace(go.Scattergeo(
+            traces.append(go.Scattergeo(
                 lon=lon_array,
                 lat=lat_array,
                 mode='lines',
-                line={"width": 2, "color": path_color},
+                line={"width": 2, "color": PATH_COLOR},
                 name=flight_name                                 # Set the name for the flight path
             ))
 
-        # Add a marker to each airport, showing its coordinates and airport code.
-        for airport in [home_airport, dest_airport]:
-            graph_figure.add_trace(go.Scattergeo(
-                lon=[airport_coords[airport][1]],
-                lat=[airport_coords[airport][0]],
-                mode='markers',
-                marker={"size": 5, "color": marker_color},
-                name=airport
-            ))
+        airports = [home_airport, dest_airport]
+        routes = []
 
     # If only home_airport is given, then visualize the connections between home_airport and its neighbours.
     elif home_airport is not None:
-        visited = set()
         v1 = graph.get_vertex(home_airport)
-        lat1, lon1 = airport_coords[home_airport]
-        visited.add(v1)
+        airports = [home_airport]
+        routes = []
 
         # Add a line from home_airport to each of its neighbours.
         for v2 in v1.neighbours:
-            if v2 not in visited:
-                lat2, lon2 = airport_coords[v2.airport_code]
-                flight_name = f"{home_airport} to {v2.country_name}"
-
-                graph_figure.add_trace(go.Scattergeo(
-                    lon=[lon1, lon2],
-                    lat=[lat1, lat2],
-                    mode='lines',
-                    line={"width": 2, "color": path_color},
-                    name=flight_name
-                ))
-
-                visited.add(v2)
-
-        # Add a marker to each airport, showing its coordinates and airport code.
-        for v in visited:
-            lat, lon = airport_coords[v.airport_code]
-            graph_figure.add_trace(go.Scattergeo(
-                lon=[lon],
-                lat=[lat],
-                mode='markers',
-                marker={"size": 5, "color": marker_color},
-                name=v.airport_code
-            ))
+            if v2 is not v1:
+                routes.append((home_airport, v2.airport_code, f"{home_airport} to {v2.country_name}"))
+                airports.append(v2.airport_code)
 
     # If home_airport is not given, then visualize all connections between all the vertices in the graph.
     else:
         # Go through every neighbour of every vertex in the graph, and add a line connecting the
         # neighbour to the vertex.
         visited = set()
-        for v1 in graph.all_verticies():                    # graph.all_vertices() returns a set of all vertex objects
-            lat1, lon1 = airport_coords[v1.airport_code]
+        airports = []
+        routes = []
+        for v1 in graph.all_verticies():
             for v2 in v1.neighbours:
-                if (v1, v2) not in visited and (v2, v1) not in visited:
-                    lat2, lon2 = airport_coords[v2.airport_code]
-                    flight_name = f"{v1.airport_code} to {v2.country_name}"
-
-                    graph_figure.add_trace(go.Scattergeo(
-                        lon=[lon1, lon2],
-                        lat=[lat1, lat2],
-                        mode='lines',
-                        line={"width": 2, "color": path_color},
-                        name=flight_name
-                    ))
-
+                if (v2, v1) not in visited:
+                    routes.append((v1.airport_code, v2.airport_code, f"{v1.airport_code} to {v2.country_name}"))
                     visited.add((v1, v2))
+            airports.append(v1.airport_code)
+
+    # Add a line for each route, and a marker to each airport, showing its coordinates and airport code.
+    if len(routes) > batch_threshold:
+        traces.append(_batched_route_trace(routes, airport_coords))
+        traces.append(go.Scattergeo(
+            lon=[airport_coords[airport][1] for airport in airports],
+            lat=[airport_coords[airport][0] for airport in airports],
+            text=airports,
+            hoverinfo='text',
+            mode='markers',
+            marker={"size": 5, "color": MARKER_COLOR},
+            name='Airports'
+        ))
+    else:
+        for airport1, airport2, flight_name in routes:
+            traces.append(go.Scattergeo(
+                lon=[airport_coords[airport1][1], airport_coords[airport2][1]],
+                lat=[airport_coords[airport1][0], airport_coords[airport2][0]],
+                mode='lines',
+                line={"width": 2, "color": PATH_COLOR},
+                name=flight_name
+            ))
 
-            # Add a marker to the vertex, showing its coordinates and airport code.
-            graph_figure.add_trace(go.Scattergeo(
-                lon=[lon1],
-                lat=[lat1],
+        for airport in airports:
+            traces.append(go.Scattergeo(
+                lon=[airport_coords[airport][1]],
+                lat=[airport_coords[airport][0]],
                 mode='markers',
-                marker={"size": 5, "color": marker_color},
-                name=v1.airport_code
+                marker={"size": 5, "color": MARKER_COLOR},
+                name=airport
             ))
 
-    # Add the following properties to the plot.
-    graph_figure.update_layout(
-        title_text='<b>VerdeVoyage: Fly the Dream, Keep it Green </b>',
-        title_font={"size": 24, "color": text_color},
-        showlegend=True,
-        legend_title_text='Flight Paths',
-        legend_title_font={"color": text_color},
-        legend_font={"color": text_color},
-        geo={"projection_type": 'orthographic',
-             "showland": True,
-             "landcolor": land_color,
-             "countrycolor": text_color,
-             "oceancolor": ocean_color,
-             "lakecolor": ocean_color,
-             "showocean": True
-             }
-    )
+    # The layout is shared by every figure, so it is only built once.
+    instrumentation.count('build_graph_figure', 'traces', len(traces))
+    return go.Figure(data=traces, layout=BASE_LAYOUT)
 
-    graph_figure.show()
 
+def _batched_route_trace(routes: list[tuple[str, str, str]],
+                         airport_coords: dict[str, tuple[float, float]]) -> go.Scattergeo:
+    """
+    Return a single line trace drawing every (airport1, airport2, name) route in routes.
 
-def create_curve_path(lon1: float, lat1: float, lon2: float, lat2: float,
-                      num_points: int = 100, curve_height: float = 0) -> tuple[np.array, np.array]:
+    Every route is a coarse great-circle arc (see great_circle_paths) with rounded coordinates, separated from the
+    next route by a gap that plotly does not connect. The points inside every arc are labelled with the name of the
+    route, so hovering over any route shows its name.
     """
-    Rwturn a curved path between (lat1, lon1) and (lat2, lon2) based on the given curve_height.
+    starts = [airport_coords[airport1] for airport1, _, _ in routes]
+    ends = [airport_coords[airport2] for _, airport2, _ in routes]
+    lon, lat, counts = _great_circle_arcs(starts, ends, degrees_per_point=BATCH_DEGREES_PER_POINT, min_points=3)
+
+    # Label only the points inside each arc, since the endpoints of routes sharing an airport overlap anyway.
+    text = np.repeat(np.array([name for _, _, name in routes], dtype=object), counts)
+    ends_of_arcs = np.cumsum(counts)
+    text[ends_of_arcs - counts] = text[ends_of_arcs - 1] = None
+
+    return go.Scattergeo(
+        lon=_pack(np.round(lon, COORDINATE_DECIMALS), counts, np.nan),
+        lat=_pack(np.round(lat, COORDINATE_DECIMALS), counts, np.nan),
+        text=_pack(text, counts, None),
+        hoverinfo='text',
+        mode='lines',
+        line={"width": 2, "color": PATH_COLOR},
+        name='Flight paths'
+    )
+
+
+def great_circle_paths(starts: Sequence[tuple[float, float]], ends: Sequence[tuple[float, float]],
+                       curve_heights: Optional[Sequence[float]] = None,
+                       degrees_per_point: float = DEGREES_PER_POINT) -> tuple[np.ndarray, np.ndarray]:
     """
+    Return the longitudes and latitudes of the great-circle arcs from every (latitude, longitude) in starts to the
+    (latitude, longitude) at the same position in ends, packed into two arrays ready for a single plotly trace.
 
-    # Convert the values to radians because numpy functions work with radian values.
-    lon1, lat1, lon2, lat2 = np.radians(lon1), np.radians(lat1), np.radians(lon2), np.radians(lat2)
+    The arcs are separated by NaN, which plotly leaves unconnected. Each arc has one point every degrees_per_point
+    degrees of its length (at least 2 and at most 100 points), so short hops carry only a few points. The
+    longitudes of an arc are unwrapped, so an arc crossing the antimeridian continues past 180 or -180 degrees
+    instead of jumping to the other side of the map.
 
-    # Create the given number of points between lat1 and lat2, and between lon1 and lon2
-    lat_array = np.linspace(lat1, lat2, num_points)
-    lon_array = np.linspace(lon1, lon2, num_points)
+    curve_heights, if given, bends each arc sideways by that many radians at its middle, like the curve_height of
+    create_curve_path, so parallel routes between the same airports can be told apart.
 
-    # To add curvature, we will use the sin function.
-    # We create given number of points between 0 and pi, and apply sin to it.
-    # This will create a sin graph between 0 and pi, which is naturally a curve.
-    # Then, we multiply by curve_height to stretch or compress the graph,
-    # giving us distinguishable paths between 0 and pi.
-    modifier = np.sin(np.linspace(0, np.pi, num_points)) * curve_height
+    Preconditions:
+        - len(starts) == len(ends)
+        - curve_heights is None or len(curve_heights) == len(starts)
+        - degrees_per_point > 0
+    """
+    lon, lat, counts = _great_circle_arcs(starts, ends, curve_heights, degrees_per_point)
+    return _pack(lon, counts, np.nan), _pack(lat, counts, np.nan)
 
-    # If the latitude distance between the endpoints is greater than the longitude distance,
-    # then we add the modifier to the line between lon1 and lon2.
-    # Otherwise, we add the modifier to the line between lat1 and lat2.
-    # Notice that the endpoints (lat1, lon1) and (lat2, lon2) are not changed because
-    # at the endpoints on the sin graph (0 and pi), the value is 0.
-    if abs(lat1 - lat2) > abs(lon1 - lon2):
-        lon_array = lon_array + modifier
-    else:
-        lat_array = lat_array + modifier
 
-    # Convert back to degrees and return.
-    return np.degrees(lon_array), np.degrees(lat_array)
+def _great_circle_arcs(starts: Sequence[tuple[float, float]], ends: Sequence[tuple[float, float]],
+                       curve_heights: Optional[Sequence[float]] = None, degrees_per_point: float = DEGREES_PER_POINT,
+                       min_points: int = 2, max_points: int = 100) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the longitudes and latitudes in degrees of the points of the great-circle arcs described in
+    great_circle_paths, one arc after the other without separators, and the number of points of each arc.
+    """
+    start_coords = np.radians(np.asarray(starts, dtype=np.float64).reshape(-1, 2))
+    end_coords = np.radians(np.asarray(ends, dtype=np.float64).reshape(-1, 2))
+    a, b = _unit_vectors(start_coords), _unit_vectors(end_coords)
+
+    # The central angle of each arc decides how many points it gets.
+    angles = np.arctan2(np.linalg.norm(np.cross(a, b), axis=1), np.sum(a * b, axis=1))
+    counts = np.clip(np.ceil(np.degrees(angles) / degrees_per_point).astype(np.intp) + 1, min_points, max_points)
+
+    # The arc of every point, and its fraction t of the way along that arc.
+    arc = np.repeat(np.arange(len(counts)), counts)
+    first = np.repeat(np.cumsum(counts) - counts, counts)
+    t = ((np.arange(len(arc)) - first) / (counts[arc] - 1))[:, np.newaxis]
+
+    # Spherical linear interpolation; arcs between (almost) identical airports are interpolated linearly instead.
+    angle, sin_angle = angles[arc, np.newaxis], np.sin(angles[arc, np.newaxis])
+    safe_sin = np.where(sin_angle > 1e-12, sin_angle, 1.0)
+    start_weight = np.where(sin_angle > 1e-12, np.sin((1 - t) * angle) / safe_sin, 1 - t)
+    end_weight = np.where(sin_angle > 1e-12, np.sin(t * angle) / safe_sin, t)
+    points = start_weight * a[arc] + end_weight * b[arc]
+
+    # Bend each arc sideways along the normal of its great circle, by 0 at the endpoints and curve_height at t = 0.5.
+    if curve_heights is not None:
+        normals = np.cross(a, b)
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 1e-12)
+        heights = np.asarray(curve_heights, dtype=np.float64)[arc, np.newaxis]
+        points = points + np.sin(np.pi * t) * heights * normals[arc]
+
+    points = points / np.linalg.norm(points, axis=1, keepdims=True)
+    lat = np.arctan2(points[:, 2], np.hypot(points[:, 0], points[:, 1]))
+    lon = np.arctan2(points[:, 1], points[:, 0])
+
+    # Unwrap the longitudes within each arc: remove every jump of more than 180 degrees between consecutive points.
+    jumps = np.zeros_like(lon)
+    jumps[1:] = -2 * np.pi * np.round(np.diff(lon) / (2 * np.pi))
+    jumps[first == np.arange(len(arc))] = 0
+    corrections = np.cumsum(jumps)
+    lon = lon + corrections - corrections[first]
+
+    return np.degrees(lon), np.degrees(lat), counts
+
+
+def _unit_vectors(coords: np.ndarray) -> np.ndarray:
+    """Return the unit vectors of the given rows of (latitude, longitude) in radians."""
+    lat, lon = coords[:, 0], coords[:, 1]
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def _pack(values: np.ndarray, counts: np.ndarray, separator: Any) -> np.ndarray:
+    """
+    Return the given values of consecutive arcs with the given number of points, with separator after every arc.
+    """
+    packed = np.full(len(values) + len(counts), separator, dtype=values.dtype)
+    arc = np.repeat(np.arange(len(counts)), counts)
+    packed[np.arange(len(values)) + arc] = values
+    return packed
+
+
+def create_curve_path(lon1: float, lat1: float, lon2: float, lat2: float,
+                      num_points: Optional[int] = None, curve_height: float = 0) -> tuple[np.array, np.array]:
+    """
+    Return a great-circle path between (lat1, lon1) and (lat2, lon2), bent sideways based on the given curve_height.
+
+    The path has num_points points, or one point every DEGREES_PER_POINT degrees of its length if num_points is None.
+    """
+    if num_points is None:
+        lon, lat, _ = _great_circle_arcs([(lat1, lon1)], [(lat2, lon2)], [curve_height])
+    else:
+        lon, lat, _ = _great_circle_arcs([(lat1, lon1)], [(lat2, lon2)], [curve_height],
+                                         min_points=num_points, max_points=num_points)
+    return lon, lat
 
 
 if __name__ == '__main__':
@@ -197,7 +458,9 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-line-length': 170,
         'disable': ['E1136', 'W0221', 'R0913'],
-        'extra-imports': ['plotly.graph_objects', 'data_classes', 'numpy'],
+        'extra-imports': ['plotly.graph_objects', 'data_classes', 'instrumentation', 'numpy', 'typing', 'collections',
+                          'threading', 'weakref'],
+        'allowed-io': ['export_graph_figure'],
         'max-nested-blocks': 4,
         'max-locals': 30,
         'max-statements': 80
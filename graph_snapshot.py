@@ -0,0 +1,209 @@
+"""Verde Voyage: Shared read-only graph snapshots
+
+Module Description
+==================
+This module publishes a built compact_graph.CompactGraph as a snapshot on disk, so every worker process of a
+deployment can attach to the same graph instead of building its own copy from the flight dataset.
+
+A snapshot is a directory holding one .npy file per array of the graph and a meta.json file with its string tables
+and version stamp. Workers memory-map the arrays read-only, so attaching takes milliseconds, and every worker shares
+the same pages of the operating system's page cache: adding a worker adds almost no memory.
+
+Every snapshot is published into its own versioned directory, and the CURRENT file of the snapshot root names the
+version workers should use. A new dataset is swapped in by publishing it and then replacing CURRENT with
+os.replace, which is atomic: a worker reads either the old version or the new one, never a mix. Workers that are
+still attached to an old version keep using its files until they reattach.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from typing import Optional
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import compact_graph
+
+SNAPSHOT_DIR = 'CSV Files/graph_snapshots'
+
+# The version of the snapshot format. Snapshots in another format are never attached.
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def snapshot_version(graph: compact_graph.CompactGraph) -> str:
+    """
+    Return the version stamp of the given graph: a hash of its arrays and string tables, so publishing the same
+    graph twice gives the same version.
+    """
+    sha = hashlib.sha256()
+    for name in compact_graph.ARRAYS:
+        array = np.ascontiguousarray(getattr(graph, name))
+        sha.update(f'{name}:{array.dtype.str}:{array.shape}'.encode())
+        sha.update(array.tobytes())
+    sha.update(json.dumps(_string_tables(graph)).encode())
+    return sha.hexdigest()[:16]
+
+
+def publish_snapshot(graph: compact_graph.CompactGraph, snapshot_dir: str = SNAPSHOT_DIR,
+                     version: Optional[str] = None) -> str:
+    """
+    Publish the given graph as the current snapshot in snapshot_dir, and return its version.
+
+    If version is not given, snapshot_version(graph) is used. The snapshot is written to a temporary directory and
+    renamed into place before CURRENT is switched to it, so a worker never attaches to a partially written snapshot.
+    If a snapshot with the same version already exists, it is reused.
+    """
+    if version is None:
+        version = snapshot_version(graph)
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    version_dir = os.path.join(snapshot_dir, version)
+    if not os.path.isdir(version_dir):
+        work_dir = tempfile.mkdtemp(prefix=f'.{version}-', dir=snapshot_dir)
+        for name in compact_graph.ARRAYS:
+            np.save(os.path.join(work_dir, name + '.npy'), np.ascontiguousarray(getattr(graph, name)))
+
+        meta = {'format_version': SNAPSHOT_FORMAT_VERSION, 'version': version, 'strings': _string_tables(graph)}
+        with open(os.path.join(work_dir, 'meta.json'), 'w') as meta_file:
+            json.dump(meta, meta_file)
+
+        try:
+            os.rename(work_dir, version_dir)
+        except OSError:  # another process published the same version first
+            shutil.rmtree(work_dir)
+    else:
+        os.utime(version_dir)  # mark it as the most recently published version, for prune_snapshots
+
+    _write_atomically(os.path.join(snapshot_dir, 'CURRENT'), version)
+    return version
+
+
+def current_version(snapshot_dir: str = SNAPSHOT_DIR) -> Optional[str]:
+    """
+    Return the version of the current snapshot in snapshot_dir, or None if no snapshot has been published.
+    """
+    try:
+        with open(os.path.join(snapshot_dir, 'CURRENT')) as current_file:
+            return current_file.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def attach_snapshot(snapshot_dir: str = SNAPSHOT_DIR, version: Optional[str] = None) \
+        -> tuple[str, compact_graph.CompactGraph]:
+    """
+    Return the version and the graph of the given snapshot version in snapshot_dir (by default, the current one).
+
+    The arrays of the returned graph are memory-mapped read-only, so nothing is copied into the memory of this
+    process. Raise FileNotFoundError if there is no such snapshot, and ValueError if it is in another format.
+    """
+    if version is None:
+        version = current_version(snapshot_dir)
+        if version is None:
+            raise FileNotFoundError(os.path.join(snapshot_dir, 'CURRENT'))
+
+    version_dir = os.path.join(snapshot_dir, version)
+    with open(os.path.join(version_dir, 'meta.json')) as meta_file:
+        meta = json.load(meta_file)
+    if meta.get('format_version') != SNAPSHOT_FORMAT_VERSION or meta.get('version') != version:
+        raise ValueError
+
+    arrays = {name: np.load(os.path.join(version_dir, name + '.npy'), mmap_mode='r') for name in compact_graph.ARRAYS}
+    strings = meta['strings']
+    graph = compact_graph.CompactGraph.from_arrays(arrays, strings['codes'], strings['countries'],
+                                                   strings['airline_names'],
+                                                   [tuple(aircraft) for aircraft in strings['aircraft_sequences']])
+    return version, graph
+
+
+def prune_snapshots(snapshot_dir: str = SNAPSHOT_DIR, keep: int = 2) -> list[str]:
+    """
+    Delete all but the keep most recently published snapshot versions in snapshot_dir (never deleting the current
+    one), and return the deleted versions.
+
+    Workers still attached to a deleted version keep working: its files stay readable until they are unmapped.
+    """
+    current = current_version(snapshot_dir)
+    versions = [entry for entry in os.listdir(snapshot_dir)
+                if not entry.startswith('.') and os.path.isdir(os.path.join(snapshot_dir, entry))]
+    versions.sort(key=lambda entry: os.path.getmtime(os.path.join(snapshot_dir, entry)), reverse=True)
+
+    deleted = []
+    for version in versions[keep:]:
+        if version != current:
+            shutil.rmtree(os.path.join(snapshot_dir, version))
+            deleted.append(version)
+    return deleted
+
+
+class SnapshotReader:
+    """
+    A worker's handle on the current snapshot of a snapshot directory, reattaching when a new version is published.
+
+    Instance Attributes:
+        - snapshot_dir: The snapshot directory.
+        - version: The version of the attached graph, or None if no graph is attached yet.
+        - graph: The attached graph, or None if no graph is attached yet.
+    """
+    snapshot_dir: str
+    version: Optional[str]
+    graph: Optional[compact_graph.CompactGraph]
+
+    def __init__(self, snapshot_dir: str = SNAPSHOT_DIR) -> None:
+        """Initialize a reader of the given snapshot directory, without attaching to any snapshot yet."""
+        self.snapshot_dir = snapshot_dir
+        self.version = None
+        self.graph = None
+
+    def get_graph(self) -> compact_graph.CompactGraph:
+        """
+        Return the graph of the current snapshot, attaching to it first if it is not the attached version.
+
+        Only the small CURRENT file is read when the version has not changed.
+        """
+        version = current_version(self.snapshot_dir)
+        if self.graph is None or version != self.version:
+            self.version, self.graph = attach_snapshot(self.snapshot_dir, version)
+        return self.graph
+
+
+def _string_tables(graph: compact_graph.CompactGraph) -> dict[str, list]:
+    """Return the string tables of the given graph, in the format stored in meta.json."""
+    return {'codes': list(graph.codes), 'countries': list(graph.countries),
+            'airline_names': list(graph.airline_names),
+            'aircraft_sequences': [list(aircraft) for aircraft in graph.aircraft_sequences]}
+
+
+def _write_atomically(path: str, text: str) -> None:
+    """Replace the contents of the file at path with text, so readers see either the old or the new contents."""
+    file_descriptor, temporary_path = tempfile.mkstemp(prefix='.', dir=os.path.dirname(path) or '.')
+    with os.fdopen(file_descriptor, 'w') as temporary_file:
+        temporary_file.write(text)
+        temporary_file.flush()
+        os.fsync(temporary_file.fileno())
+    os.replace(temporary_path, path)
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['hashlib', 'json', 'os', 'shutil', 'tempfile', 'numpy', 'compact_graph'],
+        'allowed-io': ['publish_snapshot', 'current_version', 'attach_snapshot', '_write_atomically'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })
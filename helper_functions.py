@@ -18,9 +18,17 @@ This file is Copyright (c) 2024 Verde Voyage
 """
 import csv
 import random
+import sys
+import numpy as np
+import airport_index
 import data_classes
+import flight_cache
+import flight_index
+import flight_reader
+import flight_scoring
 import flight_visualization
-import zipfile
+import instrumentation
+import route_summary
 
 
 def run_voyage() -> None:
@@ -31,25 +39,36 @@ def run_voyage() -> None:
     # Load in important details from our dataset regarding travel destinations, and airport locations
     print('Welcome to Verde Voyage! This is your ultimate eco-conscious dream vacation planner! \n')
 
-    # Extract flight data zip file
-    zip_path = 'CSV Files/flight_data.csv.zip'
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall("CSV Files")         # Extract to current folder
+    # Memory-map the columnar cache of the flight data zip file (it is built on the first run, or when the zip changes)
+    flight_columns = flight_cache.load_flight_cache(flight_cache.FLIGHT_ZIP_FILE)
+    index = flight_index.FlightIndex.from_columns(flight_columns)
 
-    flight_path_file = "CSV Files/flight_data.csv"
-    home_airports, _, dest_airports, dest_countries = countries_and_airports(flight_path_file)
+    with instrumentation.timed('route_summary'):
+        summary = route_summary.RouteSummary.from_columns(flight_columns)
+    home_airports, _, dest_airports, dest_countries = summary.as_tuple()
     airport_coords = get_airport_coordinates()
 
     home_airport = input('What is your home airport? (Enter airport code) ').strip().upper()
+    all_airports = served_airports = None
     while home_airport not in home_airports:
         print('We are sorry! We do not have enough information on this airport. We are constantly trying '
               'to expand our reach. Please try a different airport.')
 
+        # Suggest the nearest airports we serve, if we know where the rejected airport is
+        if all_airports is None:
+            all_coords = get_airport_coordinates(airport_index.AIRPORTS_FILE)
+            all_airports = airport_index.AirportIndex(all_coords)
+            served_airports = airport_index.AirportIndex(all_coords, home_airports)
+        if home_airport in all_airports:
+            nearby = served_airports.nearest(*all_airports.coordinates(home_airport), k=3)
+            print('The nearest airports we serve are: '
+                  + ', '.join(f'{code} ({round(distance)} km)' for code, distance in nearby))
+
         home_airport = input('What is your home airport? (Enter airport code) ').strip().upper()
 
     # Display the graph from home_airport to all connecting airports.
     print("\nHere are all the connecting airports from your home airport.\n")
-    graph = create_graph(home_airport=home_airport, airport_coords=airport_coords)
+    graph = create_graph(home_airport=home_airport, airport_coords=airport_coords, index=index)
     flight_visualization.visualize_new_graph(graph, home_airport=home_airport, airport_coords=airport_coords)
 
     # Ask the user if they would like personalized travel suggestions
@@ -59,17 +78,17 @@ def run_voyage() -> None:
     matching_countries = None
     while questionare == 'Y':
         questionare_bool = True
-        matching_countries = data_classes.run_country_matchmaker('CSV Files/country_traits.csv')
+        matching_countries = data_classes.run_country_matchmaker('CSV Files/country_traits.csv', nearest=True)
         if matching_countries is None:
             print("There are no countries that match with those specific traits.")
         else:
             print(f"The following countries match your prefereances {matching_countries}")
         questionare = input('Would you like to take the questionare again? (Y/N) ').strip().upper()
     print()
-    if questionare_bool and len(matching_countries) > 1:
+    if questionare_bool and matching_countries is not None and len(matching_countries) > 1:
         print("\nHere are all the matching countries to your preferences from your home airport. ")
         graph = create_graph(home_airport=home_airport, dest_countries=matching_countries,
-                             airport_coords=airport_coords)
+                             airport_coords=airport_coords, index=index)
         flight_visualization.visualize_new_graph(graph, home_airport=home_airport, airport_coords=airport_coords)
 
     print()
@@ -83,7 +102,8 @@ def run_voyage() -> None:
     # Display the graph from home_airport to all airports in dest_country.
     print("\nHere are all the connecting airports in your chosen destination country from "
           "your home airport.\n")
-    graph = create_graph(home_airport=home_airport, dest_countries=[dest_country], airport_coords=airport_coords)
+    graph = create_graph(home_airport=home_airport, dest_countries=[dest_country], airport_coords=airport_coords,
+                         index=index)
     flight_visualization.visualize_new_graph(graph, home_airport=home_airport, airport_coords=airport_coords)
 
     dest_airport = input('Which airport would you like to fly to? (Enter airport code) ').strip().upper()
@@ -96,7 +116,8 @@ def run_voyage() -> None:
     # Display the graph from home_airport to dest_airport with at least 5 flights highlighted.
     print("\nHere are a few flight routes for travelling from your home country to your chosen "
           "destination country.\n")
-    graph = create_graph(home_airport=home_airport, dest_airport=dest_airport, airport_coords=airport_coords)
+    graph = create_graph(home_airport=home_airport, dest_airport=dest_airport, airport_coords=airport_coords,
+                         index=index)
     flight_visualization.visualize_new_graph(graph,
                                              home_airport=home_airport, dest_airport=dest_airport,
                                              airport_coords=airport_coords)
@@ -171,49 +192,51 @@ def run_voyage() -> None:
     print('Thank you for flying with VerdeVoyage!')
 
 
+@instrumentation.instrumented('create_graph')
 def create_graph(airport_coords: dict[str, tuple[float, float]], home_airport: str = None, dest_airport: str = None,
-                 dest_countries: list[str] = None) -> data_classes.Graph:
+                 dest_countries: list[str] = None, index: flight_index.FlightIndex = None) -> data_classes.Graph:
     """
     Return a graph containing home_airport and dest_airport as vertices, if given, and the flights between the airports
     as the edges connecting the two vertices.
 
     If home_airport and/or dest_airport is not given, return the appropriate graph.
 
+    The rows are looked up in the given FlightIndex. If no index is given, the index shared by this process for
+    flight_index.FLIGHT_DATA_FILE is used, so the dataset is only parsed once.
+
     Preconditions:
         - dest_airport is None or home_airport is not None
     """
-    graph = data_classes.Graph()
-    with open('CSV Files/flight_data.csv') as file:
-        reader = csv.reader(file)
-        next(reader, None)  # skip the header
-
-        for row in reader:
-
-            # If any of the values are missing, then move to the next row
-            if row[4] == '' or row[12] == '' or row[14] == '':
-                continue
+    if index is None:
+        index = flight_index.get_flight_index()
 
-            # Depending on what is given, generate the appropriate graph
-            if home_airport is None:
-                create_graph_helper(graph, row, airport_coords)
+    # Depending on what is given, look up the appropriate rows
+    if home_airport is None:
+        rows = index.rows
 
-            elif home_airport is not None and dest_airport is not None:
-                if row[0] == home_airport and row[2] == dest_airport:
-                    create_graph_helper(graph, row, airport_coords)
+    elif dest_airport is not None:
+        rows = index.rows_between(home_airport, dest_airport)
 
-            elif home_airport is not None and dest_countries is not None:
-                lower_set = {country.lower() for country in dest_countries}
-                if row[0] == home_airport and row[3].lower() in lower_set:
-                    create_graph_helper(graph, row, airport_coords)
+    elif dest_countries is not None:
+        rows = index.rows_to_countries(home_airport, dest_countries)
 
-            else:  # home_airport is not None and both dest_airport and dest_country are None
-                if row[0] == home_airport:
-                    create_graph_helper(graph, row, airport_coords)
+    else:  # home_airport is not None and both dest_airport and dest_country are None
+        rows = index.rows_from(home_airport)
 
+    graph = data_classes.Graph()
+    packages = {}
+    for row in rows:
+        create_graph_helper(graph, row, airport_coords, packages)
+
+    if instrumentation.is_enabled():
+        instrumentation.count('create_graph', 'rows', len(rows))
+        instrumentation.count('create_graph', 'edges',
+                              sum(len(vertex.neighbours) for vertex in graph.all_verticies()) // 2)
     return graph
 
 
-def calculate_flight_scores(flights: dict[tuple[str, tuple[str, ...]], list[float | int]],
+@instrumentation.instrumented('calculate_flight_scores')
+def calculate_flight_scores(flights: dict[tuple[str, tuple[str, ...]], data_classes.FlightInfo],
                             weights: tuple[float, float, float] = (0.1, 0.1, 0.8)) -> dict[tuple[str, tuple], float]:
     """
     Given a dictionary of flight packages, calculate a score for each flight package in flights
@@ -222,29 +245,15 @@ def calculate_flight_scores(flights: dict[tuple[str, tuple[str, ...]], list[floa
     Return a mapping between each flight and its score.
 
     The input weights has the following format: (price, stops, emissions)
+    Each value is normalized by the maximum of its kind among flights. If that maximum is 0 (e.g. every flight
+    package is a direct flight), the value does not contribute to the score.
     """
-    weight_price, weight_stops, weight_emissions = weights
-    max_price = max(flights[flight_l][0] for flight_l in flights)
-    max_stops = max(flights[flight_l][1] for flight_l in flights)
-    max_emissions = max(flights[flight_l][2] for flight_l in flights)
-
-    flight_scores = {}
-
-    for flight in flights:
-        flight_info = flights[flight]
-        price, stops, emissions = flight_info[0], flight_info[1], flight_info[2]
-
-        # Normalize the values (puts the values between 0 and 1)
-        norm_price = price / max_price
-        norm_stops = stops / max_stops
-        norm_emissions = emissions / max_emissions
-
-        flight_scores[
-            flight] = norm_price * weight_price + norm_stops * weight_stops + norm_emissions * weight_emissions
-
-    return flight_scores
+    arrays = flight_scoring.FlightArrays(flights)
+    scores = flight_scoring.score_flights(arrays, weights)
+    return dict(zip(arrays.packages, scores.tolist()))
 
 
+@instrumentation.instrumented('optimal_routes')
 def optimal_routes(graph: data_classes.Graph, home_airport: str, dest_airport: str,
                    weights: tuple[float, float, float] = (0.1, 0.1, 0.8)) -> list[tuple]:
     """
@@ -253,54 +262,149 @@ def optimal_routes(graph: data_classes.Graph, home_airport: str, dest_airport: s
     The input weights has the following format: (price, stops, emissions).
     The returned tuple has the following format: ((airline, (aircraft)), price, stops, emissions, flight_score).
     """
-    # Retrieve the appropriate Vertex objects
+    # Retrieve the appropriate Vertex objects (get_vertex raises a ValueError if either airport is not in the graph)
     home_vertex = graph.get_vertex(home_airport)
     destination_vertex = graph.get_vertex(dest_airport)
 
-    if home_vertex not in graph.all_verticies() or destination_vertex not in graph.all_verticies():
-        raise ValueError
+    if destination_vertex not in home_vertex.neighbours:
+        return []
+
+    # Score all the flight packages from home airport to destination airport at once, and keep the best five
+    arrays = graph.get_flight_arrays(home_airport, dest_airport)
+    flights = arrays.flights
+    flight_scores = flight_scoring.score_flights(arrays, weights)
+    instrumentation.count('optimal_routes', 'packages', len(arrays.packages))
+
+    return [package_result(arrays.packages[i], flights, float(flight_scores[i]))
+            for i in flight_scoring.top_k(flight_scores, 5)]
+
 
+def pareto_routes(graph: data_classes.Graph, home_airport: str, dest_airport: str,
+                  weights: tuple[float, float, float] = (0.1, 0.1, 0.8), k: int = 5) -> list[tuple]:
+    """
+    Return upto k most optimal flight packages between home_airport and dest_airport, among the flight packages that
+    are not dominated by another package on price, stops and emissions.
+
+    The Pareto front of the route is computed once and cached with the route's arrays, so answering a new weights
+    query only scores the packages on the front. Scores are identical to the ones computed by optimal_routes, and
+    the first package returned is always the best package returned by optimal_routes (or tied with it).
+
+    The input weights has the following format: (price, stops, emissions).
+    The returned tuple has the same format as the one returned by optimal_routes.
+    """
+    home_vertex = graph.get_vertex(home_airport)
+    destination_vertex = graph.get_vertex(dest_airport)
     if destination_vertex not in home_vertex.neighbours:
         return []
 
-    # Find all the flight packages from home airport to destination airport
-    flights = home_vertex.neighbours[destination_vertex]
-    flight_scores = calculate_flight_scores(flights, weights)
+    arrays = graph.get_flight_arrays(home_airport, dest_airport)
+    flights = arrays.flights
+    front = arrays.pareto_front()
+    front_scores = flight_scoring.weighted_sum(arrays.normalized[front], weights)
+
+    return [package_result(arrays.packages[front[i]], flights, float(front_scores[i]))
+            for i in flight_scoring.top_k(front_scores, k)]
+
+
+def optimal_routes_batch(graph: data_classes.Graph,
+                         queries: list[tuple[str, str, tuple[float, float, float]]], k: int = 5) -> list[list[tuple]]:
+    """
+    Return the upto k most optimal flight packages for every (home_airport, dest_airport, weights) query in queries.
+
+    The result for each query is in the same position as the query, and has the same format as the result of
+    optimal_routes. Queries that share a route are scored together: the route's normalized arrays are built once
+    and scored against all the weights of those queries in a single array operation.
+
+    Raise a ValueError if any airport of a query does not appear in the graph.
+    """
+    routes = {}
+    for position, (home_airport, dest_airport, weights) in enumerate(queries):
+        routes.setdefault((home_airport, dest_airport), []).append((position, weights))
+
+    results = [[] for _ in queries]
+    for (home_airport, dest_airport), route_queries in routes.items():
+        home_vertex = graph.get_vertex(home_airport)
+        destination_vertex = graph.get_vertex(dest_airport)
+        if destination_vertex not in home_vertex.neighbours:
+            continue
 
-    # Sort the flights based on the returned score
-    sorted_flights = sorted(flight_scores.items(), key=lambda item: item[1])
+        arrays = graph.get_flight_arrays(home_airport, dest_airport)
+        flights = arrays.flights
+        weight_matrix = [weights for _, weights in route_queries]
+        scores = flight_scoring.score_flights_batch(arrays, weight_matrix)
+        best = flight_scoring.top_k_columns(scores, k)
+        best_scores = np.take_along_axis(scores, best, axis=0).T.tolist()
 
-    all_flights = [(flight[0], flights[flight[0]][0], flights[flight[0]][1], flights[flight[0]][2],
-                    round(flight[1], 5)) for flight in sorted_flights]
-    return all_flights[:5]
+        for column, (position, _) in enumerate(route_queries):
+            results[position] = [package_result(arrays.packages[i], flights, score)
+                                 for i, score in zip(best[:, column].tolist(), best_scores[column])]
 
+    return results
 
-def countries_and_airports(flight_path_file: str) -> tuple[set[str], set[str], set[str], set[str]]:
+
+def package_result(flight: tuple[str, tuple[str, ...]],
+                   flights: dict[tuple[str, tuple[str, ...]], data_classes.FlightInfo], score: float) -> tuple:
+    """
+    Return the given flight package in the format returned by optimal_routes.
+    """
+    return flight, flights[flight][0], flights[flight][1], flights[flight][2], round(score, 5)
+
+
+@instrumentation.instrumented('countries_and_airports')
+def countries_and_airports(flight_path_file: str = flight_cache.FLIGHT_ZIP_FILE) \
+        -> tuple[set[str], set[str], set[str], set[str]]:
     """
     Returns a tuple of home countries, dest countries, home airports, and dest airports in the flight dataset.
+
+    The flight dataset is streamed from the given zip file (or CSV file) without being extracted.
     """
+    summary = (set(), set(), set(), set())
+    for row in flight_reader.iter_flight_rows(flight_path_file):
+        add_to_summary(summary, row)
 
-    home_countries, home_airports = set(), set()
-    dest_countries, dest_airports = set(), set()
+    return summary
 
-    with open(flight_path_file, mode='r') as flight_paths:
-        reader = csv.reader(flight_paths)
-        next(flight_paths)
-        for row in reader:
-            home_airports.add(row[0])
-            dest_airports.add(row[2])
-            home_countries.add(row[1].lower())
-            dest_countries.add(row[3].lower())
 
-    return home_airports, home_countries, dest_airports, dest_countries
+def load_flight_data(airport_coords: dict[str, tuple[float, float]],
+                     flight_path_file: str = flight_cache.FLIGHT_ZIP_FILE) \
+        -> tuple[route_summary.RouteSummary, data_classes.Graph]:
+    """
+    Return the route summary of the flight dataset (whose as_tuple method returns the airport and country sets
+    returned by countries_and_airports), together with the graph returned by create_graph when no airport is given,
+    reading the flight dataset only once.
+    """
+    summary = route_summary.RouteSummary()
+    graph = data_classes.Graph()
+    packages = {}
+    for row in flight_reader.iter_flight_rows(flight_path_file):
+        summary.add_row(row)
+        if flight_index.is_complete_row(row):
+            create_graph_helper(graph, row, airport_coords, packages)
+
+    return summary, graph
 
 
-def get_airport_coordinates() -> dict[str, tuple[float, float]]:
+def add_to_summary(summary: tuple[set[str], set[str], set[str], set[str]], row: list[str]) -> None:
+    """
+    Add the airports and countries in the given row to the sets in summary.
+
+    The sets in summary have the same order as the tuple returned by countries_and_airports.
+    """
+    summary[0].add(row[0])
+    summary[1].add(row[1].lower())
+    summary[2].add(row[2])
+    summary[3].add(row[3].lower())
+
+
+def get_airport_coordinates(file_name: str = 'CSV Files/78_airport_info.csv') -> dict[str, tuple[float, float]]:
     """
     Return a mapping between airport codes and their latitude and longitude coordinates.
+
+    By default, only the airports of the flight dataset are read. Pass airport_index.AIRPORTS_FILE to read the
+    coordinates of every airport in the world.
     """
     airport_coords = {}
-    with open('CSV Files/78_airport_info.csv', 'r') as file:
+    with open(file_name, 'r') as file:
         reader = csv.reader(file)
         next(reader, None)  # skip the header
         for row in reader:
@@ -310,22 +414,73 @@ def get_airport_coordinates() -> dict[str, tuple[float, float]]:
 
 
 def create_graph_helper(graph: data_classes.Graph, row: list[str],
-                        airport_coords: dict[str, tuple[float, float]]) -> None:
+                        airport_coords: dict[str, tuple[float, float]],
+                        packages: dict[tuple[str, str], tuple[str, tuple[str, ...]]] = None) -> None:
     """
     Store the flight information in the given row in the graph.
+
+    Airport codes, country names and flight packages are interned, so every row with the same airline and aircraft
+    shares one flight package tuple instead of allocating new strings for each row. The flight packages are
+    interned in the given table (see intern_flight_package), which callers share across the rows of one graph.
     """
-    graph.add_vertex(row[0], row[1], airport_coords[row[0]])
-    graph.add_vertex(row[2], row[3], airport_coords[row[2]])
+    home_airport, dest_airport = sys.intern(row[0]), sys.intern(row[2])
+    graph.add_vertex(home_airport, sys.intern(row[1]), airport_coords[home_airport])
+    graph.add_vertex(dest_airport, sys.intern(row[3]), airport_coords[dest_airport])
+
+    flight_package = intern_flight_package(row[6], row[4], packages)
+    flight_info = data_classes.FlightInfo(float(row[12]), int(row[11]), int(row[14]))
+    graph.add_edge(home_airport, dest_airport, (flight_package, flight_info))
 
-    aircrafts = tuple(row[4].split('|'))
-    airline = row[6].split('| ')[0].strip('[]')
-    stops = int(row[11])
-    price = float(row[12])
-    emissions = int(row[14])
 
-    flight_package = (airline, aircrafts)
-    flight_info = [price, stops, emissions]
-    graph.add_edge(row[0], row[2], (flight_package, flight_info))
+def add_columns_to_graph(graph: data_classes.Graph, columns: flight_cache.FlightColumns,
+                         airport_coords: dict[str, tuple[float, float]]) -> None:
+    """
+    Store every flight in the given columns in the graph.
+
+    The graph is the same as the one built by calling create_graph_helper on every row of columns, but the prices,
+    stops and emissions are read straight from the arrays instead of being converted from strings.
+    """
+    strings = columns.strings
+    airports = [sys.intern(airport) for airport in strings['airports']]
+    countries = [sys.intern(country) for country in strings['countries']]
+    airlines, aircraft = strings['airlines'], strings['aircraft']
+    packages = {}
+
+    arrays = columns.columns
+    for origin, origin_country, dest, dest_country, airline, aircraft_id, price, stops, emissions in zip(
+            arrays['origin'].tolist(), arrays['origin_country'].tolist(), arrays['dest'].tolist(),
+            arrays['dest_country'].tolist(), arrays['airline'].tolist(), arrays['aircraft'].tolist(),
+            arrays['price'].tolist(), arrays['stops'].tolist(), arrays['emissions'].tolist()):
+        home_airport, dest_airport = airports[origin], airports[dest]
+        graph.add_vertex(home_airport, countries[origin_country], airport_coords[home_airport])
+        graph.add_vertex(dest_airport, countries[dest_country], airport_coords[dest_airport])
+
+        if (airline, aircraft_id) not in packages:
+            packages[(airline, aircraft_id)] = (sys.intern(airlines[airline]),
+                                                tuple(sys.intern(name) for name in aircraft[aircraft_id].split('|')))
+        flight_info = data_classes.FlightInfo(price, stops, emissions)
+        graph.add_edge(home_airport, dest_airport, (packages[(airline, aircraft_id)], flight_info))
+
+
+def intern_flight_package(airline_column: str, aircraft_column: str,
+                          packages: dict[tuple[str, str], tuple[str, tuple[str, ...]]] = None) \
+        -> tuple[str, tuple[str, ...]]:
+    """
+    Return the (airline, (aircraft)) flight package described by the given airline and aircraft columns of a row.
+
+    packages maps the raw (airline, aircraft) columns of the rows seen so far to their flight package, and the same
+    tuple object is returned for every row with the same columns in it. The table is owned by the caller (one per
+    graph or file being loaded), so it is freed once the load is done. If no table is given, a new tuple is returned.
+    """
+    key = (airline_column, aircraft_column)
+    if packages is None or key not in packages:
+        aircrafts = tuple(sys.intern(aircraft) for aircraft in aircraft_column.split('|'))
+        airline = sys.intern(airline_column.split('| ')[0].strip('[]'))
+        if packages is None:
+            return airline, aircrafts
+        packages[key] = (airline, aircrafts)
+
+    return packages[key]
 
 
 def carbon_statistics(offset: int) -> set[str]:
@@ -378,9 +533,9 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-line-length': 170,
         'disable': ['E1136', 'W0221', 'E9969'],
-        'extra-imports': ['csv', 'random', 'data_classes', 'flight_visualization'],
-        'allowed-io': ['run_voyage', 'get_airport_coordinates', 'countries_and_airports', 'optimal_routes',
-                       'create_graph'],
+        'extra-imports': ['csv', 'random', 'sys', 'numpy', 'airport_index', 'data_classes', 'flight_cache', 'flight_index', 'flight_reader',
+                          'flight_scoring', 'flight_visualization', 'instrumentation', 'route_summary'],
+        'allowed-io': ['run_voyage', 'get_airport_coordinates', 'optimal_routes'],
         'max-nested-blocks': 4,
         'max-locals': 35,
         'max-statements': 90
@@ -0,0 +1,316 @@
+"""Verde Voyage: Instrumentation and profiling hooks
+
+Module Description
+==================
+This module measures where the time of a voyage goes. The stages of the pipeline (loading the flight dataset,
+countries_and_airports, create_graph, scoring flight packages and building the plotly figure) are wrapped in timed
+or instrumented, which record the latency of every call in a histogram per stage, together with counts such as the
+number of rows and edges each stage processed. The recorded metrics can be exported in the Prometheus text format
+or as JSON lines.
+
+Instrumentation is off unless the VERDE_METRICS environment variable is set (to anything but '0'), or enable() is
+called. While it is off, timed returns a shared no-op context manager and instrumented functions call straight
+through, so the cost is one flag check per call.
+
+Setting the VERDE_PROFILE environment variable to 'cprofile' or 'tracemalloc' makes run_instrumented run the whole
+program under cProfile or tracemalloc, and write a report to the file named by VERDE_PROFILE_OUTPUT.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Any, Callable, Optional
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+METRICS_ENV = 'VERDE_METRICS'
+METRICS_OUTPUT_ENV = 'VERDE_METRICS_OUTPUT'
+PROFILE_ENV = 'VERDE_PROFILE'
+PROFILE_OUTPUT_ENV = 'VERDE_PROFILE_OUTPUT'
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+# The upper bounds, in seconds, of the buckets of the latency histograms.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# The number of lines (functions or allocation sites) in a profiling report.
+REPORT_LINES = 40
+
+
+class Histogram:
+    """
+    A histogram of latencies, with the cumulative buckets of a Prometheus histogram.
+
+    Instance Attributes:
+        - bounds: The upper bound of every bucket, in increasing order. A last bucket holds the larger values.
+        - bucket_counts: The number of observed values in each bucket (not cumulative).
+        - count: The number of observed values.
+        - total: The sum of the observed values.
+
+    Representation Invariants:
+        - len(self.bucket_counts) == len(self.bounds) + 1
+        - sum(self.bucket_counts) == self.count
+    """
+    __slots__ = ('bounds', 'bucket_counts', 'count', 'total')
+    bounds: tuple[float, ...]
+    bucket_counts: list[int]
+    count: int
+    total: float
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Initialize an empty histogram with buckets of the given upper bounds."""
+        self.bounds = bounds
+        self.bucket_counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add the given value to this histogram."""
+        self.bucket_counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        """Return the (upper bound, number of values at most the bound) pairs of every bucket, ending with '+Inf'."""
+        pairs, running = [], 0
+        for bound, bucket_count in zip([str(bound) for bound in self.bounds] + ['+Inf'], self.bucket_counts):
+            running += bucket_count
+            pairs.append((bound, running))
+        return pairs
+
+
+class MetricsRegistry:
+    """
+    The latency histograms and item counts recorded for every stage of the pipeline.
+
+    Instance Attributes:
+        - histograms: A mapping from each stage to the histogram of its latencies, in seconds.
+        - counts: A mapping from each stage to the total of every count recorded for it, by name (such as 'rows').
+
+    Private Instance Attributes:
+        - _lock: The lock held while metrics are recorded or read.
+    """
+    histograms: dict[str, Histogram]
+    counts: dict[str, dict[str, int]]
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        """Initialize a registry with no metrics."""
+        self.histograms = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record one call of the given stage that took the given number of seconds."""
+        with self._lock:
+            if stage not in self.histograms:
+                self.histograms[stage] = Histogram()
+            self.histograms[stage].observe(seconds)
+
+    def add_count(self, stage: str, name: str, value: int) -> None:
+        """Add value to the count with the given name of the given stage."""
+        with self._lock:
+            stage_counts = self.counts.setdefault(stage, {})
+            stage_counts[name] = stage_counts.get(name, 0) + value
+
+    def clear(self) -> None:
+        """Remove every recorded metric."""
+        with self._lock:
+            self.histograms.clear()
+            self.counts.clear()
+
+    def to_prometheus(self) -> str:
+        """Return every recorded metric in the Prometheus text format."""
+        with self._lock:
+            lines = ['# TYPE verde_stage_seconds histogram']
+            for stage, histogram in sorted(self.histograms.items()):
+                lines.extend(f'verde_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}'
+                             for bound, count in histogram.cumulative())
+                lines.append(f'verde_stage_seconds_sum{{stage="{stage}"}} {histogram.total}')
+                lines.append(f'verde_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            lines.append('# TYPE verde_stage_items_total counter')
+            for stage, stage_counts in sorted(self.counts.items()):
+                lines.extend(f'verde_stage_items_total{{stage="{stage}",item="{name}"}} {value}'
+                             for name, value in sorted(stage_counts.items()))
+        return '\n'.join(lines) + '\n'
+
+    def to_json_lines(self) -> str:
+        """Return every recorded metric as JSON lines, one line per stage."""
+        with self._lock:
+            lines = []
+            for stage in sorted(self.histograms.keys() | self.counts.keys()):
+                record: dict[str, Any] = {'stage': stage, 'counts': dict(self.counts.get(stage, {}))}
+                histogram = self.histograms.get(stage)
+                if histogram is not None:
+                    record.update(calls=histogram.count, seconds=histogram.total, buckets=histogram.cumulative())
+                lines.append(json.dumps(record, sort_keys=True))
+        return ''.join(line + '\n' for line in lines)
+
+
+REGISTRY = MetricsRegistry()
+
+_ENABLED = os.environ.get(METRICS_ENV, '0') not in ('', '0')
+
+
+def enable(enabled: bool = True) -> None:
+    """Turn instrumentation on (or off, if enabled is False)."""
+    global _ENABLED
+    _ENABLED = enabled
+
+
+def is_enabled() -> bool:
+    """Return whether instrumentation is on."""
+    return _ENABLED
+
+
+class _Timer:
+    """
+    A context manager recording the latency of the code it wraps in the histogram of a stage.
+
+    Instance Attributes:
+        - stage: The stage being timed.
+        - start: The time the context was entered, from time.perf_counter.
+    """
+    __slots__ = ('stage', 'start')
+    stage: str
+    start: float
+
+    def __init__(self, stage: str) -> None:
+        """Initialize a timer of the given stage."""
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self) -> _Timer:
+        """Start timing."""
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Record the time elapsed since the context was entered."""
+        REGISTRY.observe(self.stage, time.perf_counter() - self.start)
+
+
+_NO_TIMER = nullcontext()
+
+
+def timed(stage: str) -> Any:
+    """
+    Return a context manager recording the latency of the code it wraps in the histogram of the given stage, or a
+    shared no-op context manager if instrumentation is off.
+    """
+    return _Timer(stage) if _ENABLED else _NO_TIMER
+
+
+def instrumented(stage: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """
+    Return a decorator recording the latency of every call of the decorated function in the histogram of the given
+    stage (by default, the name of the function) while instrumentation is on.
+    """
+    def decorator(function: Callable) -> Callable:
+        """Return the instrumented version of function."""
+        name = function.__name__ if stage is None else stage
+
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            """Call function, timing the call if instrumentation is on."""
+            if not _ENABLED:
+                return function(*args, **kwargs)
+            with _Timer(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(stage: str, name: str, value: int) -> None:
+    """Add value to the count with the given name (such as 'rows') of the given stage, if instrumentation is on."""
+    if _ENABLED:
+        REGISTRY.add_count(stage, name, value)
+
+
+def write_metrics(path: str) -> None:
+    """
+    Write every recorded metric to path, as JSON lines if path ends with '.jsonl' and in the Prometheus text format
+    otherwise.
+    """
+    text = REGISTRY.to_json_lines() if path.endswith('.jsonl') else REGISTRY.to_prometheus()
+    with open(path, 'w') as metrics_file:
+        metrics_file.write(text)
+
+
+def run_instrumented(function: Callable[[], Any]) -> Any:
+    """
+    Call function and return its result, profiling it as requested by the environment.
+
+    If VERDE_PROFILE is 'cprofile', the call is run under cProfile and the functions with the highest cumulative time
+    are written to VERDE_PROFILE_OUTPUT (by default, 'verde_profile.txt'). If it is 'tracemalloc', the call is run
+    under tracemalloc and the allocation sites holding the most memory at its end are written there instead. If
+    instrumentation is on and VERDE_METRICS_OUTPUT is set, the recorded metrics are written to that file (see
+    write_metrics) once the call returns.
+
+    Raise a ValueError if VERDE_PROFILE is set to an unknown mode.
+    """
+    mode = os.environ.get(PROFILE_ENV, '').strip().lower()
+    if mode and mode not in PROFILE_MODES:
+        raise ValueError
+    output = os.environ.get(PROFILE_OUTPUT_ENV, 'verde_profile.txt')
+
+    try:
+        if mode == 'cprofile':
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(function)
+            finally:
+                with open(output, 'w') as report_file:
+                    pstats.Stats(profile, stream=report_file).sort_stats('cumulative').print_stats(REPORT_LINES)
+        elif mode == 'tracemalloc':
+            tracemalloc.start()
+            try:
+                return function()
+            finally:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                with open(output, 'w') as report_file:
+                    report_file.write(f'Peak traced memory: {peak} bytes\n')
+                    for statistic in snapshot.statistics('lineno')[:REPORT_LINES]:
+                        report_file.write(f'{statistic}\n')
+        else:
+            return function()
+    finally:
+        metrics_output = os.environ.get(METRICS_OUTPUT_ENV)
+        if _ENABLED and metrics_output:
+            write_metrics(metrics_output)
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['bisect', 'contextlib', 'typing', 'cProfile', 'functools', 'json', 'os', 'pstats',
+                          'threading', 'time', 'tracemalloc'],
+        'allowed-io': ['write_metrics', 'run_instrumented'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })
@@ -12,6 +12,8 @@ platform is strictly prohibited. All rights reserved.
 This file is Copyright (c) 2024 VerdeVoyage
 """
 import helper_functions
+import instrumentation
 
 if __name__ == '__main__':
-    helper_functions.run_voyage()
+    # Set VERDE_PROFILE to 'cprofile' or 'tracemalloc' to profile the run, and VERDE_METRICS to record stage latencies
+    instrumentation.run_instrumented(helper_functions.run_voyage)
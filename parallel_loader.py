@@ -0,0 +1,259 @@
+"""Verde Voyage: Parallel loading of the flight dataset
+
+Module Description
+==================
+This module parses the flight dataset in several processes at once. The CSV file is split into chunks of whole
+lines, and each chunk is parsed by a worker of a ProcessPoolExecutor into compact NumPy arrays, in the same
+dictionary-encoded format as the columnar cache of flight_cache. The arrays of every chunk are then merged in file
+order, so the result is identical to parsing the file in a single process, no matter how many workers are used.
+
+A plain CSV file is split into byte ranges, which every worker reads on its own. A zip file cannot be read from
+the middle, so its CSV file is decompressed by the main process and the chunks of text are sent to the workers.
+
+The chunks are split at line breaks, so this module assumes that no field of the dataset contains a line break, and
+that the text encoding of the dataset (flight_reader.ENCODING, the same encoding every other reader decodes it with)
+encodes a line break as a single newline byte, like UTF-8 and the other ASCII-compatible encodings do.
+
+The parsed chunks are merged as soon as they arrive, so only the chunks still being parsed are held in memory next
+to the merged columns.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional
+import csv
+import io
+import os
+import zipfile
+import numpy as np
+import data_classes
+import flight_cache
+import flight_index
+import flight_reader
+import helper_functions
+import route_summary
+
+# The number of bytes of the CSV file parsed by each task.
+CHUNK_SIZE = 1 << 24
+
+
+class ParsedChunk:
+    """
+    The complete flights of one chunk of the flight dataset, dictionary-encoded with string tables local to the chunk.
+
+    Instance Attributes:
+        - columns: A mapping from each column of flight_cache.ID_COLUMNS and flight_cache.VALUE_COLUMNS to its array.
+            The id columns index into the string tables of this chunk.
+        - strings: A mapping from each table of flight_cache.STRING_TABLES to its strings, in the order they first
+            appear in the chunk.
+        - summary: The home airports, home countries, destination airports and destination countries of every row of
+            the chunk, in the format of flight_cache.FlightColumns.summary.
+    """
+    __slots__ = ('columns', 'strings', 'summary')
+    columns: dict[str, np.ndarray]
+    strings: dict[str, list[str]]
+    summary: tuple[set[str], set[str], set[str], set[str]]
+
+    def __init__(self, columns: dict[str, np.ndarray], strings: dict[str, list[str]],
+                 summary: tuple[set[str], set[str], set[str], set[str]]) -> None:
+        """Initialize a parsed chunk with the given arrays, string tables and summary."""
+        self.columns = columns
+        self.strings = strings
+        self.summary = summary
+
+
+def load_flight_columns(flight_path_file: str = flight_cache.FLIGHT_ZIP_FILE, workers: Optional[int] = None,
+                        chunk_size: int = CHUNK_SIZE) -> flight_cache.FlightColumns:
+    """
+    Return the columns of the flight dataset in the given file (a zip file or a CSV file), parsed by the given
+    number of worker processes (by default, one per CPU).
+
+    The returned columns are identical to the ones flight_cache.build_flight_cache builds from the same file.
+
+    Preconditions:
+        - workers is None or workers >= 1
+        - chunk_size >= 1
+    """
+    encoding = flight_reader.ENCODING
+    with ProcessPoolExecutor(workers) as executor:
+        if zipfile.is_zipfile(flight_path_file):
+            tasks = ((parse_text, chunk, encoding) for chunk in iter_zip_chunks(flight_path_file, chunk_size))
+        else:
+            tasks = ((parse_byte_range, flight_path_file, start, end, encoding)
+                     for start, end in byte_ranges(flight_path_file, chunk_size))
+        return merge_chunks(_run_in_order(executor, tasks, 2 * (workers or os.cpu_count() or 1)))
+
+
+def load_flight_data(airport_coords: dict[str, tuple[float, float]],
+                     flight_path_file: str = flight_cache.FLIGHT_ZIP_FILE, workers: Optional[int] = None) \
+        -> tuple[route_summary.RouteSummary, data_classes.Graph]:
+    """
+    Return the same route summary and graph as helper_functions.load_flight_data, parsing the flight dataset with
+    the given number of worker processes.
+    """
+    columns = load_flight_columns(flight_path_file, workers)
+    graph = data_classes.Graph()
+    helper_functions.add_columns_to_graph(graph, columns, airport_coords)
+    return route_summary.RouteSummary.from_columns(columns), graph
+
+
+def byte_ranges(csv_file: str, chunk_size: int = CHUNK_SIZE) -> list[tuple[int, int]]:
+    """
+    Return the (start, end) byte ranges of the chunks of the given CSV file, without its header.
+
+    Every range is about chunk_size bytes long and starts at the beginning of a line.
+    """
+    size = os.path.getsize(csv_file)
+    ranges = []
+    with open(csv_file, 'rb') as file:
+        file.readline()  # skip the header
+        start = file.tell()
+        while start < size:
+            file.seek(min(start + chunk_size, size))
+            if file.tell() < size:
+                file.seek(file.tell() - 1)  # so a range ending right at a line break keeps its boundary
+                file.readline()
+            end = file.tell()
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+
+def iter_zip_chunks(zip_path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Return an iterator over chunks of whole lines of the CSV file in the given zip file, without its header.
+    """
+    with zipfile.ZipFile(zip_path) as zip_ref, zip_ref.open(zip_ref.namelist()[0]) as raw_file:
+        raw_file.readline()  # skip the header
+        remainder = b''
+        for block in iter(lambda: raw_file.read(chunk_size), b''):
+            block = remainder + block
+            split = block.rfind(b'\n') + 1
+            remainder = block[split:]
+            if split > 0:
+                yield block[:split]
+
+        if remainder:
+            yield remainder
+
+
+def parse_byte_range(csv_file: str, start: int, end: int, encoding: Optional[str] = None) -> ParsedChunk:
+    """
+    Return the flights in the given byte range of the given CSV file, decoded with the given encoding (by default,
+    flight_reader.ENCODING).
+    """
+    with open(csv_file, 'rb') as file:
+        file.seek(start)
+        return parse_text(file.read(end - start), encoding)
+
+
+def parse_text(text: bytes, encoding: Optional[str] = None) -> ParsedChunk:
+    """
+    Return the flights in the given encoded lines of the flight dataset, decoded with the given encoding (by
+    default, flight_reader.ENCODING) and parsed like flight_cache.build_flight_cache parses every row.
+    """
+    ids = {table: {} for table in flight_cache.STRING_TABLES}
+    id_values = {column: [] for column in flight_cache.ID_COLUMNS}
+    values = {column: [] for column in flight_cache.VALUE_COLUMNS}
+    summary = (set(), set(), set(), set())
+
+    for row in csv.reader(io.StringIO(text.decode(flight_reader.ENCODING if encoding is None else encoding), newline='')):
+        summary[0].add(row[0])
+        summary[1].add(row[1].lower())
+        summary[2].add(row[2])
+        summary[3].add(row[3].lower())
+        if not flight_index.is_complete_row(row):
+            continue
+
+        fields = {'origin': row[0], 'origin_country': row[1], 'dest': row[2], 'dest_country': row[3],
+                  'aircraft': row[4], 'airline': row[6].split('| ')[0].strip('[]')}
+        for column, value in fields.items():
+            table = ids[flight_cache.ID_COLUMNS[column]]
+            id_values[column].append(table.setdefault(value, len(table)))
+
+        values['stops'].append(int(row[11]))
+        values['price'].append(float(row[12]))
+        values['emissions'].append(int(row[14]))
+
+    columns = {column: np.array(id_values[column], dtype=np.int32) for column in flight_cache.ID_COLUMNS}
+    columns.update({column: np.array(values[column], dtype=dtype)
+                    for column, dtype in flight_cache.VALUE_COLUMNS.items()})
+    return ParsedChunk(columns, {table: list(ids[table]) for table in flight_cache.STRING_TABLES}, summary)
+
+
+def merge_chunks(chunks: Iterable[ParsedChunk]) -> flight_cache.FlightColumns:
+    """
+    Return the columns of the given chunks, in order, with the string tables of the chunks merged into one.
+
+    The chunks are merged one at a time as the iterable produces them, and nothing but the arrays of a chunk is kept
+    once it is merged, so the parsed chunks of a whole file never need to be held in memory together.
+
+    Strings keep the order they first appear in across all the chunks, so the ids are the same as if the whole file
+    had been parsed at once.
+    """
+    tables = {table: {} for table in flight_cache.STRING_TABLES}
+    parts = {column: [] for column in list(flight_cache.ID_COLUMNS) + list(flight_cache.VALUE_COLUMNS)}
+    summary = (set(), set(), set(), set())
+
+    for chunk in chunks:
+        remaps = {}
+        for table, strings in chunk.strings.items():
+            global_ids = tables[table]
+            remaps[table] = np.array([global_ids.setdefault(string, len(global_ids)) for string in strings],
+                                     dtype=np.int32)
+
+        for column, table in flight_cache.ID_COLUMNS.items():
+            parts[column].append(remaps[table][chunk.columns[column]])
+        for column in flight_cache.VALUE_COLUMNS:
+            parts[column].append(chunk.columns[column])
+        for names, chunk_names in zip(summary, chunk.summary):
+            names.update(chunk_names)
+
+    dtypes = dict.fromkeys(flight_cache.ID_COLUMNS, np.int32) | flight_cache.VALUE_COLUMNS
+    columns = {column: np.concatenate(parts[column] + [np.array([], dtype=dtype)]).astype(dtype)
+               for column, dtype in dtypes.items()}
+    return flight_cache.FlightColumns(columns, {table: list(tables[table]) for table in tables}, summary)
+
+
+def _run_in_order(executor: ProcessPoolExecutor, tasks: Iterator[tuple], window: int) -> Iterator[ParsedChunk]:
+    """
+    Return an iterator over the results of the given (function, *arguments) tasks run in executor, in task order.
+
+    At most window tasks are submitted ahead of the result being returned, so the chunks of a large file are not all
+    held in memory at once.
+    """
+    pending: deque[Future] = deque()
+    for task in tasks:
+        pending.append(executor.submit(*task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['collections', 'concurrent.futures', 'csv', 'io', 'os', 'zipfile', 'numpy', 'data_classes',
+                          'flight_cache', 'flight_index', 'flight_reader', 'helper_functions', 'route_summary'],
+        'allowed-io': ['byte_ranges', 'parse_byte_range'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })
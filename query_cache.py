@@ -0,0 +1,346 @@
+"""Verde Voyage: Query result cache
+
+Module Description
+==================
+This module contains the QueryCache class, which caches the results of the queries users repeat the most: the
+graphs built by helper_functions.create_graph for each view, and the rankings returned by
+helper_functions.optimal_routes for each route and set of weights. Most of our traffic goes to a few hub routes, so
+most of these queries are answered from the cache instead of being recomputed.
+
+A cache evicts its least recently used results when it holds too many of them or when their estimated size exceeds
+its memory bound, and a result expires once it is older than the time to live of the cache. Every result also
+remembers the version of the data it was computed from, and a result of another version is dropped when it is
+looked up, so a changed graph is never answered from stale results. The data itself (a graph or a flight index) is
+part of the key of its results through a weak reference (see data_key), so the results of several graphs can be
+cached at once, and a cache never keeps the data of its results alive.
+
+Weights are snapped to a grid of WEIGHT_STEP (see quantize_weights) before rankings are keyed and computed, so
+weights set by sliders share their rankings with every nearby weights, and a cached ranking is always exactly the
+ranking helper_functions.optimal_routes returns for the snapped weights.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, Optional
+import sys
+import threading
+import time
+import weakref
+import data_classes
+import flight_index
+import helper_functions
+
+# The number of decimals weights are snapped to before rankings are keyed and computed (a grid of 0.01).
+WEIGHT_DECIMALS = 2
+
+# The estimated memory used by one flight package and one airport of a cached graph, in bytes.
+PACKAGE_BYTES = 200
+VERTEX_BYTES = 1000
+
+# The counters of a cache, in the order they are reported.
+COUNTERS = ('hits', 'misses', 'evictions', 'expirations', 'invalidations')
+
+
+class _Entry:
+    """
+    A cached result.
+
+    Instance Attributes:
+        - value: The result.
+        - size: The estimated memory used by the result, in bytes.
+        - expires: The time (of the clock of the cache) after which the result is expired.
+        - version: The version of the data the result was computed from.
+    """
+    __slots__ = ('value', 'size', 'expires', 'version')
+    value: Any
+    size: int
+    expires: float
+    version: Optional[Hashable]
+
+    def __init__(self, value: Any, size: int, expires: float, version: Optional[Hashable]) -> None:
+        """Initialize an entry with the given result, size, expiry time and version."""
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.version = version
+
+
+class QueryCache:
+    """
+    A thread-safe cache of query results with least-recently-used and time-to-live eviction.
+
+    Results are never copied, so callers must not modify the results they get from a cache.
+
+    Instance Attributes:
+        - max_entries: The maximum number of results kept in the cache.
+        - max_bytes: The maximum estimated memory used by the results kept in the cache, in bytes.
+        - ttl: The number of seconds a result stays in the cache, or None if results never expire.
+        - counters: The number of hits, misses, evictions (to respect max_entries or max_bytes), expirations and
+            invalidations (results dropped because they were computed from another version of their data, or by
+            invalidate) since the cache was created.
+
+    Private Instance Attributes:
+        - _entries: A mapping from each key to its entry, from least to most recently used.
+        - _bytes: The estimated memory used by all the cached results, in bytes.
+        - _clock: The function returning the current time, in seconds.
+        - _lock: The lock held while the entries or counters are read or changed.
+
+    Representation Invariants:
+        - self.max_entries >= 0
+        - self.max_bytes >= 0
+        - self.ttl is None or self.ttl > 0
+        - len(self._entries) <= self.max_entries
+        - self._bytes <= self.max_bytes
+    """
+    max_entries: int
+    max_bytes: int
+    ttl: Optional[float]
+    counters: dict[str, int]
+    _entries: OrderedDict[Hashable, _Entry]
+    _bytes: int
+    _clock: Callable[[], float]
+    _lock: threading.Lock
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 256 << 20, ttl: Optional[float] = 600.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """Initialize an empty cache with the given bounds and time to live."""
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Optional[Hashable] = None, default: Any = None) -> Any:
+        """
+        Return the result cached under key for the given version of its data, marking it as recently used, or
+        default if there is none.
+
+        A result cached under key for another version is dropped, as it can never be returned again.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version != version:
+                self._remove(key)
+                self.counters['invalidations'] += 1
+                entry = None
+            elif entry is not None and self._clock() > entry.expires:
+                self._remove(key)
+                self.counters['expirations'] += 1
+                entry = None
+
+            if entry is None:
+                self.counters['misses'] += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: Any, version: Optional[Hashable] = None, size: Optional[int] = None) -> None:
+        """
+        Cache value, computed from the given version of its data, under key, evicting the least recently used results
+        if the cache is then over one of its bounds.
+
+        The size of value is estimated with estimate_size if it is not given. A result larger than max_bytes is not
+        cached.
+        """
+        if size is None:
+            size = estimate_size(value)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes or self.max_entries == 0:
+                return
+
+            expires = float('inf') if self.ttl is None else self._clock() + self.ttl
+            self._entries[key] = _Entry(value, size, expires, version)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.counters['evictions'] += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], version: Optional[Hashable] = None,
+                       size: Optional[Callable[[Any], int]] = None) -> Any:
+        """
+        Return the result cached under key, or compute it with compute(), cache it and return it.
+
+        The size of a computed result is estimated with size, or with estimate_size if size is not given. The lock
+        of the cache is not held while the result is computed, so the same result may be computed by several threads
+        at once; the last one to finish is kept.
+        """
+        missing = object()
+        value = self.get(key, version, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value, version, None if size is None else size(value))
+        return value
+
+    def invalidate(self) -> None:
+        """Drop every cached result, counting them as invalidations."""
+        with self._lock:
+            self.counters['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def nbytes(self) -> int:
+        """Return the estimated memory used by the cached results, in bytes."""
+        return self._bytes
+
+    def __len__(self) -> int:
+        """Return the number of results in the cache."""
+        return len(self._entries)
+
+    def _remove(self, key: Hashable) -> None:
+        """Remove the entry of key from the cache."""
+        self._bytes -= self._entries.pop(key).size
+
+
+# The caches used by cached_create_graph and cached_optimal_routes when no cache is given.
+VIEW_CACHE = QueryCache(max_entries=64)
+RANKING_CACHE = QueryCache()
+
+
+def view_key(home_airport: Optional[str] = None, dest_airport: Optional[str] = None,
+             dest_countries: Optional[Iterable[str]] = None) \
+        -> tuple[str, Optional[str], Optional[str], tuple[str, ...]]:
+    """
+    Return the cache key of the graph create_graph returns for the given arguments: (view mode, home_airport,
+    dest_airport, sorted lowercase destination countries).
+
+    The view mode is 'network' if no home_airport is given, 'route' if dest_airport is given, 'countries' if
+    dest_countries is given, and 'origin' otherwise. Arguments create_graph ignores for a view mode are left out.
+    """
+    if home_airport is None:
+        return 'network', None, None, ()
+    if dest_airport is not None:
+        return 'route', home_airport, dest_airport, ()
+    if dest_countries is not None:
+        return 'countries', home_airport, None, tuple(sorted({country.lower() for country in dest_countries}))
+    return 'origin', home_airport, None, ()
+
+
+def quantize_weights(weights: tuple[float, float, float]) -> tuple[float, float, float]:
+    """Return the given (price, stops, emissions) weights snapped to the nearest multiple of 0.1 ** WEIGHT_DECIMALS."""
+    return tuple(round(float(weight), WEIGHT_DECIMALS) for weight in weights)
+
+
+def ranking_key(home_airport: str, dest_airport: str,
+                weights: tuple[float, float, float]) -> tuple[str, str, str, tuple[float, float, float]]:
+    """
+    Return the cache key of the ranking of the flight packages of the given route for the given weights, snapped by
+    quantize_weights. The ranking cached under the key must be computed with the snapped weights.
+    """
+    return 'ranking', home_airport, dest_airport, quantize_weights(weights)
+
+
+def data_key(data: Any, key: tuple) -> tuple:
+    """
+    Return the cache key of the result with the given key computed from the given data (such as a graph).
+
+    The data is held by a weak reference, so cached results do not keep it alive. The weak references to the same
+    live object are equal, but a weak reference to a collected object is only equal to itself, so a new object is
+    never answered from the results of an old one, even if it reuses its id. The results of collected data are
+    never looked up again, and are evicted like any other unused result.
+    """
+    return (weakref.ref(data),) + key
+
+
+def cached_create_graph(airport_coords: dict[str, tuple[float, float]], home_airport: str = None,
+                        dest_airport: str = None, dest_countries: list[str] = None,
+                        index: flight_index.FlightIndex = None, cache: QueryCache = VIEW_CACHE) -> data_classes.Graph:
+    """
+    Return the graph helper_functions.create_graph returns for the given arguments, from cache if it was already
+    built from the same index.
+
+    The returned graph may be shared with other callers, so it must not be modified.
+    """
+    if index is None:
+        index = flight_index.get_flight_index()
+    return cache.get_or_compute(
+        data_key(index, view_key(home_airport, dest_airport, dest_countries)),
+        lambda: helper_functions.create_graph(airport_coords, home_airport, dest_airport, dest_countries, index),
+        size=graph_size)
+
+
+def cached_optimal_routes(graph: data_classes.Graph, home_airport: str, dest_airport: str,
+                          weights: tuple[float, float, float], cache: QueryCache = RANKING_CACHE) -> list[tuple]:
+    """
+    Return the most optimal flight packages from home_airport to dest_airport for the given weights, in the format
+    returned by helper_functions.optimal_routes, from cache if they were already ranked for the same weights and the
+    same version of graph.
+
+    The packages are ranked with the weights snapped by quantize_weights, so every weights with the same key get
+    the same ranking.
+    """
+    quantized = quantize_weights(weights)
+    return cache.get_or_compute(
+        data_key(graph, ranking_key(home_airport, dest_airport, quantized)),
+        lambda: helper_functions.optimal_routes(graph, home_airport, dest_airport, quantized),
+        graph.version)
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Return an estimate of the memory used by the given value and the lists, tuples, sets and dictionaries it
+    contains, in bytes.
+    """
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return size
+
+
+def graph_size(graph: data_classes.Graph) -> int:
+    """Return an estimate of the memory used by the given graph, in bytes."""
+    packages = sum(len(flights) for vertex in graph.all_verticies() for flights in vertex.neighbours.values())
+    return packages // 2 * PACKAGE_BYTES + len(graph.all_verticies()) * VERTEX_BYTES
+
+
+def format_metrics(caches: dict[str, QueryCache]) -> str:
+    """
+    Return the counters, sizes and memory use of the given caches, keyed by name, in the Prometheus text format.
+    """
+    lines = []
+    for counter in COUNTERS:
+        lines.append(f'# TYPE verde_query_cache_{counter}_total counter')
+        lines.extend(f'verde_query_cache_{counter}_total{{cache="{name}"}} {cache.counters[counter]}'
+                     for name, cache in caches.items())
+    for gauge, measure in (('entries', len), ('bytes', QueryCache.nbytes)):
+        lines.append(f'# TYPE verde_query_cache_{gauge} gauge')
+        lines.extend(f'verde_query_cache_{gauge}{{cache="{name}"}} {measure(cache)}' for name, cache in caches.items())
+    return '\n'.join(lines) + '\n'
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['collections', 'typing', 'sys', 'threading', 'time', 'weakref', 'data_classes',
+                          'flight_index', 'helper_functions'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })
@@ -0,0 +1,258 @@
+"""Verde Voyage: All-pairs route matrices
+
+Module Description
+==================
+This module contains the RouteMatrices class, which holds the price and emissions statistics of every pair of
+airports of the served network as dense NumPy matrices indexed by airport id, so analytics dashboards can read the
+statistics of any route, or of the whole network, without querying the graph pair by pair.
+
+For every pair of airports connected by a flight, the matrices hold the minimum, maximum and median price and carbon
+emissions of its flight packages, and the number of flight packages. The matrices also hold the lowest emissions of
+an itinerary between any two airports, using any number of flights, computed with a vectorized Floyd-Warshall
+algorithm over the minimum emissions of the direct flights.
+
+The matrices are precomputed once per version of the flight dataset and saved next to it in a .npz file, together
+with the fingerprint of the dataset they were computed from, so dashboards load them instantly.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from typing import Optional
+import json
+import os
+import tempfile
+import numpy as np
+import data_classes
+import flight_cache
+import helper_functions
+
+MATRICES_FILE = 'CSV Files/route_matrices.npz'
+
+# The version of the format of the matrices file. Files in another format are recomputed.
+MATRICES_FORMAT_VERSION = 1
+
+# The statistics stored for every pair of airports, as (name, column of FlightArrays.values, NumPy reduction).
+STATISTICS = (('min_price', 0, np.min), ('max_price', 0, np.max), ('median_price', 0, np.median),
+              ('min_emissions', 2, np.min), ('max_emissions', 2, np.max), ('median_emissions', 2, np.median))
+
+
+class RouteMatrices:
+    """
+    The price and emissions statistics of every pair of airports of a graph.
+
+    The matrices are symmetric, like the edges of a Graph. Entries of pairs without a direct flight are NaN (and 0
+    in package_counts).
+
+    Instance Attributes:
+        - codes: The airport code of every airport id, in alphabetical order.
+        - statistics: A mapping from each name in STATISTICS to its matrix.
+        - package_counts: The number of flight packages between every pair of airports.
+        - min_emission_distances: The lowest total emissions of an itinerary between every pair of airports, with any
+            number of flights. Unreachable pairs are infinite, and the diagonal is 0.
+        - next_airports: The id of the airport reached by the first flight of the itinerary with the lowest
+            emissions between every pair of airports, or -1 if there is none.
+
+    Private Instance Attributes:
+        - _ids: A mapping from each airport code to its id.
+
+    Representation Invariants:
+        - all(matrix.shape == (len(self.codes), len(self.codes)) for matrix in self.statistics.values())
+    """
+    __slots__ = ('codes', 'statistics', 'package_counts', 'min_emission_distances', 'next_airports', '_ids')
+    codes: list[str]
+    statistics: dict[str, np.ndarray]
+    package_counts: np.ndarray
+    min_emission_distances: np.ndarray
+    next_airports: np.ndarray
+    _ids: dict[str, int]
+
+    def __init__(self, codes: list[str], statistics: dict[str, np.ndarray], package_counts: np.ndarray,
+                 min_emission_distances: np.ndarray, next_airports: np.ndarray) -> None:
+        """Initialize the matrices of the given airports with the given arrays."""
+        self.codes = codes
+        self.statistics = statistics
+        self.package_counts = package_counts
+        self.min_emission_distances = min_emission_distances
+        self.next_airports = next_airports
+        self._ids = {code: i for i, code in enumerate(codes)}
+
+    @classmethod
+    def from_graph(cls, graph: data_classes.Graph) -> RouteMatrices:
+        """Return the matrices of every pair of airports in the given graph."""
+        codes = sorted(graph.all_airport_codes())
+        ids = {code: i for i, code in enumerate(codes)}
+        n = len(codes)
+        statistics = {name: np.full((n, n), np.nan) for name, _, _ in STATISTICS}
+        package_counts = np.zeros((n, n), dtype=np.int64)
+
+        for i, code in enumerate(codes):
+            for neighbour_code in graph.get_vertex(code).get_neighbors():
+                j = ids[neighbour_code]
+                if i < j:  # every edge is stored in both directions
+                    values = graph.get_flight_arrays(code, neighbour_code).values
+                    for name, column, reduction in STATISTICS:
+                        statistics[name][i, j] = statistics[name][j, i] = reduction(values[:, column])
+                    package_counts[i, j] = package_counts[j, i] = len(values)
+
+        distances, next_airports = min_plus_closure(statistics['min_emissions'])
+        return cls(codes, statistics, package_counts, distances, next_airports)
+
+    def airport_id(self, airport_code: str) -> int:
+        """Return the id of the given airport. Raise a ValueError if it is not in the matrices."""
+        if airport_code not in self._ids:
+            raise ValueError
+        return self._ids[airport_code]
+
+    def get(self, statistic: str, airport1: str, airport2: str) -> Optional[float]:
+        """
+        Return the given statistic (a name in STATISTICS) of the flight packages between the two given airports, or
+        None if there is no direct flight between them.
+
+        Raise a ValueError if an airport is not in the matrices.
+        """
+        value = float(self.statistics[statistic][self.airport_id(airport1), self.airport_id(airport2)])
+        return None if np.isnan(value) else value
+
+    def min_emission_route(self, home_airport: str, dest_airport: str) -> Optional[tuple[list[str], float]]:
+        """
+        Return the airports of the itinerary with the lowest total emissions from home_airport to dest_airport, and
+        its emissions, or None if dest_airport cannot be reached.
+
+        Raise a ValueError if an airport is not in the matrices.
+        """
+        i, j = self.airport_id(home_airport), self.airport_id(dest_airport)
+        if np.isinf(self.min_emission_distances[i, j]):
+            return None
+
+        path = [i]
+        while path[-1] != j:
+            path.append(int(self.next_airports[path[-1], j]))
+        return [self.codes[k] for k in path], float(self.min_emission_distances[i, j])
+
+    def save(self, matrices_file: str = MATRICES_FILE, source: Optional[dict] = None) -> None:
+        """
+        Save the matrices to matrices_file, together with the given fingerprint of the dataset they were computed
+        from.
+
+        The file is written to a temporary file first and then renamed, so a dashboard never loads a partial file.
+        """
+        meta = {'format_version': MATRICES_FORMAT_VERSION, 'source': source}
+        arrays = dict(self.statistics, codes=np.array(self.codes, dtype=str), package_counts=self.package_counts,
+                      min_emission_distances=self.min_emission_distances, next_airports=self.next_airports,
+                      meta=np.array(json.dumps(meta)))
+
+        file_descriptor, temporary_path = tempfile.mkstemp(prefix='.', suffix='.npz',
+                                                           dir=os.path.dirname(matrices_file) or '.')
+        with os.fdopen(file_descriptor, 'wb') as temporary_file:
+            np.savez(temporary_file, **arrays)
+        os.replace(temporary_path, matrices_file)
+
+    @classmethod
+    def load(cls, matrices_file: str = MATRICES_FILE) -> tuple[dict, RouteMatrices]:
+        """
+        Return the metadata and the matrices saved in matrices_file.
+
+        Raise FileNotFoundError if there is no such file.
+        """
+        with np.load(matrices_file) as arrays:
+            meta = json.loads(str(arrays['meta']))
+            statistics = {name: arrays[name] for name, _, _ in STATISTICS}
+            matrices = cls(arrays['codes'].tolist(), statistics, arrays['package_counts'],
+                           arrays['min_emission_distances'], arrays['next_airports'])
+        return meta, matrices
+
+
+def min_plus_closure(weights: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the lowest total weight of a path between every pair of vertices of the graph with the given symmetric
+    matrix of edge weights (NaN where there is no edge), and the first vertex after the start of each lowest path
+    (-1 where there is none).
+
+    The paths are computed with the Floyd-Warshall algorithm, relaxing every pair through one intermediate vertex
+    at a time with NumPy.
+
+    Preconditions:
+        - not (weights < 0).any()
+    """
+    n = len(weights)
+    distances = np.where(np.isnan(weights), np.inf, weights)
+    np.fill_diagonal(distances, 0.0)
+    next_vertices = np.where(np.isinf(distances), -1, np.arange(n)[np.newaxis, :])
+
+    for k in range(n):
+        through_k = distances[:, k, np.newaxis] + distances[np.newaxis, k, :]
+        shorter = through_k < distances
+        distances = np.where(shorter, through_k, distances)
+        next_vertices = np.where(shorter, next_vertices[:, k, np.newaxis], next_vertices)
+
+    return distances, next_vertices
+
+
+def precompute_route_matrices(zip_path: str = flight_cache.FLIGHT_ZIP_FILE, cache_dir: str = flight_cache.CACHE_DIR,
+                              matrices_file: str = MATRICES_FILE) -> RouteMatrices:
+    """
+    Compute the matrices of the graph of the flight dataset in zip_path (loaded through its columnar cache in
+    cache_dir), save them to matrices_file and return them.
+    """
+    graph = data_classes.Graph()
+    helper_functions.add_columns_to_graph(graph, flight_cache.load_flight_cache(zip_path, cache_dir),
+                                          helper_functions.get_airport_coordinates())
+    matrices = RouteMatrices.from_graph(graph)
+    matrices.save(matrices_file, flight_cache.file_fingerprint(zip_path))
+    return matrices
+
+
+def load_route_matrices(zip_path: str = flight_cache.FLIGHT_ZIP_FILE, cache_dir: str = flight_cache.CACHE_DIR,
+                        matrices_file: str = MATRICES_FILE) -> RouteMatrices:
+    """
+    Return the matrices of the flight dataset in zip_path, from matrices_file.
+
+    If there is no such file yet, or the zip file has changed since the matrices were computed, they are
+    (re)computed first. The zip file is only hashed if its modification time or size changed, and if its contents
+    are in fact unchanged, the stored modification time is refreshed instead of recomputing the matrices.
+    """
+    try:
+        meta, matrices = RouteMatrices.load(matrices_file)
+    except (FileNotFoundError, ValueError, KeyError):
+        return precompute_route_matrices(zip_path, cache_dir, matrices_file)
+
+    source = meta.get('source') or {}
+    if meta.get('format_version') != MATRICES_FORMAT_VERSION:
+        return precompute_route_matrices(zip_path, cache_dir, matrices_file)
+
+    stat = os.stat(zip_path)
+    if (stat.st_mtime_ns, stat.st_size) == (source.get('mtime_ns'), source.get('size')):
+        return matrices
+
+    fingerprint = flight_cache.file_fingerprint(zip_path)
+    if fingerprint['sha256'] != source.get('sha256'):
+        return precompute_route_matrices(zip_path, cache_dir, matrices_file)
+
+    # The zip file was touched but its contents are unchanged, so the stored fingerprint is refreshed (like
+    # flight_cache.is_cache_current does) instead of hashing the zip file again on every load
+    matrices.save(matrices_file, fingerprint)
+    return matrices
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['typing', 'json', 'os', 'tempfile', 'numpy', 'data_classes', 'flight_cache',
+                          'helper_functions'],
+        'allowed-io': ['RouteMatrices.save', 'RouteMatrices.load'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })
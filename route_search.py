@@ -0,0 +1,466 @@
+"""Verde Voyage: Multi-leg route search
+
+Module Description
+==================
+This module contains the RouteSearch class, a weighted shortest-path engine over a data_classes.Graph. When there is
+no direct flight between two airports, it chains flight packages across intermediate airports, ranking itineraries
+with the same price, stops and emissions weighting as helper_functions.calculate_flight_scores.
+
+The search is an A* search whose heuristic is a great-circle lower bound computed from the coordinates of the
+vertices, with an optional limit on the number of legs. Yen's algorithm is used to return the k best itineraries.
+
+This module also contains the ParetoSearch class, a multi-criteria label-setting search that finds every itinerary
+that is not dominated on price, stops and emissions. The front is computed once per route and then answers any
+weights query by scoring only the itineraries on it.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from typing import Optional
+import heapq
+import math
+import numpy as np
+import airport_index
+import data_classes
+import flight_scoring
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class RouteSearch:
+    """
+    A shortest-path engine over a Graph, for one set of (price, stops, emissions) weights.
+
+    Every flight package is scored like in calculate_flight_scores, except that its price, stops and emissions are
+    normalized by their maxima over the whole graph rather than over a single edge, so the scores of the legs of an
+    itinerary can be added up. Each connection between two legs counts as one extra stop. Only the best package of
+    each edge is used by the search.
+
+    Building a RouteSearch scores every flight package of the graph once. Reuse the same object for every query
+    with the same weights: when the version of the graph changes, the next query scores the graph again.
+
+    Instance Attributes:
+        - graph: The graph being searched.
+        - weights: The (price, stops, emissions) weights used to score flight packages.
+
+    Private Instance Attributes:
+        - _airports: The airport index whose coordinates the heuristic uses, if any.
+        - _version: The version of the graph when its flight packages were last scored.
+        - _codes: The airport code of every vertex, indexed by vertex id.
+        - _ids: A mapping from an airport code to its vertex id.
+        - _adjacency: For every vertex id, a mapping from each neighbour id to the (leg cost, best flight package) of
+            the edge between them. The leg cost includes the cost of one connection.
+        - _connection_cost: The cost of one connection, which is removed once from the cost of every itinerary.
+        - _points: The unit vectors of the coordinates of every vertex, indexed by vertex id.
+        - _cost_per_km: A lower bound on the cost of flying one kilometre on any edge of the graph.
+        - _heuristics: A cache of the A* heuristic of every vertex, for each target vertex id.
+    """
+    graph: data_classes.Graph
+    weights: tuple[float, float, float]
+    _airports: Optional[airport_index.AirportIndex]
+    _version: int
+    _codes: list[str]
+    _ids: dict[str, int]
+    _adjacency: list[dict[int, tuple[float, tuple[str, tuple[str, ...]]]]]
+    _connection_cost: float
+    _points: np.ndarray
+    _cost_per_km: float
+    _heuristics: dict[int, list[float]]
+
+    def __init__(self, graph: data_classes.Graph, weights: tuple[float, float, float] = (0.1, 0.1, 0.8),
+                 airports: Optional[airport_index.AirportIndex] = None) -> None:
+        """
+        Initialize a search over the given graph, scoring flight packages with the given weights.
+
+        The heuristic uses the coordinates of the airports in the given airport index, if one is given, and the
+        coordinates of the vertices of the graph for the airports it does not index.
+        """
+        self.graph = graph
+        self.weights = weights
+        self._airports = airports
+        self._build()
+
+    def _build(self) -> None:
+        """
+        Score every flight package of the graph and build the adjacency and heuristic data of the search from them.
+        """
+        graph, weights, airports = self.graph, self.weights, self._airports
+        self._version = graph.version
+        self._codes = sorted(graph.all_airport_codes())
+        self._ids = {code: i for i, code in enumerate(self._codes)}
+        self._adjacency = [{} for _ in self._codes]
+        self._heuristics = {}
+
+        coordinates = np.radians([airports.coordinates(code) if airports is not None and code in airports
+                                  else graph.get_vertex(code).coordinates for code in self._codes]).reshape(-1, 2)
+        self._points = _unit_vectors(coordinates[:, 0], coordinates[:, 1])
+
+        edges = [(i, self._ids[neighbour.airport_code]) for i, code in enumerate(self._codes)
+                 for neighbour in graph.get_vertex(code).neighbours]
+        edges = [(i, j) for i, j in edges if i < j]  # every edge is stored in both directions
+        edge_values = [graph.get_flight_arrays(self._codes[i], self._codes[j]).values for i, j in edges]
+
+        maxima = np.max([values.max(axis=0) for values in edge_values], axis=0) if edges else np.zeros(3)
+        scales = np.where(maxima == 0, 1.0, maxima)
+        scales[1] = max(maxima[1], 1.0)  # so that a connection still costs one stop when every flight is direct
+        self._connection_cost = float(weights[1] / scales[1])
+
+        cost_per_km = math.inf
+        for (i, j), values in zip(edges, edge_values):
+            scores = flight_scoring.weighted_sum(values / scales, weights)
+            best = int(np.argmin(scores))
+            cost = float(scores[best]) + self._connection_cost
+            package = graph.get_flight_arrays(self._codes[i], self._codes[j]).packages[best]
+            self._adjacency[i][j] = (cost, package)
+            self._adjacency[j][i] = (cost, package)
+
+            distance = _great_circle_km(self._points[i], self._points[j])
+            if distance > 0:
+                cost_per_km = min(cost_per_km, cost / distance)
+            else:
+                cost_per_km = 0.0
+
+        self._cost_per_km = 0.0 if math.isinf(cost_per_km) else cost_per_km
+
+    def shortest_route(self, home_airport: str, dest_airport: str, max_legs: Optional[int] = None,
+                       use_heuristic: bool = True) -> Optional[tuple]:
+        """
+        Return the best itinerary from home_airport to dest_airport with at most max_legs legs, or None if there is
+        no such itinerary.
+
+        If use_heuristic is False, the search is a plain Dijkstra search instead of an A* search.
+        The returned tuple has the format described in k_shortest_routes.
+
+        Raise a ValueError if home_airport or dest_airport do not appear in the graph.
+        """
+        self._refresh()
+        source, target = self._vertex_id(home_airport), self._vertex_id(dest_airport)
+        path = None if source == target else self._search(source, target, max_legs, set(), set(), use_heuristic)
+        return None if path is None else self._itinerary(path)
+
+    def k_shortest_routes(self, home_airport: str, dest_airport: str, k: int = 5,
+                          max_legs: Optional[int] = None) -> list[tuple]:
+        """
+        Return upto k best itineraries from home_airport to dest_airport with at most max_legs legs, from best to
+        worst, using Yen's algorithm. The itineraries visit different sequences of airports.
+
+        Each returned tuple has the following format:
+        ((airport codes), [((airline, (aircraft)), [price, stops, emissions]) for each leg], price, stops, emissions,
+        itinerary_score). The stops of an itinerary include one stop for each connection between its legs.
+
+        Raise a ValueError if home_airport or dest_airport do not appear in the graph.
+        """
+        self._refresh()
+        source, target = self._vertex_id(home_airport), self._vertex_id(dest_airport)
+        first = None if source == target else self._search(source, target, max_legs, set(), set(), True)
+        if first is None:
+            return []
+
+        best_paths = [first]
+        candidates = []
+        seen = {tuple(first[1])}
+        while len(best_paths) < k:
+            _, last = best_paths[-1]
+            for i in range(len(last) - 1):
+                root = last[:i + 1]
+                banned_edges = {(path[i], path[i + 1]) for _, path in best_paths if path[:i + 1] == root}
+                spur_legs = None if max_legs is None else max_legs - i
+                spur = self._search(last[i], target, spur_legs, set(root[:-1]), banned_edges, True)
+                if spur is None:
+                    continue
+
+                path = root[:-1] + spur[1]
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (self._path_cost(path), path))
+
+            if not candidates:
+                break
+            best_paths.append(heapq.heappop(candidates))
+
+        return [self._itinerary(path) for path in best_paths]
+
+    def _refresh(self) -> None:
+        """Score the flight packages of the graph again if they changed since they were last scored."""
+        if self.graph.version != self._version:
+            self._build()
+
+    def _vertex_id(self, airport: str) -> int:
+        """Return the vertex id of the given airport code. Raise a ValueError if it is not in the graph."""
+        if airport not in self._ids:
+            raise ValueError
+        return self._ids[airport]
+
+    def _heuristic(self, target: int) -> list[float]:
+        """
+        Return a lower bound on the cost of reaching target from every vertex.
+
+        The bound is the great-circle distance to target multiplied by the lowest cost per kilometre of any edge.
+        Since no itinerary is shorter than the great-circle distance, the bound is admissible and consistent.
+        """
+        if target not in self._heuristics:
+            cosines = np.clip(self._points @ self._points[target], -1.0, 1.0)
+            distances = np.arccos(cosines) * EARTH_RADIUS_KM
+            self._heuristics[target] = (distances * self._cost_per_km).tolist()
+        return self._heuristics[target]
+
+    def _search(self, source: int, target: int, max_legs: Optional[int], banned_nodes: set[int],
+                banned_edges: set[tuple[int, int]], use_heuristic: bool) -> Optional[tuple[float, list[int]]]:
+        """
+        Return the cost and vertex ids of the cheapest path from source to target with at most max_legs legs that
+        avoids banned_nodes and banned_edges, or None if there is no such path.
+
+        A search state is a (vertex, number of legs) pair. A state is skipped once the same vertex has been settled
+        with no more legs, since that earlier state was at least as cheap.
+        """
+        heuristic = self._heuristic(target) if use_heuristic else None
+        settled_legs = {}
+        costs = {(source, 0): 0.0}
+        parents = {(source, 0): None}
+        heap = [(heuristic[source] if heuristic else 0.0, 0.0, 0, source)]
+
+        while heap:
+            _, cost, legs, vertex = heapq.heappop(heap)
+            if not _is_new_state(settled_legs, vertex, legs, max_legs):
+                continue
+            settled_legs[vertex] = legs
+
+            if vertex == target:
+                return cost - (self._connection_cost if legs else 0.0), _reconstruct(parents, (vertex, legs))
+            if max_legs is not None and legs >= max_legs:
+                continue
+
+            for neighbour, (leg_cost, _) in self._adjacency[vertex].items():
+                state = (neighbour, legs + 1)
+                if neighbour in banned_nodes or (vertex, neighbour) in banned_edges \
+                        or not _is_new_state(settled_legs, neighbour, legs + 1, max_legs):
+                    continue
+
+                new_cost = cost + leg_cost
+                if new_cost < costs.get(state, math.inf):
+                    costs[state] = new_cost
+                    parents[state] = (vertex, legs)
+                    estimate = new_cost + (heuristic[neighbour] if heuristic else 0.0)
+                    heapq.heappush(heap, (estimate, new_cost, legs + 1, neighbour))
+
+        return None
+
+    def _path_cost(self, path: list[int]) -> float:
+        """Return the cost of the itinerary visiting the given vertex ids."""
+        return sum(self._adjacency[i][j][0] for i, j in zip(path, path[1:])) - self._connection_cost
+
+    def _itinerary(self, path: tuple[float, list[int]]) -> tuple:
+        """Return the itinerary of the given (cost, vertex ids) path in the format described in k_shortest_routes."""
+        cost, path = path
+        legs = []
+        for i, j in zip(path, path[1:]):
+            package = self._adjacency[i][j][1]
+            home_vertex = self.graph.get_vertex(self._codes[i])
+            legs.append((package, home_vertex.neighbours[self.graph.get_vertex(self._codes[j])][package]))
+
+        price = sum(flight_info[0] for _, flight_info in legs)
+        stops = sum(flight_info[1] for _, flight_info in legs) + len(legs) - 1
+        emissions = sum(flight_info[2] for _, flight_info in legs)
+        return tuple(self._codes[i] for i in path), legs, price, stops, emissions, round(cost, 5)
+
+
+class ParetoSearch:
+    """
+    A multi-criteria search for the Pareto-optimal itineraries between two airports of a Graph.
+
+    An itinerary is Pareto-optimal if no other itinerary has a lower or equal price, number of stops and emissions,
+    with at least one of them strictly lower. The front of each route is computed the first time the route is
+    queried, and every later weights query only scores the itineraries on that front, until the version of the graph
+    changes and the front is computed again.
+
+    Instance Attributes:
+        - graph: The graph being searched.
+
+    Private Instance Attributes:
+        - _fronts: A cache mapping (home airport code, destination airport code, max legs) to the version of the graph
+            the front of that route was computed for, the Pareto-optimal itineraries of the route, and their
+            normalized [price, stops, emissions] values.
+    """
+    graph: data_classes.Graph
+    _fronts: dict[tuple[str, str, int], tuple[int, list[tuple], np.ndarray]]
+
+    def __init__(self, graph: data_classes.Graph) -> None:
+        """Initialize a Pareto search over the given graph."""
+        self.graph = graph
+        self._fronts = {}
+
+    def front(self, home_airport: str, dest_airport: str, max_legs: int = 3) -> list[tuple]:
+        """
+        Return every Pareto-optimal itinerary from home_airport to dest_airport with at most max_legs legs, ordered by
+        price, then stops, then emissions.
+
+        Each returned tuple has the following format:
+        ((airport codes), [((airline, (aircraft)), [price, stops, emissions]) for each leg], price, stops, emissions).
+        The stops of an itinerary include one stop for each connection between its legs.
+
+        Raise a ValueError if home_airport or dest_airport do not appear in the graph.
+        """
+        return self._front(home_airport, dest_airport, max_legs)[0]
+
+    def best_routes(self, home_airport: str, dest_airport: str, weights: tuple[float, float, float] = (0.1, 0.1, 0.8),
+                    k: int = 5, max_legs: int = 3) -> list[tuple]:
+        """
+        Return upto k best Pareto-optimal itineraries from home_airport to dest_airport for the given weights.
+
+        The itineraries are scored like in calculate_flight_scores, normalizing by the maxima over the front. The
+        returned tuples have the format described in front, followed by the itinerary's score.
+        """
+        itineraries, normalized = self._front(home_airport, dest_airport, max_legs)
+        scores = flight_scoring.weighted_sum(normalized, weights)
+        return [itineraries[i] + (round(float(scores[i]), 5),) for i in flight_scoring.top_k(scores, k)]
+
+    def _front(self, home_airport: str, dest_airport: str, max_legs: int) -> tuple[list[tuple], np.ndarray]:
+        """
+        Return the cached front of the given route and its normalized values, computing them if they are not cached
+        for the current version of the graph.
+        """
+        key = (home_airport, dest_airport, max_legs)
+        version = self.graph.version
+        if key not in self._fronts or self._fronts[key][0] != version:
+            itineraries = self._label_search(home_airport, dest_airport, max_legs)
+            values = np.array([itinerary[2:5] for itinerary in itineraries], dtype=np.float64).reshape(-1, 3)
+            self._fronts[key] = (version, itineraries, flight_scoring.normalize(values))
+        return self._fronts[key][1:]
+
+    def _label_search(self, home_airport: str, dest_airport: str, max_legs: int) -> list[tuple]:
+        """
+        Return the Pareto-optimal itineraries of the given route, using a multi-criteria label-setting search.
+
+        A label is a partial itinerary ending at some vertex, with its total price, stops, emissions and legs. Labels
+        are settled in lexicographic order, so a settled label can never be dominated by a label settled after it.
+        A label is discarded if it is dominated by a label already settled at its vertex (comparing the number of
+        legs too, since fewer legs leave more room for the rest of the itinerary) or by an itinerary already found.
+        Only the Pareto-optimal packages of each edge are used to extend a label.
+        """
+        source = self.graph.get_vertex(home_airport)
+        target = self.graph.get_vertex(dest_airport)
+        if source is target:
+            return []
+
+        labels = [(source, None, None)]  # (vertex, parent label, (flight package, flight info) of the last leg)
+        settled = {}
+        found = []
+        heap = [(0.0, 0.0, 0.0, 0, 0)]
+        while heap:
+            price, stops, emissions, legs, label = heapq.heappop(heap)
+            vertex = labels[label][0]
+            if _is_dominated((price, stops, emissions), [values[:3] for values, _ in found]):
+                continue
+            if vertex is target:
+                found.append(((price, stops, emissions), label))
+                continue
+            if _is_dominated((price, stops, emissions, legs), settled.get(vertex, [])):
+                continue
+
+            settled.setdefault(vertex, []).append((price, stops, emissions, legs))
+            if legs == max_legs:
+                continue
+
+            connection = 1 if legs > 0 else 0
+            for neighbour, flights in vertex.neighbours.items():
+                arrays = self.graph.get_flight_arrays(vertex.airport_code, neighbour.airport_code)
+                for position in arrays.pareto_front().tolist():
+                    leg_price, leg_stops, leg_emissions = arrays.values[position].tolist()
+                    labels.append((neighbour, label, (arrays.packages[position], flights[arrays.packages[position]])))
+                    heapq.heappush(heap, (price + leg_price, stops + leg_stops + connection, emissions + leg_emissions,
+                                          legs + 1, len(labels) - 1))
+
+        return [_label_itinerary(labels, label) for _, label in found]
+
+
+def _is_dominated(values: tuple, others: list[tuple]) -> bool:
+    """
+    Return whether values is weakly dominated by one of others, i.e. whether some tuple in others is no greater than
+    values in every position.
+    """
+    return any(all(other_value <= value for other_value, value in zip(other, values)) for other in others)
+
+
+def _label_itinerary(labels: list[tuple], label: int) -> tuple:
+    """Return the itinerary ending at the given label, in the format described in ParetoSearch.front."""
+    codes, legs = [], []
+    while label is not None:
+        vertex, parent, leg = labels[label]
+        codes.append(vertex.airport_code)
+        if leg is not None:
+            legs.append(leg)
+        label = parent
+
+    codes.reverse()
+    legs.reverse()
+    price = sum(flight_info[0] for _, flight_info in legs)
+    stops = sum(flight_info[1] for _, flight_info in legs) + len(legs) - 1
+    emissions = sum(flight_info[2] for _, flight_info in legs)
+    return tuple(codes), legs, price, stops, emissions
+
+
+def _is_new_state(settled_legs: dict[int, int], vertex: int, legs: int, max_legs: Optional[int]) -> bool:
+    """
+    Return whether the state (vertex, legs) can still improve on the states already settled.
+
+    Without a leg limit, a vertex is only settled once. With a leg limit, reaching a vertex with fewer legs than
+    before may still be useful, since it leaves more legs for the rest of the itinerary.
+    """
+    if vertex not in settled_legs:
+        return True
+    return max_legs is not None and legs < settled_legs[vertex]
+
+
+def _reconstruct(parents: dict[tuple[int, int], Optional[tuple[int, int]]], state: tuple[int, int]) -> list[int]:
+    """Return the vertex ids of the path ending at the given search state."""
+    path = []
+    while state is not None:
+        path.append(state[0])
+        state = parents[state]
+    path.reverse()
+    return path
+
+
+def _unit_vectors(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Return the unit vectors of the given latitudes and longitudes (in radians)."""
+    cos_lat = np.cos(latitudes)
+    return np.stack([cos_lat * np.cos(longitudes), cos_lat * np.sin(longitudes), np.sin(latitudes)], axis=-1)
+
+
+def _great_circle_km(point1: np.ndarray, point2: np.ndarray) -> float:
+    """Return the great-circle distance in kilometres between the two given unit vectors."""
+    return float(np.arccos(np.clip(point1 @ point2, -1.0, 1.0))) * EARTH_RADIUS_KM
+
+
+def find_routes(graph: data_classes.Graph, home_airport: str, dest_airport: str,
+                weights: tuple[float, float, float] = (0.1, 0.1, 0.8), k: int = 5,
+                max_legs: Optional[int] = None) -> list[tuple]:
+    """
+    Return upto k best itineraries from home_airport to dest_airport in the given graph, possibly with connections.
+
+    The input weights has the following format: (price, stops, emissions).
+    The returned tuples have the format described in RouteSearch.k_shortest_routes.
+    """
+    return RouteSearch(graph, weights).k_shortest_routes(home_airport, dest_airport, k, max_legs)
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0201', 'W0221'],
+        'extra-imports': ['heapq', 'math', 'numpy', 'airport_index', 'data_classes', 'flight_scoring'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })
@@ -0,0 +1,341 @@
+"""Verde Voyage: Precomputed route summaries
+
+Module Description
+==================
+This module contains the RouteSummary class, a summary of the flight dataset that is built in the same pass as the
+graph (or straight from the columnar cache). For every origin airport, it stores the airports and countries that can
+be reached from it, with the number of flight packages and the minimum and maximum price and carbon emissions of
+each. It also keeps the airport codes and country names sorted, so user input can be validated and autocompleted
+without reading the dataset again.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from bisect import bisect_left
+from typing import Any, Optional
+import numpy as np
+import flight_index
+
+
+class RouteStats:
+    """
+    The number of flight packages between an origin and a destination, and the range of their prices and emissions.
+
+    A flight package is identified by its airline and aircraft, like the keys of the flights of a graph edge, so
+    the rows of the dataset that repeat a flight package on a route count once in package_count. The prices and
+    emissions range over every complete row of the route.
+
+    Instance Attributes:
+        - package_count: The number of distinct flight packages.
+        - min_price, max_price: The lowest and highest ticket price.
+        - min_emissions, max_emissions: The lowest and highest carbon emissions.
+
+    Representation Invariants:
+        - self.package_count > 0
+        - self.min_price <= self.max_price
+        - self.min_emissions <= self.max_emissions
+    """
+    __slots__ = ('package_count', 'min_price', 'max_price', 'min_emissions', 'max_emissions')
+    package_count: int
+    min_price: float
+    max_price: float
+    min_emissions: int
+    max_emissions: int
+
+    def __init__(self, package_count: int, min_price: float, max_price: float, min_emissions: int,
+                 max_emissions: int) -> None:
+        """Initialize the statistics with the given values."""
+        self.package_count = package_count
+        self.min_price, self.max_price = min_price, max_price
+        self.min_emissions, self.max_emissions = min_emissions, max_emissions
+
+    def add(self, price: float, emissions: int, new_package: bool = True) -> None:
+        """
+        Add a flight with the given price and emissions. It is counted as a new flight package if new_package is
+        True, and as another row of a flight package that was already counted otherwise.
+        """
+        if new_package:
+            self.package_count += 1
+        self.min_price, self.max_price = min(self.min_price, price), max(self.max_price, price)
+        self.min_emissions, self.max_emissions = min(self.min_emissions, emissions), max(self.max_emissions, emissions)
+
+    def merge(self, other: RouteStats) -> None:
+        """Add every flight package counted in other, which must not have been counted in these statistics."""
+        self.package_count += other.package_count
+        self.min_price, self.max_price = min(self.min_price, other.min_price), max(self.max_price, other.max_price)
+        self.min_emissions = min(self.min_emissions, other.min_emissions)
+        self.max_emissions = max(self.max_emissions, other.max_emissions)
+
+    def __repr__(self) -> str:
+        """Return a string representation of these statistics."""
+        return (f'RouteStats(package_count={self.package_count}, price=[{self.min_price}, {self.max_price}], '
+                f'emissions=[{self.min_emissions}, {self.max_emissions}])')
+
+
+class OriginSummary:
+    """
+    The destinations that can be reached from one origin airport.
+
+    A flight package to a destination airport belongs to the destination country of the first row it appears in,
+    so a dataset that names two countries for the same airport does not count the package twice.
+
+    Instance Attributes:
+        - airport_code: The code of the origin airport.
+        - destinations: A mapping from each destination airport code to the statistics of its flight packages.
+        - countries: A mapping from each destination country (in lowercase) to the statistics of its flight packages.
+        - totals: The statistics of every flight package departing from the origin.
+
+    Private Instance Attributes:
+        - _package_countries: A mapping from each (destination airport, airline, aircraft) flight package added
+            with add_flight to its destination country.
+    """
+    __slots__ = ('airport_code', 'destinations', 'countries', 'totals', '_package_countries')
+    airport_code: str
+    destinations: dict[str, RouteStats]
+    countries: dict[str, RouteStats]
+    totals: Optional[RouteStats]
+    _package_countries: dict[tuple[str, str, str], str]
+
+    def __init__(self, airport_code: str) -> None:
+        """Initialize the summary of an origin airport with no flight packages."""
+        self.airport_code = airport_code
+        self.destinations = {}
+        self.countries = {}
+        self.totals = None
+        self._package_countries = {}
+
+    def add_flight(self, dest_airport: str, dest_country: str, package: tuple[str, str], price: float,
+                   emissions: int) -> None:
+        """
+        Add a flight from the origin to the given destination airport and country, in the (airline, aircraft)
+        flight package, with the given price and emissions.
+        """
+        key = (dest_airport,) + package
+        new_package = key not in self._package_countries
+        if new_package:
+            self._package_countries[key] = dest_country
+        else:
+            dest_country = self._package_countries[key]
+
+        for table_key, table in ((dest_airport, self.destinations), (dest_country, self.countries)):
+            if table_key in table:
+                table[table_key].add(price, emissions, new_package)
+            else:
+                table[table_key] = RouteStats(1, price, price, emissions, emissions)
+
+        if self.totals is None:
+            self.totals = RouteStats(1, price, price, emissions, emissions)
+        else:
+            self.totals.add(price, emissions, new_package)
+
+
+class RouteSummary:
+    """
+    A summary of the airports, countries and routes of the flight dataset.
+
+    Instance Attributes:
+        - home_airports, home_countries, dest_airports, dest_countries: The origin airports, origin countries,
+            destination airports and destination countries of every row of the dataset (including incomplete rows),
+            like the sets returned by helper_functions.countries_and_airports. Country names are in lowercase.
+
+    Private Instance Attributes:
+        - _origins: A mapping from each origin airport code to its summary, built from the complete rows only.
+        - _sorted_airports: Every airport code in home_airports or dest_airports, sorted, or None if it has to be
+            recomputed.
+        - _sorted_countries: Every country name in home_countries or dest_countries, sorted, or None if it has to be
+            recomputed.
+    """
+    home_airports: set[str]
+    home_countries: set[str]
+    dest_airports: set[str]
+    dest_countries: set[str]
+    _origins: dict[str, OriginSummary]
+    _sorted_airports: Optional[list[str]]
+    _sorted_countries: Optional[list[str]]
+
+    def __init__(self) -> None:
+        """Initialize an empty summary."""
+        self.home_airports, self.home_countries, self.dest_airports, self.dest_countries = set(), set(), set(), set()
+        self._origins = {}
+        self._sorted_airports = None
+        self._sorted_countries = None
+
+    @classmethod
+    def from_columns(cls, columns: Any) -> RouteSummary:
+        """
+        Return the summary of the given flight_cache.FlightColumns.
+
+        The airport and country sets are taken from columns.summary, and the statistics of every route are computed
+        with NumPy on the id columns.
+        """
+        summary = cls()
+        summary.home_airports, summary.home_countries, summary.dest_airports, summary.dest_countries = \
+            (set(names) for names in columns.summary)
+
+        if len(columns) == 0:
+            return summary
+
+        airports = columns.strings['airports']
+        lower_ids = {}
+        country_ids = np.array([lower_ids.setdefault(name.lower(), len(lower_ids))
+                                for name in columns.strings['countries']], dtype=np.int64)
+        lower_countries = list(lower_ids)
+        origin = np.asarray(columns.columns['origin'], dtype=np.int64)
+        dest = np.asarray(columns.columns['dest'], dtype=np.int64)
+        airline = np.asarray(columns.columns['airline'], dtype=np.int64)
+        aircraft = np.asarray(columns.columns['aircraft'], dtype=np.int64)
+        price = np.asarray(columns.columns['price'])
+        emissions = np.asarray(columns.columns['emissions'])
+
+        # The rows are grouped into flight packages first. The sort is stable, so the first row of each group is
+        # the first row of its package in the dataset, which gives the package its destination country.
+        order = np.lexsort((aircraft, airline, dest, origin))
+        starts = _group_starts(origin[order], dest[order], airline[order], aircraft[order])
+        first_rows = order[starts]
+        package_origin, package_dest = origin[first_rows], dest[first_rows]
+        package_country = country_ids[np.asarray(columns.columns['dest_country'], dtype=np.int64)[first_rows]]
+        package_stats = _reduce_stats(starts, price[order], price[order], emissions[order], emissions[order])
+
+        # The packages are already sorted by origin and destination airport, but not by destination country.
+        route_starts = _group_starts(package_origin, package_dest)
+        for origin_id, dest_id, stats in zip(package_origin[route_starts].tolist(), package_dest[route_starts].tolist(),
+                                             _route_stats(route_starts, package_stats)):
+            summary._origin(airports[origin_id]).destinations[airports[dest_id]] = stats
+
+        country_order = np.lexsort((package_country, package_origin))
+        country_starts = _group_starts(package_origin[country_order], package_country[country_order])
+        sorted_stats = tuple(values[country_order] for values in package_stats)
+        for position, stats in zip(country_order[country_starts].tolist(),
+                                   _route_stats(country_starts, sorted_stats)):
+            origin_summary = summary._origin(airports[package_origin[position]])
+            origin_summary.countries[lower_countries[package_country[position]]] = stats
+
+        for origin_summary in summary._origins.values():
+            for stats in origin_summary.destinations.values():
+                if origin_summary.totals is None:
+                    origin_summary.totals = _copy_stats(stats)
+                else:
+                    origin_summary.totals.merge(stats)
+
+        return summary
+
+    def add_row(self, row: list[str]) -> None:
+        """
+        Add the given row of the flight dataset to this summary.
+
+        Every row adds its airports and countries to the sets of this summary, but only complete rows are counted
+        in the statistics of their route.
+        """
+        self.home_airports.add(row[0])
+        self.home_countries.add(row[1].lower())
+        self.dest_airports.add(row[2])
+        self.dest_countries.add(row[3].lower())
+        self._sorted_airports = self._sorted_countries = None
+
+        if flight_index.is_complete_row(row):
+            package = (row[6].split('| ')[0].strip('[]'), row[4])
+            self._origin(row[0]).add_flight(row[2], row[3].lower(), package, float(row[12]), int(row[14]))
+
+    def as_tuple(self) -> tuple[set[str], set[str], set[str], set[str]]:
+        """
+        Return the airport and country sets of this summary, in the format returned by
+        helper_functions.countries_and_airports.
+        """
+        return self.home_airports, self.home_countries, self.dest_airports, self.dest_countries
+
+    def get_origin(self, airport_code: str) -> Optional[OriginSummary]:
+        """
+        Return the summary of the flights departing from the given airport, or None if there are none.
+        """
+        return self._origins.get(airport_code)
+
+    def get_route(self, home_airport: str, dest_airport: str) -> Optional[RouteStats]:
+        """
+        Return the statistics of the flight packages from home_airport to dest_airport, or None if there are none.
+        """
+        origin = self._origins.get(home_airport)
+        return None if origin is None else origin.destinations.get(dest_airport)
+
+    def search_airports(self, prefix: str, limit: int = 10) -> list[str]:
+        """
+        Return up to limit airport codes that start with the given prefix (ignoring case), in alphabetical order.
+        """
+        if self._sorted_airports is None:
+            self._sorted_airports = sorted(self.home_airports | self.dest_airports)
+        return _search_sorted(self._sorted_airports, prefix.strip().upper(), limit)
+
+    def search_countries(self, prefix: str, limit: int = 10) -> list[str]:
+        """
+        Return up to limit country names (in lowercase) that start with the given prefix (ignoring case), in
+        alphabetical order.
+        """
+        if self._sorted_countries is None:
+            self._sorted_countries = sorted(self.home_countries | self.dest_countries)
+        return _search_sorted(self._sorted_countries, prefix.strip().lower(), limit)
+
+    def _origin(self, airport_code: str) -> OriginSummary:
+        """Return the summary of the given origin airport, creating it if needed."""
+        if airport_code not in self._origins:
+            self._origins[airport_code] = OriginSummary(airport_code)
+        return self._origins[airport_code]
+
+
+def _copy_stats(stats: RouteStats) -> RouteStats:
+    """Return a copy of the given statistics."""
+    return RouteStats(stats.package_count, stats.min_price, stats.max_price, stats.min_emissions, stats.max_emissions)
+
+
+def _group_starts(*columns: np.ndarray) -> np.ndarray:
+    """Return the index of the first element of each group of equal elements in the given sorted columns."""
+    changes = np.zeros(len(columns[0]) - 1, dtype=bool)
+    for column in columns:
+        changes |= column[1:] != column[:-1]
+    return np.concatenate(([0], np.flatnonzero(changes) + 1))
+
+
+def _reduce_stats(starts: np.ndarray, min_prices: np.ndarray, max_prices: np.ndarray, min_emissions: np.ndarray,
+                  max_emissions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Return the minimum and maximum prices and emissions of each group of elements starting at starts."""
+    return (np.minimum.reduceat(min_prices, starts), np.maximum.reduceat(max_prices, starts),
+            np.minimum.reduceat(min_emissions, starts), np.maximum.reduceat(max_emissions, starts))
+
+
+def _route_stats(starts: np.ndarray, package_stats: tuple[np.ndarray, ...]) -> list[RouteStats]:
+    """Return the statistics of each group of flight packages starting at starts."""
+    counts = np.diff(np.concatenate((starts, [len(package_stats[0])]))).tolist()
+    min_prices, max_prices, min_emissions, max_emissions = (values.tolist() for values in
+                                                            _reduce_stats(starts, *package_stats))
+    return [RouteStats(*values) for values in zip(counts, min_prices, max_prices, min_emissions, max_emissions)]
+
+
+def _search_sorted(names: list[str], prefix: str, limit: int) -> list[str]:
+    """Return up to limit of the given sorted names that start with prefix."""
+    start = bisect_left(names, prefix)
+    results = []
+    for name in names[start:start + limit]:
+        if not name.startswith(prefix):
+            break
+        results.append(name)
+    return results
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['bisect', 'numpy', 'flight_index'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })
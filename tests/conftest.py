@@ -0,0 +1,112 @@
+"""Verde Voyage: Shared test fixtures
+
+Module Description
+==================
+This module contains the fixtures shared by the tests of our project: the airport coordinates, a small hand-written
+flight dataset whose routes repeat flight packages and contain incomplete rows, and a larger synthetic dataset
+generated by benchmark_suite. Every test runs from the root of the project, so the default paths under 'CSV Files'
+resolve like they do for main.py.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import csv
+import os
+import sys
+import zipfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import benchmark_suite  # noqa: E402
+import helper_functions  # noqa: E402
+
+# The airports of the synthetic dataset. A small network, so its routes repeat flight packages.
+SYNTHETIC_AIRPORTS = 12
+SYNTHETIC_ROWS = 3000
+
+
+def flight_row(home: str, home_country: str, dest: str, dest_country: str, airline: str, aircraft: str,
+               price: str, stops: str, emissions: str) -> list[str]:
+    """Return a row of the flight dataset with the given values, and the other columns left empty."""
+    return [home, home_country, dest, dest_country, aircraft, 'X', f'[{airline}| {airline}]', 'F1', '', '', '',
+            stops, price, 'USD', emissions, '', '', '']
+
+
+# A small dataset with a repeated flight package (YYZ-LHR on Air Canada), an incomplete row, and a route flown in
+# both directions (YYZ-JFK and JFK-YYZ).
+SMALL_ROWS = [
+    flight_row('YYZ', 'Canada', 'LHR', 'United Kingdom', 'Air Canada', 'Boeing 787', '900.0', '0', '500000'),
+    flight_row('YYZ', 'Canada', 'LHR', 'United Kingdom', 'Air Canada', 'Boeing 787', '850.0', '0', '520000'),
+    flight_row('YYZ', 'Canada', 'LHR', 'United Kingdom', 'British Airways', 'Boeing 777', '1100.0', '0', '480000'),
+    flight_row('YYZ', 'Canada', 'LHR', 'United Kingdom', 'Lufthansa', 'Airbus A320|Airbus A350', '700.0', '1',
+               '610000'),
+    flight_row('YYZ', 'Canada', 'JFK', 'United States', 'Delta', 'Embraer 190', '300.0', '0', '90000'),
+    flight_row('YYZ', 'Canada', 'JFK', 'United States', 'United', 'Airbus A320', '', '0', '95000'),
+    flight_row('JFK', 'United States', 'YYZ', 'Canada', 'Air Canada', 'Airbus A321', '320.0', '0', '88000'),
+    flight_row('JFK', 'United States', 'LHR', 'United Kingdom', 'Delta', 'Airbus A350', '650.0', '0', '450000'),
+    flight_row('LHR', 'United Kingdom', 'CDG', 'France', 'Air France', 'Airbus A320', '150.0', '0', '60000'),
+]
+
+
+def write_flight_csv(path: str, rows: list[list[str]]) -> str:
+    """Write the given rows, with the header of the flight dataset, to the CSV file at path and return path."""
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(benchmark_suite.FLIGHT_HEADER)
+        writer.writerows(rows)
+    return path
+
+
+def write_flight_zip(path: str, rows: list[list[str]]) -> str:
+    """Write the given rows as a zipped flight dataset to path, like 'CSV Files/flight_data.csv.zip', and return path."""
+    csv_path = write_flight_csv(path + '.csv', rows)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.write(csv_path, 'flight_data.csv')
+    os.remove(csv_path)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def project_root(monkeypatch: pytest.MonkeyPatch) -> str:
+    """Run every test from the root of the project."""
+    monkeypatch.chdir(ROOT)
+    return ROOT
+
+
+@pytest.fixture(scope='session')
+def airport_coords() -> dict[str, tuple[float, float]]:
+    """Return the coordinates of the airports of the flight dataset."""
+    return helper_functions.get_airport_coordinates(os.path.join(ROOT, 'CSV Files', '78_airport_info.csv'))
+
+
+@pytest.fixture(scope='session')
+def small_zip(tmp_path_factory: pytest.TempPathFactory) -> str:
+    """Return the path of a zip file holding SMALL_ROWS."""
+    return write_flight_zip(str(tmp_path_factory.mktemp('small') / 'flight_data.csv.zip'), SMALL_ROWS)
+
+
+@pytest.fixture(scope='session')
+def synthetic_zip(tmp_path_factory: pytest.TempPathFactory, airport_coords: dict[str, tuple[float, float]]) -> str:
+    """Return the path of a zip file holding a synthetic dataset of SYNTHETIC_ROWS rows between a few airports."""
+    path = str(tmp_path_factory.mktemp('synthetic') / 'flight_data.csv.zip')
+    codes = sorted(airport_coords)[:SYNTHETIC_AIRPORTS]
+    benchmark_suite.generate_flight_dataset(path, SYNTHETIC_ROWS, {code: airport_coords[code] for code in codes})
+    return path
+
+
+@pytest.fixture(scope='session')
+def synthetic_csv(tmp_path_factory: pytest.TempPathFactory, synthetic_zip: str) -> str:
+    """Return the path of the CSV file inside synthetic_zip, extracted."""
+    directory = tmp_path_factory.mktemp('synthetic_csv')
+    with zipfile.ZipFile(synthetic_zip) as zip_ref:
+        zip_ref.extractall(directory)
+    return str(directory / 'flight_data.csv')
@@ -0,0 +1,81 @@
+"""Verde Voyage: Tests of airport_index
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import math
+import random
+import numpy as np
+import pytest
+import airport_index
+import helper_functions
+
+# Query points near the poles, on the antimeridian and in the middle of an ocean
+POINTS = [(43.68, -79.63), (51.47, -0.45), (-33.95, 151.18), (89.5, 10.0), (-85.0, -120.0), (0.0, 179.9),
+          (30.0, -40.0)]
+
+
+@pytest.fixture(scope='module')
+def world_coords() -> dict[str, tuple[float, float]]:
+    """Return the coordinates of every airport in the world."""
+    return helper_functions.get_airport_coordinates(airport_index.AIRPORTS_FILE)
+
+
+def distances(airport_coords: dict, latitude: float, longitude: float) -> dict[str, float]:
+    """Return the distance in kilometres from the given point to every airport of airport_coords, one at a time."""
+    return {code: float(airport_index.haversine_km(math.radians(latitude), math.radians(longitude),
+                                                   np.radians([coords[0]]), np.radians([coords[1]]))[0])
+            for code, coords in airport_coords.items()}
+
+
+def test_nearest_matches_brute_force(world_coords: dict) -> None:
+    """The k nearest airports are the k closest airports of a scan over every airport."""
+    index = airport_index.AirportIndex(world_coords)
+    for latitude, longitude in POINTS:
+        expected = sorted(distances(world_coords, latitude, longitude).values())[:7]
+        nearest = index.nearest(latitude, longitude, k=7)
+        assert [distance for _, distance in nearest] == pytest.approx(expected)
+
+
+def test_within_matches_brute_force(world_coords: dict) -> None:
+    """The airports within a radius are exactly the airports of a scan that are no further than the radius."""
+    index = airport_index.AirportIndex(world_coords)
+    for (latitude, longitude), radius_km in zip(POINTS, (50, 300, 1000, 2000, 3000, 500, 5000)):
+        expected = {code for code, distance in distances(world_coords, latitude, longitude).items()
+                    if distance <= radius_km}
+        within = index.within(latitude, longitude, radius_km)
+        assert {code for code, _ in within} == expected
+        assert [distance for _, distance in within] == sorted(distance for _, distance in within)
+
+
+def test_subset_and_exclusions(airport_coords: dict, world_coords: dict) -> None:
+    """An index of a subset of airports only returns those airports, and never the excluded ones."""
+    rng = random.Random(0)
+    served = rng.sample(sorted(airport_coords), 20)
+    index = airport_index.AirportIndex(world_coords, served + ['NOPE'])
+    assert len(index) == 20 and 'NOPE' not in index
+    for latitude, longitude in POINTS:
+        scanned = distances({code: world_coords[code] for code in served}, latitude, longitude)
+        expected = sorted(scanned, key=scanned.get)
+        assert [code for code, _ in index.nearest(latitude, longitude, k=3, exclude=expected[:1])] == expected[1:4]
+    assert index.nearest(0.0, 0.0, k=50) == index.nearest(0.0, 0.0, k=20)
+    assert index.nearest(0.0, 0.0, exclude=served) == []
+
+
+def test_coordinates_and_distances(airport_coords: dict) -> None:
+    """An indexed airport keeps its coordinates, and distances_km raises a ValueError for an airport it does not
+    index."""
+    index = airport_index.AirportIndex(airport_coords)
+    assert index.coordinates('YYZ') == pytest.approx(airport_coords['YYZ'])
+    assert index.distances_km(*airport_coords['YYZ'], ['YYZ', 'LHR']).tolist() \
+        == pytest.approx([0.0, distances({'LHR': airport_coords['LHR']}, *airport_coords['YYZ'])['LHR']])
+    with pytest.raises(ValueError):
+        index.distances_km(0.0, 0.0, ['NOPE'])
+    with pytest.raises(ValueError):
+        index.coordinates('NOPE')
@@ -0,0 +1,80 @@
+"""Verde Voyage: Tests of benchmark_suite and compare_benchmarks
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import json
+import benchmark_suite
+import compare_benchmarks
+import flight_index
+import flight_reader
+
+
+def test_generated_dataset_is_reproducible(airport_coords: dict, tmp_path) -> None:
+    """The same arguments generate the same bytes, and about 1% of the generated rows are incomplete."""
+    codes = sorted(airport_coords)[:10]
+    coords = {code: airport_coords[code] for code in codes}
+    first, second = str(tmp_path / 'first.zip'), str(tmp_path / 'second.zip')
+    benchmark_suite.generate_flight_dataset(first, 2000, coords, seed=3)
+    benchmark_suite.generate_flight_dataset(second, 2000, coords, seed=3)
+    with open(first, 'rb') as first_file, open(second, 'rb') as second_file:
+        assert first_file.read() == second_file.read()
+
+    rows = list(flight_reader.iter_flight_rows(first))
+    assert len(rows) == 2000 and {row[0] for row in rows} <= set(codes)
+    assert 5 <= sum(not flight_index.is_complete_row(row) for row in rows) <= 40
+
+
+def test_parse_sizes() -> None:
+    """Sizes may be written with k and M suffixes."""
+    assert benchmark_suite._parse_sizes('10k, 1M,2500,1.5k') == (10_000, 1_000_000, 2500, 1500)
+
+
+def test_main_writes_every_stage(tmp_path, monkeypatch) -> None:
+    """A run of the suite reports every stage of every dataset size in its JSON file."""
+    monkeypatch.setattr(benchmark_suite, 'TRAIT_SIZES', ((50, 4),))
+    output = str(tmp_path / 'results.json')
+    benchmark_suite.main(['--sizes', '300', '--data-dir', str(tmp_path / 'data'), '--no-memory', '--output', output])
+    with open(output) as json_file:
+        report = json.load(json_file)
+
+    assert set(report['results']) == {'ingest/flights_300', 'create_graph/flights_300',
+                                      'calculate_flight_scores/flights_300', 'render/flights_300',
+                                      'insert_sequence/traits_50x4', 'matchmaking/traits_50x4'}
+    assert report['results']['matchmaking/traits_50x4']['items'] == 50
+    assert all('peak_bytes' not in result for result in report['results'].values())
+    assert report['environment']['seed'] == 0
+
+
+def test_compare_results_and_regressions() -> None:
+    """Changes are sorted from the largest increase, and only increases above the threshold are regressions."""
+    baseline = {'a': {'seconds': 1.0, 'peak_bytes': 100}, 'b': {'seconds': 2.0}, 'c': {'seconds': 0.0},
+                'gone': {'seconds': 1.0}}
+    current = {'a': {'seconds': 1.05, 'peak_bytes': 50}, 'b': {'seconds': 3.0}, 'c': {'seconds': 0.0},
+               'new': {'seconds': 1.0}}
+    changes = compare_benchmarks.compare_results(baseline, current)
+    assert [(change.benchmark, change.metric) for change in changes] \
+        == [('b', 'seconds'), ('a', 'seconds'), ('c', 'seconds'), ('a', 'peak_bytes')]
+    assert changes[0].ratio == 1.5 and changes[2].ratio == 1.0
+    assert compare_benchmarks.find_regressions(changes) == changes[:1]
+    assert compare_benchmarks.find_regressions(changes, 0.6) == []
+    assert compare_benchmarks.find_regressions(changes, 0.01) == changes[:2]
+
+
+def test_main_exit_status(tmp_path, capsys) -> None:
+    """The comparison exits with 1 when a metric regressed beyond the threshold, and 0 otherwise."""
+    paths = []
+    for name, seconds in (('baseline', 1.0), ('current', 1.2)):
+        paths.append(str(tmp_path / f'{name}.json'))
+        benchmark_suite.write_results({'results': {'create_graph/flights_10000': {'seconds': seconds}}}, paths[-1])
+
+    assert compare_benchmarks.main(paths) == 1
+    assert 'REGRESSION' in capsys.readouterr().out
+    assert compare_benchmarks.main(paths + ['--threshold', '0.5']) == 0
+    assert '0 regression(s)' in capsys.readouterr().out
@@ -0,0 +1,125 @@
+"""Verde Voyage: Tests of compact_graph
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import asyncio
+import pytest
+import compact_graph
+import data_classes
+import flight_cache
+import flight_index
+import helper_functions
+import query_cache
+import route_summary
+import voyage_service
+
+
+@pytest.fixture
+def graphs(airport_coords: dict, synthetic_zip: str, tmp_path) -> tuple:
+    """Return the full graph of the synthetic dataset, built by create_graph and as a CompactGraph."""
+    columns = flight_cache.load_flight_cache(synthetic_zip, str(tmp_path / 'cache'))
+    graph = helper_functions.create_graph(airport_coords, index=flight_index.FlightIndex(columns))
+    return graph, compact_graph.CompactGraph.from_columns(columns, airport_coords)
+
+
+def test_from_columns_matches_create_graph(graphs: tuple) -> None:
+    """A CompactGraph built from the columns has the same vertices and flight packages as create_graph."""
+    graph, compact = graphs
+    assert set(compact.all_airport_codes()) == set(graph.all_airport_codes())
+    for vertex in graph.all_verticies():
+        compact_vertex = compact.get_vertex(vertex.airport_code)
+        assert compact_vertex.country_name == vertex.country_name
+        assert compact_vertex.coordinates == pytest.approx(vertex.coordinates)
+        assert set(compact_vertex.get_neighbors()) == set(vertex.get_neighbors())
+        for neighbour, flights in vertex.neighbours.items():
+            compact_neighbour = compact.get_vertex(neighbour.airport_code)
+            assert list(compact_vertex.neighbours[compact_neighbour].items()) == list(flights.items())
+            assert compact_vertex.max_emissions(neighbour.airport_code) == vertex.max_emissions(neighbour.airport_code)
+
+
+def test_from_graph_round_trip(graphs: tuple) -> None:
+    """A CompactGraph copied from a Graph has the same flight packages on every edge."""
+    graph, _ = graphs
+    compact = compact_graph.CompactGraph.from_graph(graph)
+    for vertex in graph.all_verticies():
+        for neighbour, flights in vertex.neighbours.items():
+            assert compact.get_flight_arrays(vertex.airport_code, neighbour.airport_code).flights == flights
+
+
+def test_optimal_routes_are_identical(graphs: tuple) -> None:
+    """optimal_routes ranks the packages of a CompactGraph exactly like those of a Graph."""
+    graph, compact = graphs
+    for vertex in list(graph.all_verticies())[:4]:
+        for neighbour in vertex.neighbours:
+            for weights in ((0.1, 0.1, 0.8), (0.5, 0.3, 0.2)):
+                assert helper_functions.optimal_routes(compact, vertex.airport_code, neighbour.airport_code, weights) \
+                    == helper_functions.optimal_routes(graph, vertex.airport_code, neighbour.airport_code, weights)
+
+
+def test_vertex_view_set_operators(graphs: tuple) -> None:
+    """Set operators on the vertex view of a CompactGraph return real sets of vertices."""
+    _, compact = graphs
+    vertices = compact.all_verticies()
+    first = next(iter(vertices))
+    assert len(vertices - set()) == len(vertices)
+    assert isinstance(vertices | set(), set)
+    assert vertices & {first} == {first}
+    assert first not in vertices - {first}
+
+
+def test_missing_airports_raise_value_error(graphs: tuple) -> None:
+    """Looking up an airport or an edge that is not in the graph raises a ValueError."""
+    _, compact = graphs
+    with pytest.raises(ValueError):
+        compact.get_vertex('NOPE')
+    code = compact.codes[0]
+    with pytest.raises(ValueError):
+        compact.get_flight_arrays(code, code)
+
+
+def test_edge_stats_and_neighbours_match_the_graph(graphs: tuple) -> None:
+    """A CompactGraph computes the same edge aggregates as a Graph, and finds the same neighbours."""
+    graph, compact = graphs
+    assert compact.version == 0
+    for vertex in list(graph.all_verticies())[:4]:
+        compact_vertex = compact.get_vertex(vertex.airport_code)
+        for code in compact.codes:
+            neighbour = compact_vertex.get_neighbour(code)
+            if vertex.get_neighbour(code) is None:
+                assert neighbour is None
+                continue
+            assert neighbour == compact.get_vertex(code)
+            stats, compact_stats = graph.get_edge_stats(vertex.airport_code, code), \
+                compact.get_edge_stats(vertex.airport_code, code)
+            assert [getattr(compact_stats, name) for name in data_classes.EdgeStats.__slots__[:-1]] \
+                == [getattr(stats, name) for name in data_classes.EdgeStats.__slots__[:-1]]
+    code = compact.codes[0]
+    assert compact.get_vertex(code).get_neighbour('NOPE') is None
+    with pytest.raises(ValueError):
+        compact.get_edge_stats(code, code)
+
+
+def test_services_accept_a_compact_graph(graphs: tuple) -> None:
+    """The ranking cache and the connections of VoyageService work on a CompactGraph like on a Graph."""
+    graph, compact = graphs
+    home_airport, dest_airport = compact.codes[:2]
+    cache = query_cache.QueryCache()
+    assert query_cache.cached_optimal_routes(compact, home_airport, dest_airport, (0.2, 0.3, 0.5), cache) \
+        == helper_functions.optimal_routes(graph, home_airport, dest_airport, (0.2, 0.3, 0.5))
+    assert query_cache.cached_optimal_routes(compact, home_airport, dest_airport, (0.2, 0.3, 0.5), cache) \
+        and cache.counters['hits'] == 1
+
+    matcher = data_classes.get_country_matcher(voyage_service.COUNTRY_TRAITS_FILE)
+    connections = []
+    for data in (compact, graph):
+        service = voyage_service.VoyageService(data, route_summary.RouteSummary(), matcher)
+        connections.append(sorted(asyncio.run(service.connections(home_airport)), key=lambda item: item['airport']))
+        service.close()
+    assert connections[0] == connections[1] and len(connections[0]) == len(compact.codes) - 1
@@ -0,0 +1,195 @@
+"""Verde Voyage: Tests of data_classes
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import random
+import sys
+import pytest
+import data_classes
+from data_classes import FlightInfo
+
+
+def make_graph() -> data_classes.Graph:
+    """Return a graph of three airports, with two flight packages between YYZ and LHR and one between YYZ and JFK."""
+    graph = data_classes.Graph()
+    graph.add_vertex('YYZ', 'Canada', (43.68, -79.63))
+    graph.add_vertex('LHR', 'United Kingdom', (51.47, -0.45))
+    graph.add_vertex('JFK', 'United States', (40.64, -73.78))
+    graph.add_edge('YYZ', 'LHR', (('Air Canada', ('Boeing 787',)), FlightInfo(900.0, 0, 500000)))
+    graph.add_edge('LHR', 'YYZ', (('Lufthansa', ('Airbus A320', 'Airbus A350')), FlightInfo(700.0, 1, 610000)))
+    graph.add_edge('YYZ', 'JFK', (('Delta', ('Embraer 190',)), FlightInfo(300.0, 0, 90000)))
+    return graph
+
+
+def test_vertex_view_membership() -> None:
+    """The view contains exactly the vertices of its graph."""
+    graph = make_graph()
+    vertices = graph.all_verticies()
+    assert len(vertices) == 3
+    assert graph.get_vertex('YYZ') in vertices
+    assert data_classes._Vertex('YYZ', 'Canada', {}, (0.0, 0.0)) not in vertices
+    assert 'YYZ' not in vertices
+    assert {vertex.airport_code for vertex in vertices} == {'YYZ', 'LHR', 'JFK'}
+
+
+def test_vertex_view_set_operators() -> None:
+    """Set operators on the view return real sets of vertices, like the set the view replaced."""
+    graph = make_graph()
+    vertices = graph.all_verticies()
+    yyz = graph.get_vertex('YYZ')
+
+    for result in (vertices - set(), vertices | set(), vertices & set(vertices), set() | vertices):
+        assert isinstance(result, set)
+        assert len(result) == 3
+        assert {vertex.airport_code for vertex in result} == {'YYZ', 'LHR', 'JFK'}
+
+    assert vertices - {yyz} == {graph.get_vertex('LHR'), graph.get_vertex('JFK')}
+    assert vertices & {yyz} == {yyz}
+    assert vertices ^ {yyz} == {graph.get_vertex('LHR'), graph.get_vertex('JFK')}
+    assert vertices == set(vertices)
+    assert vertices <= set(vertices) | {data_classes._Vertex('ABC', 'Nowhere', {}, (0.0, 0.0))}
+
+
+def test_vertex_view_reflects_changes() -> None:
+    """The view is not a copy: it sees vertices added after it was created."""
+    graph = make_graph()
+    vertices = graph.all_verticies()
+    graph.add_vertex('CDG', 'France', (49.01, 2.55))
+    assert len(vertices) == 4
+    assert graph.get_vertex('CDG') in vertices
+
+
+def test_neighbours_share_one_flights_dict() -> None:
+    """Both directions of an edge share its flight packages and its aggregates."""
+    graph = make_graph()
+    yyz, lhr = graph.get_vertex('YYZ'), graph.get_vertex('LHR')
+    assert yyz.neighbours[lhr] is lhr.neighbours[yyz]
+    assert len(yyz.neighbours[lhr]) == 2
+    assert set(yyz.get_neighbors()) == {'LHR', 'JFK'}
+    assert yyz.get_neighbour('LHR') is lhr
+    assert yyz.get_neighbour('CDG') is None
+    assert graph.get_edge_stats('YYZ', 'LHR') is graph.get_edge_stats('LHR', 'YYZ')
+
+
+def test_edge_stats_after_replacing_an_extreme_package() -> None:
+    """Replacing the only package at an extreme recomputes the aggregates of the edge."""
+    graph = make_graph()
+    assert graph.get_max_emissions('YYZ', 'LHR') == 610000
+    graph.add_edge('YYZ', 'LHR', (('Lufthansa', ('Airbus A320', 'Airbus A350')), FlightInfo(650.0, 1, 400000)))
+    stats = graph.get_edge_stats('YYZ', 'LHR')
+    assert (stats.min_price, stats.max_price) == (650.0, 900.0)
+    assert (stats.min_emissions, stats.max_emissions) == (400000, 500000)
+    assert graph.get_vertex('LHR').max_emissions('YYZ') == 500000
+
+
+def test_missing_airports_raise_value_error() -> None:
+    """Looking up an airport or an edge that is not in the graph raises a ValueError."""
+    graph = make_graph()
+    with pytest.raises(ValueError):
+        graph.get_vertex('CDG')
+    with pytest.raises(ValueError):
+        graph.get_edge_stats('LHR', 'JFK')
+    with pytest.raises(ValueError):
+        graph.get_vertex('LHR').max_emissions('JFK')
+
+
+def test_tree_with_unhashable_roots() -> None:
+    """A Tree still accepts values that cannot be hashed, like the recursive Tree did."""
+    tree = data_classes.Tree('', [])
+    tree.insert_sequence([['a'], ['b'], 'leaf1'])
+    tree.insert_sequence([['a'], ['c'], 'leaf2'])
+    tree.insert_sequence([['a'], ['b'], 'leaf3'])
+    assert len(tree) == 7
+    assert ['c'] in tree
+    assert tree.traverse([['a'], ['b']]) == ['leaf1', 'leaf3']
+    assert tree.traverse([['a'], ['d']]) == []
+
+    tree = data_classes.Tree(1, [data_classes.Tree([2], []), data_classes.Tree(3, [])])
+    assert tree.traverse([[2]]) == [] and tree.traverse([3]) == []
+    assert len(tree) == 3
+
+
+def test_run_country_matchmaker_falls_back_to_nearest(monkeypatch, capsys) -> None:
+    """With nearest=True, answers no country matches exactly return the closest countries instead of None."""
+    matcher = data_classes.get_country_matcher('CSV Files/country_traits.csv')
+    answers = next(answers for answers in ([bool(mask >> i & 1) for i in range(len(matcher.traits))]
+                                           for mask in range(2 ** len(matcher.traits)))
+                   if not matcher.match(answers))
+    replies = iter(['Y' if answer else 'N' for answer in answers] * 2)
+    monkeypatch.setattr('builtins.input', lambda prompt: next(replies))
+
+    assert data_classes.run_country_matchmaker('CSV Files/country_traits.csv') is None
+    closest = data_classes.run_country_matchmaker('CSV Files/country_traits.csv', nearest=True)
+    assert closest == matcher.closest(answers) and closest
+    assert 'No country matches every answer' in capsys.readouterr().out
+
+
+def all_answers(count: int) -> list[list[bool]]:
+    """Return every combination of count Yes/No answers."""
+    return [[bool(mask >> i & 1) for i in range(count)] for mask in range(2 ** count)]
+
+
+def test_country_matcher_matches_the_decision_tree() -> None:
+    """For every combination of answers, the matcher returns the countries the decision tree returns, in order."""
+    matcher = data_classes.CountryMatcher.from_file('CSV Files/country_traits.csv')
+    tree = data_classes.build_decision_tree('CSV Files/country_traits.csv')
+    assert len(matcher) == 47
+    for answers in all_answers(len(matcher.traits)):
+        assert matcher.match(answers) == tree.traverse(answers)
+
+
+def test_country_matcher_ranks_by_mismatches() -> None:
+    """nearest ranks countries by the number of answers they do not match, ties in the order they were added, and
+    closest keeps only the best of them."""
+    matcher = data_classes.CountryMatcher(['warm', 'water', 'outdoors'])
+    countries = [('Norway', [False, True, True]), ('Egypt', [True, True, False]), ('Chile', [True, True, True]),
+                 ('Iceland', [False, True, True])]
+    for country, traits in countries:
+        matcher.add_country(country, traits)
+
+    for answers in all_answers(3):
+        mismatches = [(country, sum(trait != answer for trait, answer in zip(traits, answers)))
+                      for country, traits in countries]
+        expected = sorted(mismatches, key=lambda country_mismatches: country_mismatches[1])
+        assert matcher.nearest(answers) == expected
+        assert matcher.nearest(answers, 2) == expected[:2]
+        assert matcher.closest(answers) == [country for country, count in expected if count == expected[0][1]]
+    assert matcher.match([False, True, True]) == ['Norway', 'Iceland']
+
+
+def test_tree_matches_its_inserted_prefixes() -> None:
+    """After inserting many sequences, the tree holds one node per distinct prefix, and traversing a prefix returns
+    the items that followed it, in the order they were first inserted."""
+    rng = random.Random(0)
+    tree = data_classes.Tree('', [])
+    followers = {}
+    for _ in range(300):
+        items = [rng.random() < 0.5 for _ in range(rng.randint(1, 6))] + [rng.choice('abc')]
+        tree.insert_sequence(items)
+        for i, item in enumerate(items):
+            following = followers.setdefault(tuple(items[:i]), [])
+            if item not in following:
+                following.append(item)
+
+    assert len(tree) == 1 + sum(len(following) for following in followers.values())
+    for prefix, following in followers.items():
+        assert tree.traverse(list(prefix)) == following
+    assert 'c' in tree and 'd' not in tree
+
+
+def test_deep_tree_does_not_recurse() -> None:
+    """Trees far deeper than the recursion limit can be built, measured, searched and traversed."""
+    depth = sys.getrecursionlimit() * 5
+    tree = data_classes.Tree('', [])
+    tree.insert_sequence(list(range(depth)) + ['leaf'])
+    tree.insert_sequence(list(range(depth)) + ['other leaf'])
+    assert len(tree) == depth + 3
+    assert 'other leaf' in tree
+    assert tree.traverse(list(range(depth))) == ['leaf', 'other leaf']
@@ -0,0 +1,110 @@
+"""Verde Voyage: Tests of flight_cache
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import json
+import os
+import shutil
+import numpy as np
+import pytest
+import flight_cache
+import flight_index
+import flight_reader
+import helper_functions
+from conftest import SMALL_ROWS
+
+# The columns of a row filled in by FlightColumns
+COLUMNS = (0, 1, 2, 3, 4, 11, 14)
+
+
+@pytest.fixture
+def paths(small_zip: str, tmp_path) -> tuple[str, str]:
+    """Return a copy of the small dataset and a cache directory, both in a temporary directory."""
+    zip_path = str(tmp_path / 'flight_data.csv.zip')
+    shutil.copy(small_zip, zip_path)
+    return zip_path, str(tmp_path / 'cache')
+
+
+def meta_path(cache_dir: str) -> str:
+    """Return the path of the metadata file of the current build of the cache in cache_dir."""
+    return os.path.join(cache_dir, flight_cache.current_build(cache_dir), 'meta.json')
+
+
+def test_columns_hold_the_complete_rows(synthetic_zip: str, tmp_path) -> None:
+    """Each row of the cache has the values of the matching complete row of the dataset, and the summary of every
+    row of the dataset."""
+    columns = flight_cache.build_flight_cache(synthetic_zip, str(tmp_path / 'cache'))
+    rows = [row for row in flight_reader.iter_flight_rows(synthetic_zip) if flight_index.is_complete_row(row)]
+    assert len(columns) == len(rows)
+    for row, expected in zip(columns, rows):
+        assert [row[i] for i in COLUMNS] == [expected[i] for i in COLUMNS]
+        assert float(row[12]) == float(expected[12])
+        assert row[6] == expected[6].split('| ')[0].strip('[]')
+    assert columns.summary == helper_functions.countries_and_airports(synthetic_zip)
+
+
+def test_loaded_cache_is_memory_mapped(paths: tuple[str, str]) -> None:
+    """A built cache is loaded back with memory-mapped arrays equal to the built ones."""
+    zip_path, cache_dir = paths
+    built = flight_cache.build_flight_cache(zip_path, cache_dir)
+    loaded = flight_cache.load_flight_cache(zip_path, cache_dir)
+    for name, array in built.columns.items():
+        assert isinstance(loaded.columns[name], np.memmap)
+        assert np.array_equal(loaded.columns[name], array)
+    assert loaded.strings == built.strings and loaded.summary == built.summary
+    assert len(loaded) == len(SMALL_ROWS) - 1
+
+
+def test_touched_dataset_is_not_rebuilt(paths: tuple[str, str], monkeypatch) -> None:
+    """A dataset whose modification time changed but whose contents did not only refreshes the stored fingerprint."""
+    zip_path, cache_dir = paths
+    flight_cache.build_flight_cache(zip_path, cache_dir)
+    stat = os.stat(zip_path)
+    os.utime(zip_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    monkeypatch.setattr(flight_cache, 'build_flight_cache', pytest.fail)
+
+    flight_cache.load_flight_cache(zip_path, cache_dir)
+    with open(meta_path(cache_dir)) as meta_file:
+        assert json.load(meta_file)['source']['mtime_ns'] == os.stat(zip_path).st_mtime_ns
+
+
+def test_changed_dataset_is_rebuilt(paths: tuple[str, str], synthetic_zip: str) -> None:
+    """A cache built from older contents of the dataset, or left without its metadata file, is rebuilt."""
+    zip_path, cache_dir = paths
+    flight_cache.build_flight_cache(zip_path, cache_dir)
+    shutil.copy(synthetic_zip, zip_path)
+    columns = flight_cache.load_flight_cache(zip_path, cache_dir)
+    assert len(columns) > len(SMALL_ROWS)
+
+    os.remove(meta_path(cache_dir))
+    assert len(flight_cache.load_flight_cache(zip_path, cache_dir)) == len(columns)
+    assert os.path.exists(meta_path(cache_dir))
+
+
+def test_rebuild_keeps_mapped_builds_intact(paths: tuple[str, str], synthetic_zip: str) -> None:
+    """A rebuild publishes a new build without touching the files of the build readers have mapped, and only the
+    current and previous builds are kept."""
+    zip_path, cache_dir = paths
+    flight_cache.build_flight_cache(zip_path, cache_dir)
+    first = flight_cache.current_build(cache_dir)
+    old = flight_cache.load_flight_cache(zip_path, cache_dir)
+    expected = {name: np.array(array) for name, array in old.columns.items()}
+
+    shutil.copy(synthetic_zip, zip_path)
+    new = flight_cache.load_flight_cache(zip_path, cache_dir)
+    second = flight_cache.current_build(cache_dir)
+    assert second != first and len(new) > len(old)
+    for name, array in expected.items():
+        assert np.array_equal(old.columns[name], array)
+
+    flight_cache.build_flight_cache(zip_path, cache_dir)
+    assert set(os.listdir(cache_dir)) == {flight_cache.CURRENT_FILE, second, flight_cache.current_build(cache_dir)}
+    assert [old[i] for i in range(len(old))] == [flight_cache.FlightColumns(expected, old.strings, old.summary)[i]
+                                                 for i in range(len(old))]
@@ -0,0 +1,103 @@
+"""Verde Voyage: Tests of flight_index and the graph views of create_graph
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import pytest
+import data_classes
+import flight_cache
+import flight_index
+import flight_reader
+import helper_functions
+from conftest import SMALL_ROWS
+
+
+def scanned_graph(airport_coords: dict, rows: list[list[str]], home_airport: str = None, dest_airport: str = None,
+                  dest_countries: list[str] = None) -> data_classes.Graph:
+    """Return the graph the original create_graph built, by scanning every row and keeping the ones of the view."""
+    graph = data_classes.Graph()
+    for row in rows:
+        if row[4] == '' or row[12] == '' or row[14] == '':
+            continue
+
+        if home_airport is None:
+            helper_functions.create_graph_helper(graph, row, airport_coords)
+        elif dest_airport is not None:
+            if row[0] == home_airport and row[2] == dest_airport:
+                helper_functions.create_graph_helper(graph, row, airport_coords)
+        elif dest_countries is not None:
+            if row[0] == home_airport and row[3].lower() in {country.lower() for country in dest_countries}:
+                helper_functions.create_graph_helper(graph, row, airport_coords)
+        elif row[0] == home_airport:
+            helper_functions.create_graph_helper(graph, row, airport_coords)
+
+    return graph
+
+
+def ordered_edges(graph: data_classes.Graph) -> list:
+    """Return every vertex of graph with its country and its edges, keeping the order of the packages of each edge."""
+    return sorted((vertex.airport_code, vertex.country_name,
+                   sorted((neighbour.airport_code, list(flights.items())) for neighbour, flights in
+                          vertex.neighbours.items()))
+                  for vertex in graph.all_verticies())
+
+
+@pytest.fixture(scope='module')
+def synthetic_rows(synthetic_zip: str) -> list[list[str]]:
+    """Return every row of the synthetic dataset."""
+    return list(flight_reader.iter_flight_rows(synthetic_zip))
+
+
+def views(rows: list[list[str]]) -> list[dict]:
+    """Return the keyword arguments of one create_graph view of each kind over the given rows."""
+    home, dest, country = rows[0][0], rows[0][2], rows[0][3]
+    other_country = next(row[3] for row in rows if row[0] == home and row[3].lower() != country.lower())
+    return [{},
+            {'home_airport': home},
+            {'home_airport': home, 'dest_airport': dest},
+            {'home_airport': home, 'dest_countries': [country.upper()]},
+            {'home_airport': home, 'dest_countries': [other_country, country.lower(), country]},
+            {'home_airport': 'NOPE'}]
+
+
+def test_views_match_a_scan_of_the_dataset(airport_coords: dict, synthetic_rows: list[list[str]]) -> None:
+    """Every view answered from the index is the graph built by scanning the whole dataset, edge order included."""
+    index = flight_index.FlightIndex(synthetic_rows)
+    for view in views(synthetic_rows):
+        assert ordered_edges(helper_functions.create_graph(airport_coords, index=index, **view)) \
+            == ordered_edges(scanned_graph(airport_coords, synthetic_rows, **view))
+
+
+def test_index_of_columns_matches_index_of_rows(airport_coords: dict, synthetic_zip: str,
+                                                synthetic_rows: list[list[str]], tmp_path) -> None:
+    """An index built on the columnar cache answers every view with the same graph as an index built on rows."""
+    columns_index = flight_index.FlightIndex.from_columns(
+        flight_cache.build_flight_cache(synthetic_zip, str(tmp_path / 'cache')))
+    rows_index = flight_index.FlightIndex(synthetic_rows)
+    assert len(columns_index.rows) == len(rows_index.rows)
+    for view in views(synthetic_rows):
+        assert ordered_edges(helper_functions.create_graph(airport_coords, index=columns_index, **view)) \
+            == ordered_edges(helper_functions.create_graph(airport_coords, index=rows_index, **view))
+
+
+def test_incomplete_rows_are_not_indexed() -> None:
+    """Rows missing an aircraft, a price or an emissions value are left out of every lookup."""
+    index = flight_index.FlightIndex(SMALL_ROWS)
+    assert len(index.rows) == len(SMALL_ROWS) - 1
+    assert [row[6] for row in index.rows_between('YYZ', 'JFK')] == ['[Delta| Delta]']
+    assert index.rows_to_countries('YYZ', ['UNITED KINGDOM']) == SMALL_ROWS[:4]
+    assert index.rows_from('CDG') == []
+
+
+def test_index_is_parsed_once_per_file(small_zip: str, monkeypatch) -> None:
+    """get_flight_index parses each dataset file the first time it is requested, and shares it afterwards."""
+    monkeypatch.setattr(flight_index, '_LOADED_INDEXES', {})
+    index = flight_index.get_flight_index(small_zip)
+    monkeypatch.setattr(flight_index, 'load_flight_index', pytest.fail)
+    assert flight_index.get_flight_index(small_zip) is index
@@ -0,0 +1,52 @@
+"""Verde Voyage: Tests of flight_reader
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import csv
+import zipfile
+import flight_reader
+import helper_functions
+from conftest import SMALL_ROWS, write_flight_csv
+
+
+def extracted_rows(csv_path: str) -> list[list[str]]:
+    """Return the rows of the given CSV file without its header, read like the original project read them."""
+    with open(csv_path) as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        return list(reader)
+
+
+def test_zip_rows_match_the_extracted_file(synthetic_zip: str, synthetic_csv: str) -> None:
+    """Streaming the rows out of the zip file gives the rows of the extracted CSV file."""
+    expected = extracted_rows(synthetic_csv)
+    assert list(flight_reader.iter_flight_rows(synthetic_zip)) == expected
+    assert list(flight_reader.iter_flight_rows(synthetic_csv)) == expected
+
+
+def test_member_selects_a_file_of_the_archive(tmp_path) -> None:
+    """The member argument reads another file of the archive than the first one."""
+    first = write_flight_csv(str(tmp_path / 'first.csv'), SMALL_ROWS[:2])
+    second = write_flight_csv(str(tmp_path / 'second.csv'), SMALL_ROWS[2:])
+    zip_path = str(tmp_path / 'flights.zip')
+    with zipfile.ZipFile(zip_path, 'w') as zip_ref:
+        zip_ref.write(first, 'first.csv')
+        zip_ref.write(second, 'second.csv')
+
+    assert list(flight_reader.iter_flight_rows(zip_path)) == SMALL_ROWS[:2]
+    assert list(flight_reader.iter_flight_rows(zip_path, 'second.csv')) == SMALL_ROWS[2:]
+
+
+def test_countries_and_airports_match_the_extracted_file(synthetic_zip: str, synthetic_csv: str) -> None:
+    """The summary streamed from the zip file has the airports and lowercase countries of every extracted row."""
+    rows = extracted_rows(synthetic_csv)
+    expected = ({row[0] for row in rows}, {row[1].lower() for row in rows},
+                {row[2] for row in rows}, {row[3].lower() for row in rows})
+    assert helper_functions.countries_and_airports(synthetic_zip) == expected
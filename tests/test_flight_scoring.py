@@ -0,0 +1,120 @@
+"""Verde Voyage: Tests of flight_scoring and the scoring of helper_functions
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import random
+import numpy as np
+import pytest
+import data_classes
+import flight_index
+import flight_reader
+import flight_scoring
+import helper_functions
+
+WEIGHTS = [(0.1, 0.1, 0.8), (1 / 3, 1 / 3, 1 / 3), (0.7, 0.0, 0.3), (0.05, 0.55, 0.4)]
+
+
+def looped_scores(flights: dict, weights: tuple[float, float, float]) -> dict:
+    """
+    Return the scores the original calculate_flight_scores computed one package at a time.
+
+    The original divided by zero when every package of an edge had the same zero value; here that value adds
+    nothing to the score instead, which is what the vectorized scoring does.
+    """
+    weight_price, weight_stops, weight_emissions = weights
+    max_price = max(flights[flight][0] for flight in flights)
+    max_stops = max(flights[flight][1] for flight in flights)
+    max_emissions = max(flights[flight][2] for flight in flights)
+
+    flight_scores = {}
+    for flight in flights:
+        price, stops, emissions = flights[flight][0], flights[flight][1], flights[flight][2]
+        norm_price = price / max_price if max_price != 0 else 0.0
+        norm_stops = stops / max_stops if max_stops != 0 else 0.0
+        norm_emissions = emissions / max_emissions if max_emissions != 0 else 0.0
+        flight_scores[flight] = norm_price * weight_price + norm_stops * weight_stops + norm_emissions * weight_emissions
+
+    return flight_scores
+
+
+def sorted_routes(flights: dict, weights: tuple[float, float, float]) -> list[tuple]:
+    """Return the five best packages of flights, ranked like the original optimal_routes ranked them."""
+    sorted_flights = sorted(looped_scores(flights, weights).items(), key=lambda item: item[1])
+    return [(flight, flights[flight][0], flights[flight][1], flights[flight][2], round(score, 5))
+            for flight, score in sorted_flights][:5]
+
+
+@pytest.fixture(scope='module')
+def synthetic_graph(airport_coords: dict, synthetic_zip: str) -> data_classes.Graph:
+    """Return the graph of every flight in the synthetic dataset."""
+    return helper_functions.create_graph(
+        airport_coords, index=flight_index.FlightIndex(flight_reader.iter_flight_rows(synthetic_zip)))
+
+
+def routes(graph: data_classes.Graph) -> list[tuple[str, str, dict]]:
+    """Return every (home airport, destination airport, flights) edge of graph, in both directions."""
+    return [(vertex.airport_code, neighbour.airport_code, flights)
+            for vertex in graph.all_verticies() for neighbour, flights in vertex.neighbours.items()]
+
+
+def test_scores_match_the_loop(synthetic_graph: data_classes.Graph) -> None:
+    """Every package of every edge gets exactly the score the loop over packages gives it."""
+    for _, _, flights in routes(synthetic_graph):
+        for weights in WEIGHTS:
+            assert helper_functions.calculate_flight_scores(flights, weights) == looped_scores(flights, weights)
+
+
+def test_optimal_routes_match_the_sorted_loop(synthetic_graph: data_classes.Graph) -> None:
+    """optimal_routes returns the five best packages, in the order a stable sort of the looped scores gives."""
+    for home_airport, dest_airport, flights in routes(synthetic_graph):
+        for weights in WEIGHTS:
+            assert helper_functions.optimal_routes(synthetic_graph, home_airport, dest_airport, weights) \
+                == sorted_routes(flights, weights)
+
+
+def test_zero_maximum_adds_nothing() -> None:
+    """An edge where every package is a direct flight is scored on price and emissions alone."""
+    flights = {('Delta', ('Airbus A320',)): data_classes.FlightInfo(300.0, 0, 90000),
+               ('United', ('Boeing 737',)): data_classes.FlightInfo(200.0, 0, 95000)}
+    scores = helper_functions.calculate_flight_scores(flights, (0.2, 0.3, 0.5))
+    assert scores == looped_scores(flights, (0.2, 0.3, 0.5))
+    assert scores[('United', ('Boeing 737',))] == 200.0 / 300.0 * 0.2 + 0.0 * 0.3 + 1.0 * 0.5
+
+
+def test_top_k_breaks_ties_by_position() -> None:
+    """top_k and top_k_columns give the first k positions of a stable sort, even among many tied scores."""
+    rng = random.Random(0)
+    scores = np.array([[rng.choice((0.1, 0.2, 0.3, 0.4)) for _ in range(6)] for _ in range(40)])
+    for column in range(scores.shape[1]):
+        expected = np.argsort(scores[:, column], kind='stable')[:5]
+        assert flight_scoring.top_k(scores[:, column], 5).tolist() == expected.tolist()
+        assert flight_scoring.top_k_columns(scores, 5)[:, column].tolist() == expected.tolist()
+
+
+def test_pareto_front_matches_pairwise_comparisons() -> None:
+    """The front holds exactly the rows that no other row dominates, and keeps rows with identical values."""
+    rng = random.Random(1)
+    values = np.array([[rng.choice((100.0, 200.0, 300.0)), rng.randint(0, 2), rng.choice((1, 2, 3)) * 1000.0]
+                       for _ in range(60)])
+    values = np.vstack([values, values[np.lexsort(values.T[::-1])[0]]])  # a copy of a row on the front
+    expected = [i for i in range(len(values))
+                if not any(np.all(other <= values[i]) and np.any(other < values[i]) for other in values)]
+    assert flight_scoring.pareto_front(values).tolist() == expected
+    assert expected[-1] == len(values) - 1
+
+
+@pytest.mark.parametrize('k', [0, -1])
+def test_top_k_of_no_positions(k: int) -> None:
+    """Asking for no positions, or a negative number of them, returns an empty result of the usual shape."""
+    scores = np.array([[0.3, 0.1], [0.2, 0.4], [0.1, 0.2]])
+    assert flight_scoring.top_k(scores[:, 0], k).shape == (0,)
+    assert flight_scoring.top_k(np.array([]), k).shape == (0,)
+    assert flight_scoring.top_k_columns(scores, k).shape == (0, 2)
+    assert flight_scoring.top_k_columns(scores, k).dtype == np.intp
@@ -0,0 +1,120 @@
+"""Verde Voyage: Tests of flight_updates and Graph.apply_changes
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import csv
+import pytest
+import benchmark_suite
+import data_classes
+import flight_index
+import flight_updates
+import helper_functions
+from conftest import SMALL_ROWS, flight_row
+from test_helper_functions import edges
+
+# The rows of a delta file for SMALL_ROWS, and the rows of the dataset once it is applied
+NEW_ROUTE = flight_row('CDG', 'France', 'MEX', 'Mexico', 'Air France', 'Boeing 787', '980.0', '0', '700000')
+UPDATED = flight_row('YYZ', 'Canada', 'LHR', 'United Kingdom', 'British Airways', 'Boeing 777', '990.0', '0', '470000')
+DELTA_ROWS = [['add'] + NEW_ROUTE,
+              ['update'] + UPDATED,
+              ['update'] + flight_row('YYZ', 'Canada', 'LHR', 'United Kingdom', 'KLM', 'Boeing 737', '1.0', '0', '1'),
+              ['delete'] + flight_row('LHR', 'United Kingdom', 'YYZ', 'Canada', 'Lufthansa', 'Airbus A320|Airbus A350',
+                                      '', '', ''),
+              ['delete', 'JFK', 'United States', 'LHR', 'United Kingdom'] + [''] * 14]
+UPDATED_ROWS = [row for row in SMALL_ROWS if row[6] != '[Lufthansa| Lufthansa]' and row[:3:2] != ['JFK', 'LHR']] \
+    + [UPDATED, NEW_ROUTE]
+
+
+def write_delta_file(path: str, rows: list[list[str]]) -> str:
+    """Write the given rows, with a header, to the delta file at path and return path."""
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['action'] + benchmark_suite.FLIGHT_HEADER)
+        writer.writerows(rows)
+    return path
+
+
+def small_graph(airport_coords: dict, rows: list[list[str]] = SMALL_ROWS) -> data_classes.Graph:
+    """Return the graph of every flight in the given rows."""
+    return helper_functions.create_graph(airport_coords, index=flight_index.FlightIndex(rows))
+
+
+def test_delta_file_matches_a_full_rebuild(airport_coords: dict, tmp_path) -> None:
+    """Applying a delta file gives the graph built from scratch from the updated dataset."""
+    graph = small_graph(airport_coords)
+    delta_file = write_delta_file(str(tmp_path / 'delta.csv'), DELTA_ROWS)
+    counts = flight_updates.apply_delta_file(graph, delta_file, airport_coords)
+    assert counts == {'added': 1, 'updated': 1, 'deleted': 2, 'skipped': 1, 'edges': 3}
+    assert graph.version == small_graph(airport_coords).version + 1
+
+    expected = small_graph(airport_coords, UPDATED_ROWS)
+    assert edges(graph) == edges(expected)
+    assert set(graph.all_airport_codes()) == set(expected.all_airport_codes())
+    for vertex in expected.all_verticies():
+        for neighbour in vertex.neighbours:
+            stats = graph.get_edge_stats(vertex.airport_code, neighbour.airport_code)
+            expected_stats = expected.get_edge_stats(vertex.airport_code, neighbour.airport_code)
+            assert [getattr(stats, name) for name in data_classes.EdgeStats.__slots__[:-1]] \
+                == [getattr(expected_stats, name) for name in data_classes.EdgeStats.__slots__[:-1]]
+
+
+def test_readers_keep_the_graph_they_started_with(airport_coords: dict, tmp_path) -> None:
+    """A vertex looked up before a change still shows the whole graph as it was before the change."""
+    graph = small_graph(airport_coords)
+    yyz = graph.get_vertex('YYZ')
+    before = {neighbour.airport_code: dict(flights) for neighbour, flights in yyz.neighbours.items()}
+    lhr_before = dict(yyz.get_neighbour('LHR').neighbours[yyz])
+
+    flight_updates.apply_delta_file(graph, write_delta_file(str(tmp_path / 'delta.csv'), DELTA_ROWS), airport_coords)
+    assert {neighbour.airport_code: dict(flights) for neighbour, flights in yyz.neighbours.items()} == before
+    assert yyz.get_neighbour('LHR').neighbours[yyz] == lhr_before
+    assert graph.get_vertex('YYZ') is not yyz
+    assert yyz not in graph.all_verticies()
+
+
+def test_version_is_incremented_after_publishing(airport_coords: dict, monkeypatch) -> None:
+    """The new vertices are published before the version changes, so a new version never shows the old vertices."""
+    graph = small_graph(airport_coords)
+    replace_edges = data_classes.Graph._replace_edges
+    observed = []
+
+    def spy(self: data_classes.Graph, *args) -> None:
+        vertices, version = self._vertices, self.version
+        replace_edges(self, *args)
+        observed.append((self._vertices is not vertices, self.version == version))
+
+    monkeypatch.setattr(data_classes.Graph, '_replace_edges', spy)
+    graph.apply_changes([data_classes.FlightChange('delete', 'JFK', 'United States', 'LHR', 'United Kingdom', None,
+                                                   None)], airport_coords)
+    assert observed == [(True, True)]
+
+
+def test_cached_arrays_follow_the_edge(airport_coords: dict) -> None:
+    """The arrays of a changed edge are rebuilt, and the arrays of an unchanged edge are kept."""
+    graph = small_graph(airport_coords)
+    changed = graph.get_flight_arrays('YYZ', 'LHR')
+    unchanged = graph.get_flight_arrays('YYZ', 'JFK')
+    old_stats = graph.get_edge_stats('YYZ', 'LHR')
+
+    graph.apply_changes([data_classes.FlightChange('add', 'YYZ', 'Canada', 'LHR', 'United Kingdom',
+                                                   ('KLM', ('Boeing 737',)), data_classes.FlightInfo(1.0, 0, 1))],
+                        airport_coords)
+    arrays = graph.get_flight_arrays('LHR', 'YYZ')
+    assert arrays is not changed and ('KLM', ('Boeing 737',)) in arrays.flights
+    assert arrays.flights is graph.get_vertex('YYZ').neighbours[graph.get_vertex('LHR')]
+    assert graph.get_flight_arrays('YYZ', 'JFK') is unchanged
+    assert graph.get_edge_stats('YYZ', 'LHR') is not old_stats and old_stats.arrays is changed
+
+
+def test_invalid_action_raises_value_error(tmp_path) -> None:
+    """A delta file with an unknown action raises a ValueError."""
+    delta_file = write_delta_file(str(tmp_path / 'delta.csv'), [['replace'] + NEW_ROUTE])
+    with pytest.raises(ValueError):
+        flight_updates.read_delta_file(delta_file)
@@ -0,0 +1,165 @@
+"""Verde Voyage: Tests of flight_visualization
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import math
+import weakref
+import numpy as np
+import pytest
+import airport_index
+import data_classes
+import flight_index
+import flight_reader
+import flight_visualization
+import helper_functions
+from conftest import SMALL_ROWS
+
+
+def hub_graph(airport_coords: dict) -> data_classes.Graph:
+    """Return the graph of the flights departing from YYZ in the small dataset."""
+    return helper_functions.create_graph(airport_coords, 'YYZ', index=flight_index.FlightIndex(SMALL_ROWS))
+
+
+def test_export_is_cached_per_view(airport_coords: dict) -> None:
+    """Exporting the same view twice builds its figure only once."""
+    cache = flight_visualization.FigureCache()
+    graph = hub_graph(airport_coords)
+    first = flight_visualization.export_graph_figure(graph, airport_coords, 'YYZ', cache=cache)
+    assert flight_visualization.export_graph_figure(graph, airport_coords, 'YYZ', cache=cache) is first
+    assert len(cache) == 1
+    assert {trace['name'] for trace in json.loads(first)['data']} >= {'YYZ', 'LHR', 'JFK'}
+
+
+def test_export_is_rebuilt_after_the_graph_changes(airport_coords: dict) -> None:
+    """A figure cached before the graph changed is not served for the changed graph."""
+    cache = flight_visualization.FigureCache()
+    graph = hub_graph(airport_coords)
+    before = flight_visualization.export_graph_figure(graph, airport_coords, 'YYZ', cache=cache)
+
+    graph.add_vertex('CDG', 'France', airport_coords['CDG'])
+    graph.add_edge('YYZ', 'CDG', (('Air France', ('Airbus A350',)), data_classes.FlightInfo(800.0, 0, 400000)))
+    after = flight_visualization.export_graph_figure(graph, airport_coords, 'YYZ', cache=cache)
+    assert after != before
+    assert 'CDG' in {trace['name'] for trace in json.loads(after)['data']}
+
+
+def test_figure_key(airport_coords: dict) -> None:
+    """The key of a view identifies the graph, ignores the order, repetition and case of countries, and includes the
+    version of the graph."""
+    graph = hub_graph(airport_coords)
+    graph.version = 3
+    assert flight_visualization.figure_key(graph, 'YYZ', countries=['France', 'canada', 'france']) \
+        == (weakref.ref(graph), 'hub', 'YYZ', None, ('canada', 'france'), 3)
+    assert flight_visualization.figure_key(graph, 'YYZ', 'LHR')[1] == 'route'
+    assert flight_visualization.figure_key(graph)[1] == 'network'
+    assert flight_visualization.figure_key(graph, 'YYZ') != flight_visualization.figure_key(hub_graph(airport_coords),
+                                                                                           'YYZ')
+
+
+def test_graphs_with_the_same_version_do_not_share_exports(airport_coords: dict) -> None:
+    """Two different graphs with the same version and view are exported separately."""
+    cache = flight_visualization.FigureCache()
+    hub = hub_graph(airport_coords)
+    first = flight_visualization.export_graph_figure(hub, airport_coords, 'YYZ', cache=cache)
+    graph = helper_functions.create_graph(airport_coords, 'YYZ', index=flight_index.FlightIndex(SMALL_ROWS[:1]))
+    graph.version = hub.version
+    second = flight_visualization.export_graph_figure(graph, airport_coords, 'YYZ', cache=cache)
+    assert second != first
+    assert 'JFK' not in {trace['name'] for trace in json.loads(second)['data']}
+    assert len(cache) == 2
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    """A full cache evicts the figure that was used least recently."""
+    cache = flight_visualization.FigureCache(max_size=2)
+    for key in ('a', 'b'):
+        cache.put((key,), flight_visualization.go.Figure())
+    cache.get(('a',))
+    cache.put(('c',), flight_visualization.go.Figure())
+    assert cache.get(('b',)) is None
+    assert cache.get(('a',)) is not None and cache.get(('c',)) is not None
+
+
+def test_concurrent_exports_share_one_entry(airport_coords: dict) -> None:
+    """Threads exporting the same view at once all get the same export, and the cache keeps a single entry."""
+    cache = flight_visualization.FigureCache(max_size=4)
+    graph = hub_graph(airport_coords)
+    with ThreadPoolExecutor(8) as executor:
+        exports = list(executor.map(
+            lambda _: flight_visualization.export_graph_figure(graph, airport_coords, 'YYZ', cache=cache), range(16)))
+    assert len(set(exports)) == 1
+    assert len(cache) == 1
+
+
+def test_batched_figure_draws_the_same_routes(airport_coords: dict, synthetic_zip: str) -> None:
+    """A figure with more routes than the threshold draws every route and airport of the unbatched figure, as one
+    line trace whose arcs are labelled with the route names and one marker trace."""
+    graph = helper_functions.create_graph(
+        airport_coords, index=flight_index.FlightIndex(flight_reader.iter_flight_rows(synthetic_zip)))
+    unbatched = flight_visualization.build_graph_figure(graph, airport_coords, batch_threshold=10 ** 6)
+    batched = flight_visualization.build_graph_figure(graph, airport_coords, batch_threshold=0)
+    route_names = sorted(trace.name for trace in unbatched.data if trace.mode == 'lines')
+    airports = sorted(trace.name for trace in unbatched.data if trace.mode == 'markers')
+
+    assert len(batched.data) == 2
+    lines, markers = batched.data
+    assert sorted(markers.text) == airports
+    arcs = np.split(np.array(lines.lon, dtype=np.float64), np.flatnonzero(np.isnan(np.array(lines.lon, dtype=float))))
+    assert len([arc for arc in arcs if len(arc) > 1]) == len(route_names)
+    texts = [text for text in lines.text if text is not None]
+    assert sorted(set(texts)) == sorted(set(route_names))
+
+
+def test_paths_match_one_pair_at_a_time() -> None:
+    """Generating the paths of many pairs at once gives the path of each pair on its own, separated by NaN."""
+    starts = [(43.68, -79.63), (51.47, -0.45), (35.55, 139.78)]
+    ends = [(51.47, -0.45), (40.64, -73.78), (33.94, -118.41)]
+    lon, lat = flight_visualization.great_circle_paths(starts, ends, curve_heights=[0.0, 0.05, -0.05])
+    pieces = [flight_visualization.great_circle_paths([start], [end], curve_heights=[height])
+              for start, end, height in zip(starts, ends, [0.0, 0.05, -0.05])]
+    assert np.array_equal(lon, np.concatenate([piece[0] for piece in pieces]), equal_nan=True)
+    assert np.array_equal(lat, np.concatenate([piece[1] for piece in pieces]), equal_nan=True)
+    assert np.isnan(lon[-1]) and np.isnan(lon).sum() == 3
+
+
+def test_paths_follow_the_great_circle() -> None:
+    """An unbent path starts and ends at its airports, and every point lies on the great circle between them."""
+    start, end = (43.68, -79.63), (51.47, -0.45)
+    lon, lat = flight_visualization.great_circle_paths([start], [end])
+    lon, lat = lon[:-1], lat[:-1]
+    assert (lat[0], lon[0]) == pytest.approx(start) and (lat[-1], lon[-1]) == pytest.approx(end)
+
+    total = haversine(start, end)
+    for point in zip(lat, lon):
+        assert haversine(start, point) + haversine(point, end) == pytest.approx(total)
+    assert len(lon) == math.ceil(math.degrees(total / 6371.0088) / flight_visualization.DEGREES_PER_POINT) + 1
+
+
+def test_paths_cross_the_antimeridian_without_jumping() -> None:
+    """A path crossing the antimeridian keeps going past 180 degrees instead of jumping to the other side."""
+    lon, _ = flight_visualization.great_circle_paths([(35.55, 139.78)], [(21.32, -157.92)])
+    lon = lon[:-1]
+    assert np.all(np.abs(np.diff(lon)) < 10)
+    assert lon[-1] == pytest.approx(-157.92 + 360)
+
+
+def test_create_curve_path_has_its_number_of_points() -> None:
+    """create_curve_path returns num_points points between the two airports, with the endpoints unchanged."""
+    lon, lat = flight_visualization.create_curve_path(-79.63, 43.68, -0.45, 51.47, num_points=50, curve_height=0.1)
+    assert len(lon) == len(lat) == 50
+    assert (lon[0], lat[0], lon[-1], lat[-1]) == pytest.approx((-79.63, 43.68, -0.45, 51.47))
+
+
+def haversine(first: tuple[float, float], second: tuple[float, float]) -> float:
+    """Return the great-circle distance in kilometres between two (latitude, longitude) points in degrees."""
+    return float(airport_index.haversine_km(math.radians(first[0]), math.radians(first[1]),
+                                            np.radians([second[0]]), np.radians([second[1]]))[0])
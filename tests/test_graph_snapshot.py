@@ -0,0 +1,89 @@
+"""Verde Voyage: Tests of graph_snapshot
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import json
+import os
+import numpy as np
+import pytest
+import compact_graph
+import flight_cache
+import flight_index
+import graph_snapshot
+import helper_functions
+from conftest import SMALL_ROWS
+
+
+@pytest.fixture
+def synthetic_graph(airport_coords: dict, synthetic_zip: str, tmp_path) -> compact_graph.CompactGraph:
+    """Return the CompactGraph of the synthetic dataset."""
+    columns = flight_cache.load_flight_cache(synthetic_zip, str(tmp_path / 'cache'))
+    return compact_graph.CompactGraph.from_columns(columns, airport_coords)
+
+
+def small_graph(airport_coords: dict) -> compact_graph.CompactGraph:
+    """Return the CompactGraph of the small dataset."""
+    return compact_graph.CompactGraph.from_graph(
+        helper_functions.create_graph(airport_coords, index=flight_index.FlightIndex(SMALL_ROWS)))
+
+
+def test_attached_graph_matches_the_published_graph(synthetic_graph: compact_graph.CompactGraph, tmp_path) -> None:
+    """An attached snapshot has memory-mapped copies of the published arrays, and ranks routes identically."""
+    snapshot_dir = str(tmp_path / 'snapshots')
+    version = graph_snapshot.publish_snapshot(synthetic_graph, snapshot_dir)
+    assert version == graph_snapshot.snapshot_version(synthetic_graph)
+    attached_version, attached = graph_snapshot.attach_snapshot(snapshot_dir)
+    assert attached_version == version
+
+    for name in compact_graph.ARRAYS:
+        assert isinstance(getattr(attached, name), np.memmap)
+        assert np.array_equal(getattr(attached, name), getattr(synthetic_graph, name))
+    for home_airport in synthetic_graph.codes[:3]:
+        for dest_airport in synthetic_graph.codes[3:6]:
+            assert helper_functions.optimal_routes(attached, home_airport, dest_airport, (0.2, 0.3, 0.5)) \
+                == helper_functions.optimal_routes(synthetic_graph, home_airport, dest_airport, (0.2, 0.3, 0.5))
+
+
+def test_reader_follows_the_current_version(synthetic_graph: compact_graph.CompactGraph, airport_coords: dict,
+                                            tmp_path) -> None:
+    """A reader reattaches only when a new version is published, and old versions stay attachable until pruned."""
+    snapshot_dir = str(tmp_path / 'snapshots')
+    first = graph_snapshot.publish_snapshot(synthetic_graph, snapshot_dir)
+    reader = graph_snapshot.SnapshotReader(snapshot_dir)
+    graph = reader.get_graph()
+    assert reader.get_graph() is graph
+
+    second = graph_snapshot.publish_snapshot(small_graph(airport_coords), snapshot_dir)
+    assert second != first and graph_snapshot.current_version(snapshot_dir) == second
+    assert set(reader.get_graph().all_airport_codes()) == {'YYZ', 'LHR', 'JFK', 'CDG'}
+    assert graph_snapshot.attach_snapshot(snapshot_dir, first)[0] == first
+
+    assert graph_snapshot.publish_snapshot(small_graph(airport_coords), snapshot_dir) == second
+    os.utime(os.path.join(snapshot_dir, first), (0, 0))
+    assert graph_snapshot.prune_snapshots(snapshot_dir, keep=1) == [first]
+    assert set(os.listdir(snapshot_dir)) == {'CURRENT', second}
+
+
+def test_missing_or_foreign_snapshots_are_not_attached(airport_coords: dict, tmp_path) -> None:
+    """Attaching without a published snapshot raises FileNotFoundError, and a snapshot in another format raises a
+    ValueError."""
+    snapshot_dir = str(tmp_path / 'snapshots')
+    with pytest.raises(FileNotFoundError):
+        graph_snapshot.attach_snapshot(snapshot_dir)
+
+    version = graph_snapshot.publish_snapshot(small_graph(airport_coords), snapshot_dir)
+    meta_path = os.path.join(snapshot_dir, version, 'meta.json')
+    with open(meta_path) as meta_file:
+        meta = json.load(meta_file)
+    meta['format_version'] = graph_snapshot.SNAPSHOT_FORMAT_VERSION + 1
+    with open(meta_path, 'w') as meta_file:
+        json.dump(meta, meta_file)
+    with pytest.raises(ValueError):
+        graph_snapshot.attach_snapshot(snapshot_dir)
@@ -0,0 +1,98 @@
+"""Verde Voyage: Tests of helper_functions
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import pytest
+import data_classes
+import flight_index
+import flight_reader
+import helper_functions
+from conftest import SMALL_ROWS
+
+
+def test_flight_packages_are_shared_within_a_graph(airport_coords: dict) -> None:
+    """Every edge of a graph built by create_graph uses the same tuple for the same flight package."""
+    graph = helper_functions.create_graph(airport_coords, index=flight_index.FlightIndex(SMALL_ROWS))
+    packages = {}
+    for vertex in graph.all_verticies():
+        for flights in vertex.neighbours.values():
+            for package in flights:
+                assert packages.setdefault(package, package) is package
+
+
+def test_intern_table_is_owned_by_the_caller() -> None:
+    """intern_flight_package only shares tuples through the table it is given, and keeps no table of its own."""
+    packages = {}
+    first = helper_functions.intern_flight_package('[Delta| Delta]', 'Airbus A320|Boeing 737', packages)
+    assert first == ('Delta', ('Airbus A320', 'Boeing 737'))
+    assert helper_functions.intern_flight_package('[Delta| Delta]', 'Airbus A320|Boeing 737', packages) is first
+    assert len(packages) == 1
+
+    fresh = helper_functions.intern_flight_package('[Delta| Delta]', 'Airbus A320|Boeing 737')
+    assert fresh == first and fresh is not first
+    assert not hasattr(helper_functions, '_FLIGHT_PACKAGES')
+
+
+def test_load_flight_data_matches_create_graph(airport_coords: dict, small_zip: str) -> None:
+    """The graph of load_flight_data is the graph create_graph builds from the same complete rows."""
+    summary, graph = helper_functions.load_flight_data(airport_coords, small_zip)
+    expected = helper_functions.create_graph(
+        airport_coords, index=flight_index.FlightIndex(flight_reader.iter_flight_rows(small_zip)))
+    assert edges(graph) == edges(expected)
+    assert summary.as_tuple() == helper_functions.countries_and_airports(small_zip)
+
+
+def edges(graph: data_classes.Graph) -> dict[tuple[str, str], dict]:
+    """Return the flight packages of every edge of graph, keyed by the sorted pair of its airport codes."""
+    return {tuple(sorted((vertex.airport_code, neighbour.airport_code))): dict(flights)
+            for vertex in graph.all_verticies() for neighbour, flights in vertex.neighbours.items()}
+
+
+def test_optimal_routes_batch_matches_single_queries(airport_coords: dict, synthetic_zip: str) -> None:
+    """A batch of queries returns, in query order, what optimal_routes returns for each query on its own, and
+    ranks every package of a route like calculate_flight_scores when k covers them all."""
+    graph = helper_functions.create_graph(
+        airport_coords, index=flight_index.FlightIndex(flight_reader.iter_flight_rows(synthetic_zip)))
+    pairs = sorted((vertex.airport_code, neighbour.airport_code)
+                   for vertex in graph.all_verticies() for neighbour in vertex.neighbours)
+    queries = [(home, dest, weights) for home, dest in pairs[::3]
+               for weights in ((0.1, 0.1, 0.8), (1 / 3, 1 / 3, 1 / 3), (0.6, 0.0, 0.4))][::-1]
+    assert helper_functions.optimal_routes_batch(graph, queries) \
+        == [helper_functions.optimal_routes(graph, home, dest, weights) for home, dest, weights in queries]
+
+    for (home, dest, weights), result in zip(queries, helper_functions.optimal_routes_batch(graph, queries, 1000)):
+        flights = graph.get_vertex(home).get_neighbour(dest).neighbours[graph.get_vertex(home)]
+        scores = helper_functions.calculate_flight_scores(flights, weights)
+        assert [route[0] for route in result] == sorted(scores, key=scores.get)
+
+def test_optimal_routes_batch_without_a_direct_flight(airport_coords: dict) -> None:
+    """A query between airports that are not connected gets no packages, and an unknown airport raises a ValueError."""
+    graph = helper_functions.create_graph(airport_coords, index=flight_index.FlightIndex(SMALL_ROWS))
+    results = helper_functions.optimal_routes_batch(graph, [('YYZ', 'CDG', (0.1, 0.1, 0.8)),
+                                                            ('YYZ', 'LHR', (0.1, 0.1, 0.8))])
+    assert results == [[], helper_functions.optimal_routes(graph, 'YYZ', 'LHR', (0.1, 0.1, 0.8))]
+    with pytest.raises(ValueError):
+        helper_functions.optimal_routes_batch(graph, [('YYZ', 'NOPE', (0.1, 0.1, 0.8))])
+
+
+def test_pareto_routes_keep_the_best_package(airport_coords: dict, synthetic_zip: str) -> None:
+    """For any weights, pareto_routes starts with a package scored like the best package of optimal_routes, and only
+    returns packages of the Pareto front of the route."""
+    graph = helper_functions.create_graph(
+        airport_coords, index=flight_index.FlightIndex(flight_reader.iter_flight_rows(synthetic_zip)))
+    for vertex in graph.all_verticies():
+        for neighbour in vertex.neighbours:
+            arrays = graph.get_flight_arrays(vertex.airport_code, neighbour.airport_code)
+            front = {arrays.packages[i] for i in arrays.pareto_front().tolist()}
+            for weights in ((0.1, 0.1, 0.8), (0.9, 0.05, 0.05), (0.0, 1.0, 0.0)):
+                routes = helper_functions.pareto_routes(graph, vertex.airport_code, neighbour.airport_code, weights)
+                best = helper_functions.optimal_routes(graph, vertex.airport_code, neighbour.airport_code, weights)[0]
+                assert routes[0][-1] == best[-1]
+                assert {route[0] for route in routes} <= front
@@ -0,0 +1,102 @@
+"""Verde Voyage: Tests of instrumentation
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import json
+import pytest
+import flight_index
+import helper_functions
+import instrumentation
+from conftest import SMALL_ROWS
+
+
+@pytest.fixture
+def registry(monkeypatch) -> instrumentation.MetricsRegistry:
+    """Turn instrumentation on for one test, recording into a fresh registry."""
+    registry = instrumentation.MetricsRegistry()
+    monkeypatch.setattr(instrumentation, 'REGISTRY', registry)
+    monkeypatch.setattr(instrumentation, '_ENABLED', True)
+    return registry
+
+
+def test_stages_record_latencies_and_counts(registry: instrumentation.MetricsRegistry, airport_coords: dict) -> None:
+    """Instrumented stages record one latency per call and the number of items they processed, without changing
+    their results."""
+    graph = helper_functions.create_graph(airport_coords, 'YYZ', index=flight_index.FlightIndex(SMALL_ROWS))
+    routes = helper_functions.optimal_routes(graph, 'YYZ', 'LHR')
+    assert registry.counts['create_graph'] == {'rows': 5, 'edges': 2}
+    assert registry.counts['optimal_routes'] == {'packages': 3}
+    assert registry.histograms['optimal_routes'].count == 1
+
+    instrumentation.enable(False)
+    assert helper_functions.optimal_routes(graph, 'YYZ', 'LHR') == routes
+    helper_functions.create_graph(airport_coords, index=flight_index.FlightIndex(SMALL_ROWS))
+    assert registry.histograms['optimal_routes'].count == 1
+    assert registry.counts['create_graph'] == {'rows': 5, 'edges': 2}
+    assert instrumentation.timed('anything') is instrumentation.timed('other')
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    """A value equal to a bound is counted in that bound's bucket, and the buckets add up like Prometheus buckets."""
+    histogram = instrumentation.Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    assert histogram.bucket_counts == [2, 1, 1]
+    assert histogram.cumulative() == [('0.1', 2), ('1.0', 3), ('+Inf', 4)]
+    assert histogram.total == pytest.approx(2.65)
+
+
+def test_metrics_formats(registry: instrumentation.MetricsRegistry, tmp_path) -> None:
+    """Metrics are written in the Prometheus text format, or as one JSON line per stage."""
+    with instrumentation.timed('load'):
+        instrumentation.count('load', 'rows', 10)
+    instrumentation.count('load', 'rows', 5)
+
+    prometheus = str(tmp_path / 'metrics.prom')
+    instrumentation.write_metrics(prometheus)
+    with open(prometheus) as metrics_file:
+        text = metrics_file.read()
+    assert 'verde_stage_seconds_bucket{stage="load",le="+Inf"} 1\n' in text
+    assert 'verde_stage_seconds_count{stage="load"} 1\n' in text
+    assert text.endswith('verde_stage_items_total{stage="load",item="rows"} 15\n')
+
+    json_lines = str(tmp_path / 'metrics.jsonl')
+    instrumentation.write_metrics(json_lines)
+    with open(json_lines) as metrics_file:
+        records = [json.loads(line) for line in metrics_file]
+    assert len(records) == 1
+    assert records[0]['stage'] == 'load' and records[0]['counts'] == {'rows': 15} and records[0]['calls'] == 1
+
+
+@pytest.mark.parametrize('mode, heading', [('cprofile', 'cumulative'), ('tracemalloc', 'Peak traced memory')])
+def test_run_instrumented_writes_reports(registry: instrumentation.MetricsRegistry, mode: str, heading: str,
+                                         tmp_path, monkeypatch) -> None:
+    """The profiler named by VERDE_PROFILE writes its report, and the metrics are written once the call returns."""
+    report, metrics = str(tmp_path / 'report.txt'), str(tmp_path / 'metrics.prom')
+    monkeypatch.setenv(instrumentation.PROFILE_ENV, mode)
+    monkeypatch.setenv(instrumentation.PROFILE_OUTPUT_ENV, report)
+    monkeypatch.setenv(instrumentation.METRICS_OUTPUT_ENV, metrics)
+
+    def stage() -> int:
+        with instrumentation.timed('stage'):
+            return sum(range(1000))
+
+    assert instrumentation.run_instrumented(stage) == 499500
+    with open(report) as report_file:
+        assert heading in report_file.read()
+    with open(metrics) as metrics_file:
+        assert 'verde_stage_seconds_count{stage="stage"} 1' in metrics_file.read()
+
+
+def test_unknown_profile_mode_raises_value_error(monkeypatch) -> None:
+    """An unknown VERDE_PROFILE mode raises a ValueError before anything runs."""
+    monkeypatch.setenv(instrumentation.PROFILE_ENV, 'perf')
+    with pytest.raises(ValueError):
+        instrumentation.run_instrumented(pytest.fail)
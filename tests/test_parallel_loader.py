@@ -0,0 +1,85 @@
+"""Verde Voyage: Tests of parallel_loader
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import csv
+import numpy as np
+import pytest
+import benchmark_suite
+import flight_cache
+import flight_index
+import flight_reader
+import helper_functions
+import parallel_loader
+from conftest import SMALL_ROWS, flight_row
+
+
+def assert_same_columns(columns: flight_cache.FlightColumns, expected: flight_cache.FlightColumns) -> None:
+    """Assert that the two columnar datasets have the same arrays, string tables and summary."""
+    assert set(columns.columns) == set(expected.columns)
+    for name, array in expected.columns.items():
+        assert columns.columns[name].dtype == array.dtype
+        assert np.array_equal(columns.columns[name], array)
+    assert columns.strings == expected.strings
+    assert columns.summary == expected.summary
+
+
+@pytest.mark.parametrize('source', ['synthetic_zip', 'synthetic_csv'])
+def test_parallel_columns_match_the_serial_cache(source: str, request, tmp_path) -> None:
+    """Parsing the dataset in small chunks with two workers gives exactly the columns of a serial parse."""
+    path = request.getfixturevalue(source)
+    expected = flight_cache.build_flight_cache(path, str(tmp_path / 'cache'))
+    assert_same_columns(parallel_loader.load_flight_columns(path, workers=2, chunk_size=4096), expected)
+
+
+def test_chunks_split_at_line_breaks(synthetic_csv: str) -> None:
+    """The byte ranges of a CSV file are contiguous, and together hold every complete row exactly once."""
+    ranges = parallel_loader.byte_ranges(synthetic_csv, 1000)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    rows = sum((parallel_loader.parse_byte_range(synthetic_csv, start, end).columns['price'].tolist()
+                for start, end in ranges), [])
+    assert len(rows) == sum(flight_index.is_complete_row(row) for row in flight_reader.iter_flight_rows(synthetic_csv))
+
+
+def test_workers_decode_like_the_serial_reader(monkeypatch, tmp_path) -> None:
+    """The workers decode the dataset with flight_reader.ENCODING, like the serial reader."""
+    monkeypatch.setattr(flight_reader, 'ENCODING', 'latin-1')
+    path = str(tmp_path / 'flight_data.csv')
+    rows = SMALL_ROWS + [flight_row('CDG', 'France', 'MEX', 'México', 'Aeroméxico', 'Boeing 787', '980.0', '0',
+                                    '700000')]
+    with open(path, 'w', newline='', encoding='latin-1') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(benchmark_suite.FLIGHT_HEADER)
+        writer.writerows(rows)
+
+    expected = flight_cache.build_flight_cache(path, str(tmp_path / 'cache'))
+    columns = parallel_loader.load_flight_columns(path, workers=2, chunk_size=64)
+    assert_same_columns(columns, expected)
+    assert 'Aeroméxico' in columns.strings['airlines'] and 'méxico' in columns.summary[3]
+
+
+def test_merge_consumes_chunks_one_at_a_time(synthetic_csv: str) -> None:
+    """merge_chunks accepts any iterable of chunks, such as a generator, and merges them in order."""
+    ranges = parallel_loader.byte_ranges(synthetic_csv, 2000)
+    merged = parallel_loader.merge_chunks(parallel_loader.parse_byte_range(synthetic_csv, start, end)
+                                          for start, end in ranges)
+    whole = parallel_loader.parse_byte_range(synthetic_csv, ranges[0][0], ranges[-1][1])
+    assert merged.strings == whole.strings
+    assert np.array_equal(merged.columns['airline'], whole.columns['airline'])
+
+
+def test_load_flight_data_matches_the_serial_loader(airport_coords: dict, synthetic_zip: str) -> None:
+    """The parallel loader returns the summary and graph edges of helper_functions.load_flight_data."""
+    summary, graph = parallel_loader.load_flight_data(airport_coords, synthetic_zip, workers=2)
+    expected_summary, expected_graph = helper_functions.load_flight_data(airport_coords, synthetic_zip)
+    assert summary.as_tuple() == expected_summary.as_tuple()
+    for vertex in expected_graph.all_verticies():
+        for neighbour, flights in vertex.neighbours.items():
+            assert graph.get_flight_arrays(vertex.airport_code, neighbour.airport_code).flights == flights
@@ -0,0 +1,114 @@
+"""Verde Voyage: Tests of query_cache
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import gc
+import weakref
+import data_classes
+import flight_index
+import helper_functions
+import query_cache
+from conftest import SMALL_ROWS
+
+
+class Clock:
+    """A clock that only moves when it is told to."""
+    now: float
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def small_graph(airport_coords: dict) -> data_classes.Graph:
+    """Return the graph of every flight in the small dataset."""
+    return helper_functions.create_graph(airport_coords, index=flight_index.FlightIndex(SMALL_ROWS))
+
+
+def test_rankings_use_the_quantized_weights(airport_coords: dict) -> None:
+    """Weights that snap to the same grid point share one ranking, which is exactly the ranking optimal_routes gives
+    the snapped weights."""
+    graph, cache = small_graph(airport_coords), query_cache.QueryCache()
+    assert query_cache.quantize_weights((0.3334, 0.3333, 0.3333)) == (0.33, 0.33, 0.33)
+    for weights in ((0.333, 0.333, 0.334), (0.3334, 0.3333, 0.3333), (0.9, 0.1, 0), (0.896, 0.104, 0.0)):
+        assert query_cache.cached_optimal_routes(graph, 'YYZ', 'LHR', weights, cache) \
+            == helper_functions.optimal_routes(graph, 'YYZ', 'LHR', query_cache.quantize_weights(weights))
+    assert len(cache) == 2
+    assert cache.counters['hits'] == 2
+
+
+def test_results_of_several_graphs_are_kept(airport_coords: dict) -> None:
+    """Rankings of two graphs are cached side by side, and a changed graph only drops its own stale ranking."""
+    first, second, cache = small_graph(airport_coords), small_graph(airport_coords), query_cache.QueryCache()
+    for graph in (first, second, first, second):
+        query_cache.cached_optimal_routes(graph, 'YYZ', 'JFK', (0.2, 0.2, 0.6), cache)
+    assert cache.counters['misses'] == 2 and cache.counters['hits'] == 2
+
+    first.add_edge('YYZ', 'JFK', (('KLM', ('Boeing 737',)), data_classes.FlightInfo(10.0, 0, 1000)))
+    routes = query_cache.cached_optimal_routes(first, 'YYZ', 'JFK', (0.2, 0.2, 0.6), cache)
+    assert routes == helper_functions.optimal_routes(first, 'YYZ', 'JFK', (0.2, 0.2, 0.6))
+    assert cache.counters['invalidations'] == 1
+    query_cache.cached_optimal_routes(second, 'YYZ', 'JFK', (0.2, 0.2, 0.6), cache)
+    assert cache.counters['hits'] == 3
+
+
+def test_cache_does_not_keep_graphs_alive(airport_coords: dict) -> None:
+    """A cached ranking does not hold a reference to its graph, and a new graph never matches a collected one."""
+    graph, cache = small_graph(airport_coords), query_cache.QueryCache()
+    query_cache.cached_optimal_routes(graph, 'YYZ', 'LHR', (0.2, 0.2, 0.6), cache)
+    key = query_cache.data_key(graph, query_cache.ranking_key('YYZ', 'LHR', (0.2, 0.2, 0.6)))
+    reference = weakref.ref(graph)
+    del graph
+    gc.collect()
+    assert reference() is None
+
+    graph = small_graph(airport_coords)
+    assert query_cache.data_key(graph, query_cache.ranking_key('YYZ', 'LHR', (0.2, 0.2, 0.6))) != key
+    assert query_cache.cached_optimal_routes(graph, 'YYZ', 'LHR', (0.2, 0.2, 0.6), cache) \
+        == helper_functions.optimal_routes(graph, 'YYZ', 'LHR', (0.2, 0.2, 0.6))
+    assert cache.counters['hits'] == 0
+
+
+def test_least_recently_used_results_are_evicted() -> None:
+    """A full cache evicts its least recently used result, and a result larger than max_bytes is not cached."""
+    cache = query_cache.QueryCache(max_entries=2, max_bytes=100)
+    cache.put('a', 1, size=10)
+    cache.put('b', 2, size=10)
+    assert cache.get('a') == 1
+    cache.put('c', 3, size=10)
+    assert cache.get('b') is None and cache.get('c') == 3
+    cache.put('d', 4, size=1000)
+    assert cache.get('d') is None
+    cache.put('e', 5, size=95)
+    assert len(cache) == 1 and cache.nbytes() == 95
+    assert cache.counters['evictions'] == 3
+
+
+def test_results_expire() -> None:
+    """A result older than the time to live of the cache is dropped when it is looked up."""
+    clock = Clock()
+    cache = query_cache.QueryCache(ttl=10.0, clock=clock)
+    cache.put('a', 1)
+    clock.now = 9.0
+    assert cache.get('a') == 1
+    clock.now = 11.0
+    assert cache.get('a', default='missing') == 'missing'
+    assert cache.counters['expirations'] == 1 and len(cache) == 0
+
+
+def test_metrics_format() -> None:
+    """The metrics of a cache are reported in the Prometheus text format."""
+    cache = query_cache.QueryCache()
+    cache.get('a')
+    metrics = query_cache.format_metrics({'rankings': cache})
+    assert 'verde_query_cache_misses_total{cache="rankings"} 1\n' in metrics
+    assert metrics.endswith('verde_query_cache_bytes{cache="rankings"} 0\n')
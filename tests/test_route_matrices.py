@@ -0,0 +1,80 @@
+"""Verde Voyage: Tests of route_matrices
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import os
+import shutil
+import numpy as np
+import pytest
+import flight_cache
+import flight_index
+import helper_functions
+import route_matrices
+from conftest import SMALL_ROWS
+
+
+@pytest.fixture
+def paths(small_zip: str, tmp_path) -> tuple[str, str, str]:
+    """Return a copy of the small dataset, a cache directory and a matrices file, all in a temporary directory."""
+    zip_path = str(tmp_path / 'flight_data.csv.zip')
+    shutil.copy(small_zip, zip_path)
+    return zip_path, str(tmp_path / 'cache'), str(tmp_path / 'route_matrices.npz')
+
+
+def test_matrices_match_the_graph(airport_coords: dict) -> None:
+    """The statistics of every pair of airports are those of the flight packages of its graph edge."""
+    graph = helper_functions.create_graph(airport_coords, index=flight_index.FlightIndex(SMALL_ROWS))
+    matrices = route_matrices.RouteMatrices.from_graph(graph)
+    assert matrices.get('min_price', 'YYZ', 'LHR') == 700.0 == matrices.get('min_price', 'LHR', 'YYZ')
+    assert matrices.get('max_emissions', 'YYZ', 'JFK') == 90000
+    assert matrices.get('min_price', 'YYZ', 'CDG') is None
+    assert matrices.package_counts[matrices.airport_id('YYZ'), matrices.airport_id('LHR')] == 3
+
+    # YYZ to CDG has no direct flight, and is cheapest in emissions through LHR
+    route, emissions = matrices.min_emission_route('YYZ', 'CDG')
+    assert route == ['YYZ', 'LHR', 'CDG'] and emissions == 480000 + 60000
+
+
+def test_saved_matrices_are_loaded(paths: tuple[str, str, str]) -> None:
+    """Precomputed matrices are loaded from their file, with the same arrays."""
+    zip_path, cache_dir, matrices_file = paths
+    computed = route_matrices.precompute_route_matrices(zip_path, cache_dir, matrices_file)
+    loaded = route_matrices.load_route_matrices(zip_path, cache_dir, matrices_file)
+    assert loaded.codes == computed.codes
+    assert np.array_equal(loaded.min_emission_distances, computed.min_emission_distances)
+
+
+def test_touched_dataset_is_hashed_once(paths: tuple[str, str, str], monkeypatch) -> None:
+    """After a touched but unchanged dataset is hashed, its new modification time is stored, so it is not hashed
+    again on the next load."""
+    zip_path, cache_dir, matrices_file = paths
+    route_matrices.precompute_route_matrices(zip_path, cache_dir, matrices_file)
+    stat = os.stat(zip_path)
+    os.utime(zip_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    hashed = []
+    file_fingerprint = flight_cache.file_fingerprint
+    monkeypatch.setattr(flight_cache, 'file_fingerprint', lambda file: hashed.append(file) or file_fingerprint(file))
+    monkeypatch.setattr(route_matrices, 'precompute_route_matrices', pytest.fail)
+
+    route_matrices.load_route_matrices(zip_path, cache_dir, matrices_file)
+    route_matrices.load_route_matrices(zip_path, cache_dir, matrices_file)
+    assert hashed == [zip_path]
+    meta, _ = route_matrices.RouteMatrices.load(matrices_file)
+    assert meta['source']['mtime_ns'] == os.stat(zip_path).st_mtime_ns
+
+
+def test_changed_dataset_is_recomputed(paths: tuple[str, str, str], synthetic_zip: str) -> None:
+    """Matrices of a dataset whose contents changed are recomputed."""
+    zip_path, cache_dir, matrices_file = paths
+    route_matrices.precompute_route_matrices(zip_path, cache_dir, matrices_file)
+    shutil.copy(synthetic_zip, zip_path)
+    matrices = route_matrices.load_route_matrices(zip_path, cache_dir, matrices_file)
+    assert len(matrices.codes) > 5
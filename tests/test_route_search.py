@@ -0,0 +1,148 @@
+"""Verde Voyage: Tests of route_search
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import itertools
+import pytest
+import airport_index
+import data_classes
+import flight_index
+import flight_reader
+import helper_functions
+import route_search
+from conftest import SMALL_ROWS
+
+WEIGHTS = [(0.1, 0.1, 0.8), (0.5, 0.3, 0.2)]
+
+
+@pytest.fixture(scope='module')
+def synthetic_graph(airport_coords: dict, synthetic_zip: str) -> data_classes.Graph:
+    """Return the graph of every flight in the synthetic dataset."""
+    return helper_functions.create_graph(
+        airport_coords, index=flight_index.FlightIndex(flight_reader.iter_flight_rows(synthetic_zip)))
+
+
+def simple_paths(graph: data_classes.Graph, home_airport: str, dest_airport: str, max_legs: int) -> list[tuple]:
+    """Return every path from home_airport to dest_airport with at most max_legs legs that visits no airport twice."""
+    others = [code for code in graph.all_airport_codes() if code not in (home_airport, dest_airport)]
+    paths = []
+    for stops in range(max_legs):
+        for middle in itertools.permutations(others, stops):
+            path = (home_airport,) + middle + (dest_airport,)
+            if all(graph.get_vertex(path[i]).get_neighbour(path[i + 1]) is not None for i in range(len(path) - 1)):
+                paths.append(path)
+    return paths
+
+
+def path_costs(graph: data_classes.Graph, weights: tuple[float, float, float], max_legs: int,
+               home_airport: str, dest_airport: str) -> dict[tuple, float]:
+    """
+    Return the cost of every simple path of the given route, flying the best package of each leg.
+
+    Packages are normalized by the maxima over the whole graph (a maximum of 0 is replaced by 1, and the maximum
+    number of stops is at least 1), and each connection adds one stop.
+    """
+    values = [flight_info for vertex in graph.all_verticies() for flights in vertex.neighbours.values()
+              for flight_info in flights.values()]
+    scales = [max(flight_info[i] for flight_info in values) or 1.0 for i in range(3)]
+    scales[1] = max(scales[1], 1.0)
+
+    def leg_cost(home: str, dest: str) -> float:
+        flights = graph.get_vertex(home).get_neighbour(dest).neighbours[graph.get_vertex(home)]
+        return min(sum(flight_info[i] / scales[i] * weights[i] for i in range(3)) for flight_info in flights.values())
+
+    return {path: sum(leg_cost(path[i], path[i + 1]) for i in range(len(path) - 1))
+            + (len(path) - 2) * weights[1] / scales[1]
+            for path in simple_paths(graph, home_airport, dest_airport, max_legs)}
+
+
+def test_shortest_route_matches_brute_force(synthetic_graph: data_classes.Graph) -> None:
+    """The best itinerary of at most three legs is the cheapest simple path, with or without the heuristic."""
+    codes = sorted(synthetic_graph.all_airport_codes())
+    for weights in WEIGHTS:
+        search = route_search.RouteSearch(synthetic_graph, weights)
+        for home_airport, dest_airport in [(codes[0], codes[5]), (codes[3], codes[11]), (codes[7], codes[2])]:
+            costs = path_costs(synthetic_graph, weights, 3, home_airport, dest_airport)
+            itinerary = search.shortest_route(home_airport, dest_airport, max_legs=3)
+            assert itinerary[-1] == pytest.approx(min(costs.values()), abs=1e-5)
+            assert itinerary[-1] == pytest.approx(costs[itinerary[0]], abs=1e-5)
+            assert search.shortest_route(home_airport, dest_airport, 3, use_heuristic=False)[-1] == itinerary[-1]
+
+
+def test_k_shortest_routes_match_brute_force(synthetic_graph: data_classes.Graph) -> None:
+    """Yen's algorithm returns the k cheapest simple paths, from best to worst, without repeating a path."""
+    codes = sorted(synthetic_graph.all_airport_codes())
+    costs = path_costs(synthetic_graph, WEIGHTS[1], 2, codes[1], codes[8])
+    itineraries = route_search.RouteSearch(synthetic_graph, WEIGHTS[1]).k_shortest_routes(codes[1], codes[8], 6, 2)
+    assert len({itinerary[0] for itinerary in itineraries}) == 6
+    assert [itinerary[-1] for itinerary in itineraries] == pytest.approx(sorted(costs.values())[:6], abs=1e-5)
+
+
+def test_connections_count_as_stops(airport_coords: dict) -> None:
+    """Without a direct flight, legs are chained through another airport, and the connection counts as a stop."""
+    graph = helper_functions.create_graph(airport_coords, index=flight_index.FlightIndex(SMALL_ROWS))
+    search = route_search.RouteSearch(graph, (0.0, 0.0, 1.0), airport_index.AirportIndex(airport_coords))
+    codes, legs, price, stops, emissions, _ = search.shortest_route('YYZ', 'CDG')
+    assert codes == ('YYZ', 'LHR', 'CDG')
+    assert [package for package, _ in legs] == [('British Airways', ('Boeing 777',)), ('Air France', ('Airbus A320',))]
+    assert (price, stops, emissions) == (1100.0 + 150.0, 1, 480000 + 60000)
+    assert search.shortest_route('YYZ', 'CDG', max_legs=1) is None
+    assert search.k_shortest_routes('YYZ', 'YYZ') == []
+    with pytest.raises(ValueError):
+        search.shortest_route('YYZ', 'NOPE')
+
+
+def edge_front(flights: dict) -> list:
+    """Return the distinct [price, stops, emissions] values of flights that no other package dominates."""
+    values = {tuple(flight_info) for flight_info in flights.values()}
+    return [value for value in values
+            if not any(all(o <= v for o, v in zip(other, value)) and other != value for other in values)]
+
+
+def test_pareto_front_matches_brute_force(synthetic_graph: data_classes.Graph) -> None:
+    """The front of a route holds the values of every itinerary of at most two legs that no other itinerary
+    dominates, and best_routes ranks the front for any weights."""
+    codes = sorted(synthetic_graph.all_airport_codes())
+    home_airport, dest_airport = codes[2], codes[9]
+    itineraries = []
+    for path in simple_paths(synthetic_graph, home_airport, dest_airport, 2):
+        leg_fronts = [edge_front(synthetic_graph.get_vertex(path[i]).neighbours[synthetic_graph.get_vertex(path[i + 1])])
+                      for i in range(len(path) - 1)]
+        for legs in itertools.product(*leg_fronts):
+            itineraries.append((sum(leg[0] for leg in legs), sum(leg[1] for leg in legs) + len(legs) - 1,
+                                sum(leg[2] for leg in legs)))
+    expected = {value for value in itineraries
+                if not any(all(o <= v for o, v in zip(other, value)) and other != value for other in itineraries)}
+
+    search = route_search.ParetoSearch(synthetic_graph)
+    front = search.front(home_airport, dest_airport, max_legs=2)
+    assert {itinerary[2:5] for itinerary in front} == expected
+    assert len(front) == len(expected)
+
+    best = search.best_routes(home_airport, dest_airport, (0.2, 0.2, 0.6), k=3, max_legs=2)
+    maxima = [max(value[i] for value in expected) for i in range(3)]
+    scores = sorted(round(sum(value[i] / maxima[i] * weight for i, weight in enumerate((0.2, 0.2, 0.6))), 5)
+                    for value in expected)
+    assert [route[-1] for route in best] == pytest.approx(scores[:3], abs=1e-5)
+
+
+def test_searches_follow_graph_changes(airport_coords: dict) -> None:
+    """Searches built before the graph changed answer the next query from the changed graph."""
+    graph = helper_functions.create_graph(airport_coords, index=flight_index.FlightIndex(SMALL_ROWS))
+    search = route_search.RouteSearch(graph, (0.0, 0.0, 1.0))
+    pareto = route_search.ParetoSearch(graph)
+    assert search.shortest_route('YYZ', 'CDG')[0] == ('YYZ', 'LHR', 'CDG')
+    assert {itinerary[0] for itinerary in pareto.front('YYZ', 'CDG')} == {('YYZ', 'LHR', 'CDG')}
+
+    graph.apply_changes([data_classes.FlightChange('delete', 'YYZ', 'Canada', 'LHR', 'United Kingdom', None, None)],
+                        airport_coords)
+    assert search.shortest_route('YYZ', 'CDG')[0] == ('YYZ', 'JFK', 'LHR', 'CDG')
+    assert {itinerary[0] for itinerary in pareto.front('YYZ', 'CDG')} == {('YYZ', 'JFK', 'LHR', 'CDG')}
+    assert pareto.best_routes('YYZ', 'CDG', k=1)[0][0] == ('YYZ', 'JFK', 'LHR', 'CDG')
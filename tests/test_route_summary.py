@@ -0,0 +1,87 @@
+"""Verde Voyage: Tests of route_summary
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import flight_cache
+import flight_index
+import flight_reader
+import helper_functions
+import route_summary
+from conftest import SMALL_ROWS, flight_row, write_flight_zip
+
+
+def summary_of(rows: list[list[str]]) -> route_summary.RouteSummary:
+    """Return the summary built row by row from the given rows."""
+    summary = route_summary.RouteSummary()
+    for row in rows:
+        summary.add_row(row)
+    return summary
+
+
+def tables(summary: route_summary.RouteSummary) -> dict:
+    """Return the statistics of every origin of summary, as plain values that can be compared."""
+    return {origin: ({dest: repr(stats) for dest, stats in summary.get_origin(origin).destinations.items()},
+                     {country: repr(stats) for country, stats in summary.get_origin(origin).countries.items()},
+                     repr(summary.get_origin(origin).totals))
+            for origin in summary.home_airports if summary.get_origin(origin) is not None}
+
+
+def test_repeated_packages_count_once() -> None:
+    """Rows that repeat a flight package on a route count as one package, but still widen its ranges."""
+    stats = summary_of(SMALL_ROWS).get_route('YYZ', 'LHR')
+    assert stats.package_count == 3
+    assert (stats.min_price, stats.max_price) == (700.0, 1100.0)
+    assert (stats.min_emissions, stats.max_emissions) == (480000, 610000)
+    assert summary_of(SMALL_ROWS).get_origin('YYZ').totals.package_count == 4
+
+
+def test_package_count_matches_the_graph(airport_coords: dict, synthetic_zip: str) -> None:
+    """On routes flown in one direction only, package_count is the number of flight packages of the graph edge."""
+    rows = [row for row in flight_reader.iter_flight_rows(synthetic_zip) if row[0] < row[2]]
+    summary = summary_of(rows)
+    graph = helper_functions.create_graph(airport_coords, index=flight_index.FlightIndex(rows))
+    for vertex in graph.all_verticies():
+        for neighbour, flights in vertex.neighbours.items():
+            home, dest = sorted((vertex.airport_code, neighbour.airport_code))
+            assert summary.get_route(home, dest).package_count == len(flights)
+
+
+def test_from_columns_matches_add_row(synthetic_zip: str, tmp_path) -> None:
+    """The summary computed with NumPy from the columnar cache is the one built row by row."""
+    columns = flight_cache.load_flight_cache(synthetic_zip, str(tmp_path / 'cache'))
+    expected = summary_of(flight_reader.iter_flight_rows(synthetic_zip))
+    summary = route_summary.RouteSummary.from_columns(columns)
+    assert tables(summary) == tables(expected)
+    assert summary.as_tuple() == expected.as_tuple()
+
+
+def test_destination_with_two_countries(tmp_path) -> None:
+    """A flight package belongs to the country of its first row, in both ways of building the summary."""
+    rows = [flight_row('YYZ', 'Canada', 'LHR', 'United Kingdom', 'Air Canada', 'Boeing 787', '900.0', '0', '500000'),
+            flight_row('YYZ', 'Canada', 'LHR', 'England', 'Air Canada', 'Boeing 787', '800.0', '0', '510000'),
+            flight_row('YYZ', 'Canada', 'LHR', 'England', 'British Airways', 'Boeing 777', '1000.0', '0', '480000')]
+    expected = summary_of(rows)
+    origin = expected.get_origin('YYZ')
+    assert origin.destinations['LHR'].package_count == 2
+    assert origin.countries['united kingdom'].package_count == 1
+    assert (origin.countries['united kingdom'].min_price, origin.countries['united kingdom'].max_price) == (800.0, 900.0)
+    assert origin.countries['england'].package_count == 1
+
+    zip_path = write_flight_zip(str(tmp_path / 'flight_data.csv.zip'), rows)
+    columns = flight_cache.load_flight_cache(zip_path, str(tmp_path / 'cache'))
+    assert tables(route_summary.RouteSummary.from_columns(columns)) == tables(expected)
+
+
+def test_search() -> None:
+    """Airports and countries are autocompleted from their prefix, ignoring case."""
+    summary = summary_of(SMALL_ROWS)
+    assert summary.search_airports('y') == ['YYZ']
+    assert summary.search_countries('UNITED') == ['united kingdom', 'united states']
+    assert summary.search_countries('z') == []
@@ -0,0 +1,72 @@
+"""Verde Voyage: Tests of voyage_service
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+import asyncio
+import pytest
+import data_classes
+import flight_index
+import helper_functions
+import query_cache
+import route_summary
+import voyage_service
+from conftest import SMALL_ROWS
+
+
+@pytest.fixture
+def service(airport_coords: dict) -> voyage_service.VoyageService:
+    """Return a service over the small dataset."""
+    graph = helper_functions.create_graph(airport_coords, index=flight_index.FlightIndex(SMALL_ROWS))
+    summary = route_summary.RouteSummary()
+    for row in SMALL_ROWS:
+        summary.add_row(row)
+    service = voyage_service.VoyageService(graph, summary,
+                                           data_classes.get_country_matcher(voyage_service.COUNTRY_TRAITS_FILE))
+    yield service
+    service.close()
+
+
+def test_connections_cover_both_directions(service: voyage_service.VoyageService) -> None:
+    """A connection counts the flight packages flown in either direction, like the edge of the graph."""
+    connections = {connection['airport']: connection for connection in asyncio.run(service.connections('YYZ'))}
+    assert set(connections) == {'LHR', 'JFK'}
+    assert connections['JFK']['packages'] == 2
+    assert connections['JFK']['price'] == (300.0, 320.0)
+    assert connections['LHR']['packages'] == 3
+    assert connections['LHR']['emissions'] == (480000, 610000)
+    assert connections['LHR']['country'] == 'United Kingdom'
+
+
+def test_connections_include_applied_changes(service: voyage_service.VoyageService, airport_coords: dict) -> None:
+    """Edges added by Graph.apply_changes, which are not in the route summary, are connections too."""
+    service.graph.apply_changes([data_classes.FlightChange(
+        'add', 'CDG', 'France', 'YYZ', 'Canada', ('Air France', ('Airbus A350',)),
+        data_classes.FlightInfo(800.0, 0, 400000))], airport_coords)
+    connections = {connection['airport']: connection for connection in asyncio.run(service.connections('YYZ'))}
+    assert connections['CDG'] == {'airport': 'CDG', 'country': 'France', 'packages': 1, 'price': (800.0, 800.0),
+                                  'emissions': (400000, 400000)}
+
+
+def test_unknown_airport_raises_value_error(service: voyage_service.VoyageService) -> None:
+    """Queries about an airport that is not in the graph raise a ValueError."""
+    with pytest.raises(ValueError):
+        asyncio.run(service.connections('NOPE'))
+
+
+def test_optimal_routes_are_cached_per_quantized_weights(service: voyage_service.VoyageService) -> None:
+    """Rankings are served from cache for weights that snap to the same grid point on the same version of the
+    graph, and are the rankings of the snapped weights."""
+    for weights in ((0.2, 0.2, 0.6), (0.2001, 0.2, 0.5999), (0.25, 0.15, 0.6)):
+        assert asyncio.run(service.optimal_routes('YYZ', 'LHR', weights)) \
+            == helper_functions.optimal_routes(service.graph, 'YYZ', 'LHR', query_cache.quantize_weights(weights))
+    assert (service.rankings.counters['hits'], service.rankings.counters['misses']) == (1, 2)
+
+    service.graph.add_edge('YYZ', 'LHR', (('KLM', ('Boeing 737',)), data_classes.FlightInfo(10.0, 0, 1000)))
+    assert asyncio.run(service.optimal_routes('YYZ', 'LHR', (0.2, 0.2, 0.6)))[0][0] == ('KLM', ('Boeing 737',))
@@ -0,0 +1,173 @@
+"""Verde Voyage: Asynchronous query service
+
+Module Description
+==================
+This module contains the VoyageService class, which exposes the steps of helper_functions.run_voyage as coroutines
+instead of console prompts, so one process can serve many users at once. Every request shares one loaded graph,
+route summary and country matcher. Requests that only look up precomputed data are answered directly on the event
+loop, and requests that score flight packages are run in an executor so they do not block other users. Rankings
+are cached per route and weights, so the popular routes are only scored once per version of the graph.
+
+Copyright and Usage Information
+===============================
+This file is provided exclusively for the use and benefit of customers of VerdeVoyage. Any form of
+distribution, reproduction, or modification of this code outside of its intended use within the VerdeVoyage
+platform is strictly prohibited. All rights reserved.
+
+This file is Copyright (c) 2024 Verde Voyage
+
+"""
+from __future__ import annotations
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Optional
+import asyncio
+import data_classes
+import flight_cache
+import flight_index
+import helper_functions
+import query_cache
+import route_summary
+
+COUNTRY_TRAITS_FILE = 'CSV Files/country_traits.csv'
+
+
+class VoyageService:
+    """
+    A service answering the queries of many concurrent users from one loaded copy of the flight data.
+
+    Every query raises a ValueError if an airport or country it is given is not in the flight data.
+
+    Instance Attributes:
+        - graph: The graph of every flight in the dataset.
+        - summary: The route summary of the dataset.
+        - matcher: The country matcher of the travel questionnaire.
+        - rankings: The cache of the rankings returned by optimal_routes.
+
+    Private Instance Attributes:
+        - _executor: The executor that scores flight packages.
+        - _owns_executor: Whether the executor was created by this service (and so is shut down by close).
+    """
+    graph: data_classes.Graph
+    summary: route_summary.RouteSummary
+    matcher: data_classes.CountryMatcher
+    rankings: query_cache.QueryCache
+    _executor: Executor
+    _owns_executor: bool
+
+    def __init__(self, graph: data_classes.Graph, summary: route_summary.RouteSummary,
+                 matcher: data_classes.CountryMatcher, executor: Optional[Executor] = None,
+                 rankings: Optional[query_cache.QueryCache] = None) -> None:
+        """
+        Initialize a service over the given data. If no executor is given, a thread pool is created for the service,
+        and if no ranking cache is given, an empty one with the default bounds is created.
+        """
+        self.graph = graph
+        self.summary = summary
+        self.matcher = matcher
+        self.rankings = query_cache.QueryCache() if rankings is None else rankings
+        self._owns_executor = executor is None
+        self._executor = ThreadPoolExecutor() if executor is None else executor
+
+    @classmethod
+    def from_cache(cls, zip_path: str = flight_cache.FLIGHT_ZIP_FILE, cache_dir: str = flight_cache.CACHE_DIR,
+                   country_file: str = COUNTRY_TRAITS_FILE, executor: Optional[Executor] = None) -> VoyageService:
+        """
+        Return a service over the flight dataset in zip_path, loaded through its columnar cache in cache_dir like
+        run_voyage does.
+        """
+        flight_columns = flight_cache.load_flight_cache(zip_path, cache_dir)
+        index = flight_index.FlightIndex.from_columns(flight_columns)
+        graph = helper_functions.create_graph(helper_functions.get_airport_coordinates(), index=index)
+        summary = route_summary.RouteSummary.from_columns(flight_columns)
+        return cls(graph, summary, data_classes.get_country_matcher(country_file), executor)
+
+    async def connections(self, home_airport: str) -> list[dict[str, Any]]:
+        """
+        Return the airports connected to home_airport, with their country and the number, price range and emissions
+        range of the flight packages between them.
+
+        Like the edges of the graph, a connection covers the flights in either direction, and counts each flight
+        package once. The values are read from the graph, so they include the edges changed by Graph.apply_changes.
+        """
+        vertex = self.graph.get_vertex(home_airport)
+        connections = []
+        for neighbour, flights in vertex.neighbours.items():
+            stats = self.graph.get_edge_stats(home_airport, neighbour.airport_code)
+            connections.append({'airport': neighbour.airport_code, 'country': neighbour.country_name,
+                                'packages': len(flights), 'price': (stats.min_price, stats.max_price),
+                                'emissions': (stats.min_emissions, stats.max_emissions)})
+        return connections
+
+    async def match_countries(self, answers: list[bool], nearest: bool = False) -> list[str]:
+        """
+        Return the countries that match the given answers to data_classes.TRAVEL_QUESTIONS, like
+        run_country_matchmaker (but returning an empty list instead of None).
+        """
+        return self.matcher.closest(answers) if nearest else self.matcher.match(answers)
+
+    async def country_airports(self, home_airport: str, dest_country: str) -> list[str]:
+        """
+        Return the airports in dest_country with flights from home_airport, which run_voyage displays after asking
+        for the destination country.
+        """
+        vertex = self.graph.get_vertex(home_airport)
+        dest_country = dest_country.strip().lower()
+        if dest_country not in self.summary.dest_countries:
+            raise ValueError
+        return [neighbour.airport_code for neighbour in vertex.neighbours
+                if neighbour.country_name.lower() == dest_country]
+
+    async def optimal_routes(self, home_airport: str, dest_airport: str,
+                             weights: tuple[float, float, float]) -> list[tuple]:
+        """
+        Return the most optimal flight packages from home_airport to dest_airport for the given weights, in the
+        format returned by helper_functions.optimal_routes.
+
+        Like query_cache.cached_optimal_routes, the packages are ranked with the weights snapped by
+        query_cache.quantize_weights. Rankings are looked up in the ranking cache of this service, and only a route
+        and weights that are not cached are scored, in the executor of this service.
+        """
+        weights = query_cache.quantize_weights(weights)
+        key = query_cache.data_key(self.graph, query_cache.ranking_key(home_airport, dest_airport, weights))
+        version = self.graph.version
+        missing = object()
+        routes = self.rankings.get(key, version, missing)
+        if routes is missing:
+            loop = asyncio.get_running_loop()
+            routes = await loop.run_in_executor(self._executor, helper_functions.optimal_routes, self.graph,
+                                                home_airport, dest_airport, weights)
+            self.rankings.put(key, routes, version)
+        return routes
+
+    async def carbon_statistics(self, home_airport: str, dest_airport: str, emissions: int) -> list[str]:
+        """
+        Return the statistics run_voyage shows for choosing a flight package with the given emissions from
+        home_airport to dest_airport, in alphabetical order.
+        """
+        offset = self.graph.get_vertex(home_airport).max_emissions(dest_airport) - emissions
+        return sorted(helper_functions.carbon_statistics(offset))
+
+    def metrics(self) -> str:
+        """Return the counters of the ranking cache of this service, in the Prometheus text format."""
+        return query_cache.format_metrics({'rankings': self.rankings})
+
+    def close(self) -> None:
+        """Shut down the executor of this service, if the service created it."""
+        if self._owns_executor:
+            self._executor.shutdown()
+
+
+if __name__ == '__main__':
+    # import python_ta.contracts
+    # python_ta.contracts.check_all_contracts()
+    import python_ta
+
+    python_ta.check_all(config={
+        'max-line-length': 170,
+        'disable': ['E1136', 'W0221'],
+        'extra-imports': ['asyncio', 'concurrent.futures', 'data_classes', 'flight_cache', 'flight_index',
+                          'helper_functions', 'query_cache', 'route_summary'],
+        'max-nested-blocks': 4,
+        'max-locals': 25,
+        'max-statements': 80
+    })